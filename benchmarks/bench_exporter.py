@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+""" Benchmark the `FuncDeclExporter` rendering on a synthetic header.
+Compares the buffered block rendering in `Exporter` with the
+previous implementation that called `print` once per line.
+
+  python benchmarks/bench_exporter.py --funcs 50000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from argparse import Namespace
+
+from pycparser import c_parser
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic import gen_header
+
+from lbstanza_wrappers.FuncDeclVisitor import FuncDeclVisitor
+from lbstanza_wrappers.Lbstanza import FuncDeclExporter
+
+
+class PerLineExporter(FuncDeclExporter):
+  """ The previous implementation - `print` for every line with
+  the indent string rebuilt on each call.
+  """
+  def lprint(self, outstr, *args, **kwargs):
+    kwargs["file"] = self._fout
+    indents = self.INDENT_STR * self._indent_level
+    outstr = indents + outstr
+    print(outstr, *args, **kwargs)
+
+  def lines(self, outlines):
+    for x in outlines:
+      self.lprint(x)
+
+  def dump_funcs_package(self, funcs, prefix, pkgName, structs=None):
+    """ `dump_func_decls` calls this - the previous implementation
+    iterated the functions once for the declarations and again
+    for the wrappers.
+    """
+    self.dump_autogen_header()
+    self.dump_package_decl(prefix, pkgName, ["core"])
+    self.dump_static_decl(funcs)
+    self.dump_wrapper(funcs)
+
+  def dump_static_decl(self, funcs):
+    for name, data in funcs.items():
+      voidComment = ""
+      if data.ret.isVoid:
+        voidComment = "  ;  void"
+      funcType = data.to_stanza()
+      self.lprint("extern {} : {}{}".format(name, funcType, voidComment))
+
+  def dump_wrapper(self, funcs):
+    def to_argdecl(k,v):
+      return "{}:{}".format(k, v.to_stanza())
+
+    for name, data in funcs.items():
+      argDecls = ", ".join([to_argdecl(k,v) for k,v in data.args.items()])
+      fArgs = ", ".join(data.args.keys())
+
+      isVoid = data.ret.isVoid
+      if isVoid:
+        retDecl = "ref<False>"
+      else:
+        retDecl = data.ret.retType.to_stanza()
+
+      self.lprint("public lostanza defn w_{} ({}) -> {} :".format(name, argDecls, retDecl))
+      with self.indented():
+        retPrefix = "val ret = "
+        if isVoid:
+          retPrefix = ""
+        self.lprint("{}call-c {}({})".format(retPrefix, name, fArgs))
+        if isVoid:
+          self.lprint("return false")
+        else:
+          self.lprint("return ret")
+
+
+def time_export(expCls, funcs, opts, repeat):
+  best = None
+  with tempfile.TemporaryDirectory() as tmpDir:
+    fpath = os.path.join(tmpDir, "out.stanza")
+    for _ in range(repeat):
+      start = time.perf_counter()
+      with open(fpath, "w") as f:
+        exp = expCls(f)
+        exp.dump_func_decls(funcs, opts)
+      elapsed = time.perf_counter() - start
+      best = elapsed if best is None else min(best, elapsed)
+    with open(fpath, "r") as f:
+      content = f.read()
+  return best, content
+
+def main():
+  parser = argparse.ArgumentParser(description="Exporter Rendering Benchmark")
+  parser.add_argument("--funcs", type=int, default=50000, help="Number of functions in the synthetic header. Default is '%(default)s'")
+  parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs - the best is reported. Default is '%(default)s'")
+  opts = parser.parse_args()
+
+  node = c_parser.CParser().parse(gen_header(opts.funcs), "synthetic.h")
+  v = FuncDeclVisitor(Namespace())
+  v.visit(node)
+
+  expOpts = Namespace(pkg_prefix="bench", pkg_name="Wrapper")
+  oldTime, oldContent = time_export(PerLineExporter, v._funcs, expOpts, opts.repeat)
+  newTime, newContent = time_export(FuncDeclExporter, v._funcs, expOpts, opts.repeat)
+
+  if oldContent != newContent:
+    raise RuntimeError("Exporters generated different output")
+
+  print("Functions: {}".format(len(v._funcs)))
+  print("Per-Line print(): {:.3f} s".format(oldTime))
+  print("Buffered:         {:.3f} s".format(newTime))
+  print("Speedup:          {:.2f}x".format(oldTime / newTime))
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+""" Benchmark suite for the wrapper generator.
+
+This does not need the `stanza` compiler. Each scenario generates a
+synthetic header and times each phase of the generator separately:
+
+  cpp          - `preprocess_file`
+  parse        - pycparser parse of the preprocessed text
+  func-visit   - `FuncDeclVisitor.visit`
+  enum-visit   - `EnumVisitor.visit`
+  func-render  - `FuncDeclExporter.dump_func_decls`
+  enum-render  - `EnumExporter` / `NativeEnumExporter` for every enum
+
+The peak memory allocated in each phase is measured in a second
+pass with `tracemalloc` so that it doesn't distort the timings.
+
+  # Run the suite and save the results
+  python benchmarks/run_bench.py --output baseline.json
+
+  # Compare against a stored baseline - exits with an error
+  #  code if any phase regressed by more than the threshold.
+  python benchmarks/run_bench.py --compare baseline.json --threshold 0.2
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import tracemalloc
+from argparse import Namespace
+from contextlib import redirect_stdout
+
+import pycparser
+from pycparser import c_parser, preprocess_file
+import pycparser_fake_libc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic import HeaderSpec, gen_header
+
+from lbstanza_wrappers import __version__
+from lbstanza_wrappers.FuncDeclVisitor import FuncDeclVisitor
+from lbstanza_wrappers.EnumVisitor import EnumVisitor
+from lbstanza_wrappers.Lbstanza import FuncDeclExporter, EnumExporter, NativeEnumExporter
+from lbstanza_wrappers.ParallelParse import gc_paused
+from lbstanza_wrappers.Timings import PhaseTimer
+
+
+SCENARIOS = {
+  "small" : HeaderSpec(funcs=500, enums=20, enumerators=8),
+  "funcs" : HeaderSpec(funcs=10000, typedef_depth=4, ptr_depth=3, funcptr_params=1),
+  "enums" : HeaderSpec(funcs=100, enums=1000, enumerators=32),
+  "typedef-chain" : HeaderSpec(funcs=2000, typedef_depth=64, ptr_depth=4),
+}
+
+PHASES = ["cpp", "parse", "func-visit", "enum-visit", "func-render", "enum-render"]
+
+
+def enum_opts(tmpDir):
+  return Namespace(
+    input = "synthetic.h", out_dir = tmpDir, dry_run = True,
+    skip = [], use_defenum = True, pkg_prefix = "bench/enums",
+  )
+
+def run_phases(fpath, timer):
+  cpp_args = "-I" + pycparser_fake_libc.directory
+  with timer.phase("cpp"):
+    text = preprocess_file(fpath, cpp_args=cpp_args)
+
+  with timer.phase("parse"):
+    with gc_paused():
+      node = c_parser.CParser().parse(text, fpath)
+
+  with timer.phase("func-visit"):
+    fv = FuncDeclVisitor(Namespace())
+    fv.visit(node)
+
+  with timer.phase("enum-visit"):
+    with redirect_stdout(io.StringIO()):
+      ev = EnumVisitor(enum_opts(os.path.dirname(fpath)))
+      ev.visit(node)
+
+  with timer.phase("func-render"):
+    exp = FuncDeclExporter(io.StringIO())
+    exp.dump_func_decls(fv._funcs, Namespace(pkg_prefix="bench", pkg_name="Wrapper"))
+
+  with timer.phase("enum-render"):
+    opts = enum_opts(os.path.dirname(fpath))
+    for name, enumerators in ev._enums.items():
+      expCls = NativeEnumExporter if ev.is_well_formed(enumerators) else EnumExporter
+      expCls(io.StringIO(), name, enumerators).dump_enums(opts)
+
+def run_scenario(spec, repeat):
+  """ Run one scenario.
+  @return Dict of phase name => dict of measurements. Times are the
+    best of `repeat` runs.
+  """
+  with tempfile.TemporaryDirectory() as tmpDir:
+    fpath = os.path.join(tmpDir, "synthetic.h")
+    with open(fpath, "w") as f:
+      f.write(gen_header(spec=spec))
+
+    results = {}
+    for _ in range(repeat):
+      timer = PhaseTimer()
+      run_phases(fpath, timer)
+      for name, m in timer.results.items():
+        best = results.setdefault(name, m)
+        for k, v in m.items():
+          best[k] = min(best[k], v)
+
+    # The times of the traced run are distorted by `tracemalloc` -
+    #  only the peak memory is kept.
+    timer = PhaseTimer(traceMemory=True)
+    run_phases(fpath, timer)
+    tracemalloc.stop()
+    for name, m in timer.results.items():
+      results[name]["peak_bytes"] = m["peak_bytes"]
+  return results
+
+def compare(baseline, current, threshold):
+  """ Compare the results against a baseline.
+  @return List of regression messages.
+  """
+  regressions = []
+  for scenario, phases in current["scenarios"].items():
+    base = baseline["scenarios"].get(scenario)
+    if base is None:
+      continue
+    for phase in PHASES:
+      for metric in ["wall", "peak_bytes"]:
+        old = base["phases"].get(phase, {}).get(metric)
+        new = phases["phases"].get(phase, {}).get(metric)
+        if old is None or new is None or old <= 0:
+          continue
+        change = (new - old) / old
+        status = "REGRESSION" if change > threshold else "ok"
+        print("{:14} {:12} {:10} {:>12.4g} -> {:>12.4g} ({:+.1%}) {}".format(
+          scenario, phase, metric, old, new, change, status
+        ))
+        if change > threshold:
+          regressions.append("{}/{}/{}: {:+.1%}".format(scenario, phase, metric, change))
+  return regressions
+
+def setup_opts():
+  parser = argparse.ArgumentParser(description="Wrapper Generator Benchmark Suite")
+  parser.add_argument("--scenario", action="append", choices=list(SCENARIOS.keys()) + ["custom"], help="Scenario to run. This argument can be used multiple times. Default is all of the predefined scenarios.")
+  parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs per scenario - the best is reported. Default is '%(default)s'")
+  parser.add_argument("--output", help="Write the results to this JSON file.")
+  parser.add_argument("--compare", help="Baseline JSON file to compare the results against.")
+  parser.add_argument("--threshold", type=float, default=0.2, help="Relative increase in wall time or peak memory that counts as a regression. Default is '%(default)s'")
+
+  custom = parser.add_argument_group("Custom Scenario")
+  for k, v in HeaderSpec().to_dict().items():
+    custom.add_argument("--{}".format(k.replace("_", "-")), type=int, default=v, help="Default is '%(default)s'")
+  return parser.parse_args()
+
+def main():
+  opts = setup_opts()
+  names = opts.scenario or list(SCENARIOS.keys())
+
+  current = {
+    "version": __version__,
+    "pycparser": pycparser.__version__,
+    "python": platform.python_version(),
+    "scenarios": {},
+  }
+  for name in names:
+    if name == "custom":
+      spec = HeaderSpec(**{k: getattr(opts, k) for k in HeaderSpec().to_dict().keys()})
+    else:
+      spec = SCENARIOS[name]
+    phases = run_scenario(spec, opts.repeat)
+    current["scenarios"][name] = {"spec": spec.to_dict(), "phases": phases}
+
+    print("Scenario: {} {}".format(name, spec.to_dict()))
+    for phase in PHASES:
+      m = phases[phase]
+      print("  {:12} wall {:8.4f} s  cpu {:8.4f} s  peak {:8.2f} MB".format(
+        phase, m["wall"], m["cpu"], m["peak_bytes"] / (1024 * 1024)
+      ))
+
+  if opts.output is not None:
+    with open(opts.output, "w") as f:
+      json.dump(current, f, indent=2)
+
+  if opts.compare is not None:
+    with open(opts.compare, "r") as f:
+      baseline = json.load(f)
+    regressions = compare(baseline, current, opts.threshold)
+    if len(regressions) > 0:
+      print("Regressions:")
+      for msg in regressions:
+        print("  {}".format(msg))
+      sys.exit(1)
+
+if __name__ == "__main__":
+  main()
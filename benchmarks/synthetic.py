@@ -0,0 +1,78 @@
+""" Synthetic C header generator for benchmarking the wrapper generator.
+"""
+from dataclasses import dataclass, asdict
+
+ARG_TYPES = ["int", "long", "double", "float", "char *", "const char *", "unsigned int", "void *"]
+
+
+@dataclass
+class HeaderSpec:
+  """ Parameters of a synthetic header.
+  """
+  # Number of function declarations
+  funcs:int = 1000
+  # Number of enums and the number of enumerators in each
+  enums:int = 0
+  enumerators:int = 8
+  # Length of the `typedef` alias chain - the functions use
+  #  the last type in the chain for some of their arguments.
+  typedef_depth:int = 0
+  # Maximum number of `*` on pointer arguments
+  ptr_depth:int = 1
+  # Number of function pointer parameters on every fourth function
+  funcptr_params:int = 0
+
+  def to_dict(self):
+    return asdict(self)
+
+
+def gen_typedefs(spec):
+  if spec.typedef_depth == 0:
+    return
+  yield "typedef int bench_t0;"
+  for i in range(1, spec.typedef_depth):
+    yield "typedef bench_t{} bench_t{};".format(i - 1, i)
+
+def gen_enums(spec):
+  for m in range(spec.enums):
+    yield "typedef enum {"
+    for k in range(spec.enumerators):
+      # Every other enum is sparse so that both enum
+      #  exporters get exercised.
+      value = k if m % 2 == 0 else k * 16 - 3
+      yield "  BENCH_E{}_V{} = {},".format(m, k, value)
+    yield "}} bench_enum_{};".format(m)
+
+def gen_arg(spec, i, j):
+  if spec.typedef_depth > 0 and (i + j) % 3 == 0:
+    base = "bench_t{}".format(spec.typedef_depth - 1)
+  else:
+    base = ARG_TYPES[(i + j) % len(ARG_TYPES)]
+  numPtrs = (i + j) % (spec.ptr_depth + 1) if spec.ptr_depth >= 1 else 0
+  return "{} {}a{}".format(base, "*" * numPtrs, j)
+
+def gen_functions(spec):
+  """ Generate function declarations with a mix of
+  argument counts and types.
+  """
+  for i in range(spec.funcs):
+    numArgs = i % 5
+    args = [gen_arg(spec, i, j) for j in range(numArgs)]
+    if i % 4 == 0:
+      for j in range(spec.funcptr_params):
+        args.append("void (*cb{})(int, {})".format(j, ARG_TYPES[j % len(ARG_TYPES)]))
+    ret = ARG_TYPES[i % len(ARG_TYPES)] if i % 4 else "void"
+    yield "extern {} bench_func_{}({});".format(ret, i, ", ".join(args) or "void")
+
+def gen_header(numFuncs=None, spec=None):
+  """ Generate the text of a synthetic header.
+  @param numFuncs Shorthand for a spec with only function declarations.
+  @param spec HeaderSpec
+  """
+  if spec is None:
+    spec = HeaderSpec(funcs=numFuncs)
+  lines = []
+  lines.extend(gen_typedefs(spec))
+  lines.extend(gen_enums(spec))
+  lines.extend(gen_functions(spec))
+  return "\n".join(lines) + "\n"
@@ -1,13 +1,18 @@
 #!/usr/bin/env python3
 import argparse
+import cProfile
 import os
+import sys
 import pkg_resources
 
-from pycparser import parse_file
-import pycparser_fake_libc
-
-from lbstanza_wrappers.EnumVisitor import EnumVisitor
-from lbstanza_wrappers.FuncDeclVisitor import FuncDeclVisitor
+from lbstanza_wrappers.Pipeline import process_enums, process_func_decl, process_all, process_from_ir
+from lbstanza_wrappers.Batch import load_manifest, run_batch
+from lbstanza_wrappers.Watch import Watcher
+from lbstanza_wrappers.Timings import PhaseTimer
+from lbstanza_wrappers.Sharding import SHARD_MODES
+from lbstanza_wrappers.ArrayPairs import DEFAULT_LEN_PATTERN
+from lbstanza_wrappers.OutParams import DEFAULT_OUT_PATTERN
+from lbstanza_wrappers.Selection import SymbolMatcher
 
 __version__ = pkg_resources.require("lbstanza-wrappers")[0].version
 
@@ -17,27 +22,53 @@ logging.basicConfig(
 )
 
 
-def prep_args(opts):
-  def to_header(fpath):
-    return "-I" + fpath
-  fake_libc_arg = to_header(pycparser_fake_libc.directory)
-  others = [to_header(x) for x in opts.include]
-  cpp_arg_list = others + [fake_libc_arg]
-  cpp_args = " ".join(cpp_arg_list)
-  return cpp_args
-
-def process_func_decl(opts):
-  cpp_args = prep_args(opts)
-  node = parse_file(opts.input, use_cpp=True, cpp_args=cpp_args)
-  v = FuncDeclVisitor(opts)
-  v.visit(node)
-  v.export()
-
-def process_enums(opts):
-  cpp_args = prep_args(opts)
-  node = parse_file(opts.input, use_cpp=True, cpp_args=cpp_args)
-  v = EnumVisitor(opts)
-  v.visit(node)
+def load_entries(opts):
+  if opts.save_ir is not None:
+    raise ValueError("Use a per-header 'save-ir' in the `--manifest` to save IR snapshots for multiple headers")
+  entries = [{"input": x, "include": []} for x in opts.headers]
+  if opts.manifest is not None:
+    entries += load_manifest(opts.manifest)
+  if len(entries) == 0:
+    raise ValueError("No Headers to Process - Pass header paths or a `--manifest`")
+  return entries
+
+def process_batch(opts):
+  entries = load_entries(opts)
+  results = run_batch(opts, entries)
+  if not all(x.ok for x in results):
+    sys.exit(1)
+
+def process_watch(opts):
+  watcher = Watcher(opts, load_entries(opts))
+  try:
+    watcher.run()
+  except KeyboardInterrupt:
+    logging.info("Stopped Watching")
+
+def add_enum_args(p):
+  p.add_argument("--use-defenum", action="store_true", help="Generate defenum structures for all well-formed C enums.")
+  p.add_argument("--skip", action="append", default=[], help="Don't generate any enumeration files for objects whose name matches the passed string. This argument can be used multiple times.")
+  p.add_argument("--flag-enums", action="store_true", help="Generate C enums whose values are bit flags as a flag set type instead of like any other enum.")
+  p.add_argument("--render-jobs", type=int, default=1, help="Number of worker processes used to render the enum packages. Useful for headers with thousands of enums. Default is '%(default)s'")
+  p.add_argument("--write-jobs", type=int, default=4, help="Number of threads used to write the enum packages. Default is '%(default)s'")
+
+def add_selection_args(p):
+  p.add_argument("--include-symbols", action="append", default=[], help="Only generate output for functions and enums whose name matches this glob, `re:` regular expression, or the names/patterns listed in an `@file`. This argument can be used multiple times.")
+  p.add_argument("--exclude-symbols", action="append", default=[], help="Don't generate output for functions and enums whose name matches this glob, `re:` regular expression, or the names/patterns listed in an `@file`. This argument can be used multiple times.")
+
+def add_func_decl_args(p):
+  p.add_argument("--dump-types", action="store_true", help="Dump the captured types, enums, structs, and functions to stdout.")
+  p.add_argument("--string-wrappers", action="store_true", help="Generate an additional `w_{name}_str` wrapper that takes and returns stanza Strings for functions with `const char *` arguments or returns.")
+  p.add_argument("--array-wrappers", action="store_true", help="Generate an additional `w_{name}_arr` wrapper that takes stanza arrays for functions with pointer + length argument pairs. See 'Array Wrappers' below.")
+  p.add_argument("--array-len-pattern", help="Regular expression for the names of the length arguments in `--array-wrappers`. Default is '{}'".format(DEFAULT_LEN_PATTERN.replace("%", "%%")))
+  p.add_argument("--array-annotations", help="JSON file listing the [pointer, length] argument pairs of specific functions. Implies `--array-wrappers`.")
+  p.add_argument("--out-wrappers", action="store_true", help="Generate an additional `w_{name}_out` wrapper that returns the values of the out parameters for functions with out parameters. See 'Out Parameter Wrappers' below.")
+  p.add_argument("--out-param-pattern", help="Regular expression for the names of the out parameters in `--out-wrappers`. Default is '{}'".format(DEFAULT_OUT_PATTERN.replace("%", "%%")))
+  p.add_argument("--out-annotations", help="JSON file listing the out parameters of specific functions. Implies `--out-wrappers`.")
+  p.add_argument("--struct-accessors", action="store_true", help="Generate lostanza accessors that read and write the members of the structs in place. See 'Struct Accessors' below.")
+  p.add_argument("--shard-by", choices=SHARD_MODES, help="Split the function declarations into multiple packages by symbol prefix, by declaring header, or into fixed size chunks. See 'Sharded Output' below.")
+  p.add_argument("--shard-size", type=int, default=500, help="Number of functions per package for `--shard-by count`. Default is '%(default)s'")
+  p.add_argument("--shard-prefix-parts", type=int, default=2, help="Number of `_` separated name components in the prefix for `--shard-by prefix`. Default is '%(default)s'")
 
 def setup_opts():
   desc = """
@@ -67,6 +98,108 @@ def setup_opts():
   means it no longer needs the compile-time flag hack previous
   versions of this tool used.
 
+  With `--string-wrappers`, functions with `const char *` arguments or
+  returns also get a wrapper that can be called from HiStanza with
+  Strings, eg for `int some_func(const char * s, int n)`:
+
+     public lostanza defn w_some_func_str (s:ref<String>, n:ref<Int>) -> ref<Int> :
+       val ret = w_some_func(addr!(s.chars), n.value)
+       return new Int{ret}
+
+  The String's own bytes are passed to C - there is no copy. A
+  `const char *` return is copied into a new String, or is `false`
+  for NULL. Only `const` strings are converted because C may modify
+  or keep a non-const buffer. Functions with other pointer arguments
+  don't get this wrapper.
+
+  Array Wrappers
+  --------------
+
+  With `--array-wrappers`, functions with a pointer to a numeric type
+  followed by an integer length argument also get a wrapper that takes
+  a stanza array in place of the pair, eg for
+  `int send_buf(int fd, const char * buf, int n)`:
+
+     public lostanza defn w_send_buf_arr (fd:ref<Int>, buf:ref<ByteArray>) -> ref<Int> :
+       val ret = w_send_buf(fd.value, addr!(buf.data), buf.length as int)
+       return new Int{ret}
+
+  The array's own storage is passed to C - there is no copy - so C can
+  also fill a non-const buffer. `char`, `int`, `long`, `float`, and
+  `double` pointers take ByteArray, IntArray, LongArray, FloatArray,
+  and DoubleArray. The length is the number of elements of the array.
+  The C element and length types must have the same size as the
+  stanza types - ie, `short *` and `uint16_t *` pointers, or a
+  `size_t` length that is an `int` in stanza, don't form a pair.
+
+  A pair is recognized when the name of the length argument matches
+  `--array-len-pattern` - ie, `n`, `len`, `size`, `count`, `buf_len`,
+  `nbytes`. For names that don't fit, list the pairs of each function
+  in an `--array-annotations` file:
+
+     {"send_raw": [["data", "bytes"]]}
+
+  The annotated functions only use the listed pairs, and their `void *`
+  arguments take a ByteArray.
+
+  Out Parameter Wrappers
+  ----------------------
+
+  With `--out-wrappers`, functions that return results through
+  pointer arguments also get a wrapper that returns those results, eg
+  for `int get_size(int id, int * out_w, double * out_scale)`:
+
+     defn w_get_size_out_values (v0:Int, v1:Int, v2:Double) -> [Int, Int, Double] :
+       [v0, v1, v2]
+     public lostanza defn w_get_size_out (id:ref<Int>) -> ref<[Int, Int, Double]> :
+       var out_w:int = 0
+       var out_scale:double = 0.0
+       val ret = w_get_size(id.value, addr(out_w), addr(out_scale))
+       return w_get_size_out_values(new Int{ret}, new Int{out_w}, new Double{out_scale})
+
+  The out values are local variables of the wrapper - nothing is
+  allocated on the heap for the call. The return value of the function
+  comes first, then the out values in argument order. A single value is
+  returned without a tuple, ie `val [ret, w, scale] = w_get_size_out(3)`
+  but `val w = w_get_width_out(3)` for `void get_width(int id, int * out)`.
+
+  An out parameter is a non-const pointer to `int`, `long`, `float`,
+  `double` or `unsigned char` whose name matches `--out-param-pattern` -
+  ie, `out`, `result`, `out_w`, `width_out`, `outCount`. The C type
+  must have the size of its stanza type - a `short *`, or a `size_t *`
+  that is an `int` in stanza, is not an out parameter and functions with
+  such a pointer don't get the wrapper. For names that
+  don't fit, list the out parameters of each function in an
+  `--out-annotations` file:
+
+     {"parse_int": ["value"]}
+
+  The annotated functions only use the listed parameters, and can also
+  use `char *` parameters.
+
+  Struct Accessors
+  ----------------
+
+  With `--struct-accessors`, the members of each struct defined in the
+  header are captured and laid out as the x86-64 System V ABI does -
+  nested structs and arrays included. Lostanza functions are generated
+  that read and write the members directly in memory, eg for
+  `typedef struct { char tag; double x; int v[4]; } point_t;`:
+
+     public lostanza defn point_t_x (p:ptr<?>) -> double :
+       return [(p + 8) as ptr<double>]
+     public lostanza defn point_t_x_set (p:ptr<?>, v:double) -> ref<False> :
+       [(p + 8) as ptr<double>] = v
+       return false
+     public lostanza defn point_t_v (p:ptr<?>, i:long) -> int :
+       return [(p + 16 + i * 4) as ptr<int>]
+
+  There is also `point_t_sizeof`, `point_t_alignof`, and an
+  `_offsetof` function for each member. A nested struct member returns
+  the address of the nested struct. Structs with bit fields, unions, or
+  array sizes that aren't constants stay opaque. Packed structs are not
+  detected - their accessors would use the wrong offsets.
+
   Enum Generator
   --------------
   This sub-command will generate a stanza Enum definition for each
@@ -76,7 +209,197 @@ def setup_opts():
   in stanza. "Well-Formed" in this context means values start at zero and
   increase monotonically without gaps.
   For non-"Well-Formed" C-enums, this will generate a backup implementation
-  that is not as pretty or performant.
+  that is not as pretty or performant. Its constructor from an integer
+  value indexes a table when the values are mostly contiguous (with any
+  starting value) and binary searches a sorted table of the values
+  otherwise - so converting a value is fast even for enums with
+  thousands of enumerators.
+
+  With `--flag-enums`, C-enums whose values are bit flags - eg
+  `FOO_A = 1 << 0`, `FOO_B = 1 << 1` - generate a flag set type
+  instead. A flag set is a single object holding the `int` value; the
+  enumerators are combined with `|` and `&` and tested with `contains?`:
+
+    val mode = FOO_A | FOO_B
+    if contains?(mode, FOO_B) : ...
+
+  The wrappers convert to and from the C value without boxing with the
+  lostanza `Foo(v:int)` constructor and `bits(f)`. An enum is a flag enum
+  if at least two values are single bits, every other value is zero or a
+  combination of those bits and the values are not contiguous. The
+  flag set type doesn't have the `match`-able type per enumerator of the
+  other enums, so this is opt-in. The converted enums are logged.
+
+  Enumerator values can be any integer constant expression, including
+  references to earlier enumerators - eg `FOO_RW = FOO_R | FOO_W`.
+
+  The enums are collected while walking the header and then rendered and
+  written once the walk is finished. For headers with thousands of enums,
+  `--render-jobs` renders the packages in a pool of worker processes and
+  `--write-jobs` sets the number of threads writing the files.
+
+  All
+  ---
+  This sub-command runs both the Enum and Function Declaration
+  generators from a single parse and a single walk of the header. The
+  enum packages are written to `--out-dir` and the wrapper package to
+  `--output`.
+
+  Sharded Output
+  --------------
+  For large APIs, a single wrapper package is slow to compile and any
+  change recompiles all of it. With `--shard-by`, the `func-decl` and `all`
+  sub-commands split the functions into multiple packages:
+
+    prefix - By the leading `_` separated components of the name,
+             eg `Z3_mk_int` => `Z3_mk` with `--shard-prefix-parts 2`
+    header - By the header that declared the function. Headers with
+             the same file name are named by their parent directories.
+    count  - Into packages of `--shard-size` functions.
+
+  The shards are written to `{dir of --output}/{pkg-name}/{shard}.stanza` as
+  the packages `{pkg-prefix}/{pkg-name}/{shard}`, and `--output` contains
+  an umbrella package `{pkg-prefix}/{pkg-name}` that forwards all of them.
+  Only the shards whose content changed are rewritten. In the
+  `stanza.proj`:
+
+    packages {pkg-prefix}/{pkg-name}/* defined-in "{pkg-name}/"
+
+  Batch Mode
+  ----------
+  This sub-command runs the `enums` or `func-decl` extraction on many
+  headers at once, spreading the work across a pool of `--jobs` worker
+  processes. Headers can be passed on the command line or listed in a
+  JSON `--manifest`:
+
+    [
+      "include/foo.h",
+      {"input": "include/bar.h", "pkg-prefix": "bar/lib", "pkg-name": "Bar"}
+    ]
+
+  Each header gets its own output - `{out-dir}/{pkg-name}.stanza` for
+  `func-decl` and `{out-dir}/{pkg-name}/` for `enums`. The package name
+  defaults to the header's file name - headers with the same file name
+  in different directories need a `pkg-name` in the manifest, otherwise
+  the batch stops before writing anything. Errors are reported per
+  header, and a failure in one header does not stop the others.
+
+  Watch Mode
+  ----------
+  The `watch` sub-command stays running and regenerates the output of
+  each header whenever the header, or any header it includes, changes.
+  It takes the same headers, `--manifest` and output options as `batch`.
+  The included headers are found from the preprocessor output and their
+  modification times are polled every `--interval` seconds. Once a change
+  is seen, the files must stop changing for `--debounce` seconds before
+  the affected headers are regenerated - so saving many files at once
+  only regenerates once. The parser is kept between runs, and a header
+  whose preprocessed content is unchanged (ie, only comments were edited)
+  is not parsed or written again. `--stream` does not apply in this mode:
+
+    $> python convert2stanza.py watch --manifest headers.json --extract all --out-dir src/wrappers
+
+  Stop it with Ctrl-C.
+
+  IR Snapshots
+  ------------
+  With `--save-ir FILE`, the `enums`, `func-decl` and `all` sub-commands
+  save the declarations captured from the header - the type table, the
+  functions and the enumerators - to a versioned snapshot file. The
+  `from-ir` sub-command then renders the stanza packages from the
+  snapshot without running the preprocessor or the parser. This is
+  useful when only the output options change - eg, `--pkg-prefix`,
+  `--pkg-name`, `--use-defenum` or the sharding options:
+
+    $> python convert2stanza.py -i foo.h --save-ir foo.ir func-decl --func-form both ...
+    $> python convert2stanza.py from-ir foo.ir --pkg-prefix foo --output foo.stanza ...
+
+  The snapshot holds what the original command captured - the
+  `--only-from` filter and symbol selection were already applied. The
+  symbol selection options of `from-ir` can narrow it further. A
+  snapshot from an older version of this tool is rejected and must be
+  regenerated.
+
+  Symbol Selection
+  ----------------
+  The `enums`, `func-decl`, `all` and `batch` sub-commands accept
+  `--include-symbols` and `--exclude-symbols` to select the functions and
+  enums by name. Each pattern is a glob (`gl*`), a regular expression
+  (`re:^gl[A-Z]`) or a file listing one name or pattern per line (`@used.txt`).
+  If any include patterns are given, only the matching names are
+  generated. Excluded names are never generated. Unlike these, `--skip`
+  only applies to the enums.
+
+  Origin Filter
+  -------------
+  The preprocessed header includes the declarations of every header
+  it includes - the system headers in particular. With `--only-from`,
+  output is only generated for the functions and enums declared in the
+  selected headers. The other headers still provide the typedefs and
+  structs those declarations use. A directory selects every header below
+  it and globs are matched against the absolute path of the header:
+
+    $> python convert2stanza.py -i /usr/include/foo.h --only-from /usr/include/foo.h ...
+    $> python convert2stanza.py -i include/foo.h --only-from include/ ...
+
+  The filter above is applied after the parse so the parser still
+  processes every included header. With `--slice`, the declarations
+  from the other headers are removed from the preprocessed text before
+  the parse - except for the typedefs, struct/union/enum definitions and
+  enumerators that the selected declarations depend on. The dependencies
+  are found by matching identifiers, so a few extra declarations may be
+  kept, but the output is the same as without `--slice`.
+
+  Parse Cache
+  -----------
+  Parsing large headers is the most expensive part of the extraction.
+  With `--cache-dir`, the parsed result is stored on disk keyed by the
+  preprocessed content of the header, the `cpp` arguments and the
+  pycparser version. The header is still run through the preprocessor
+  on every invokation, but unchanged headers skip the parse.
+
+  Parallel Parse
+  --------------
+  With `--parse-jobs N`, the preprocessed header is split at top-level
+  declaration boundaries and the pieces are parsed by N worker processes.
+  The typedefs are parsed in order first so that each worker knows
+  the typedef names declared before its piece. The result is identical
+  to the single process parse. In batch mode, `--parse-jobs` applies
+  within each header, in addition to the `--jobs` header workers.
+
+  Streaming
+  ---------
+  By default, the whole header is parsed into one AST before any of it
+  is captured. For very large headers, the AST can take several GB.
+  With `--stream`, the preprocessed header is parsed a few declarations
+  at a time and each fragment of the AST is released as soon as it is
+  captured, so peak memory follows the size of the captured
+  declarations instead. The output is the same. `--cache-dir` and
+  `--parse-jobs` don't apply in this mode.
+
+  Fast Visit
+  ----------
+  By default, every node of the parsed header is visited - including
+  the bodies of `static inline` functions and every expression in them.
+  With `--fast-visit`, only the declaration structure is walked:
+  top-level declarations, their pointer/array/function types, parameter
+  lists and struct/union members. This is much faster for headers with
+  many inline helpers. The only difference in output is that types and
+  enums declared inside function bodies are ignored.
+
+  Timings and Profiling
+  ---------------------
+  `--timings` prints the wall and CPU time spent in each phase -
+  preprocess, parse, visit, render and write - to stderr when the
+  command finishes. `--timings-json FILE` saves the same numbers for
+  later comparison. `--trace-malloc` adds the peak memory allocated in
+  each phase. For a function level breakdown, `--profile FILE` runs
+  the command under cProfile:
+
+    $> python convert2stanza.py --profile gen.prof -i foo.h func-decl ...
+    $> python -m pstats gen.prof
+
+  In batch mode, the timings of all headers are added together.
 
   Logging
   -------
@@ -91,14 +414,31 @@ def setup_opts():
   parser.add_argument("-i", "--input", type=str, help="Path to the header file that will be parsed for function declarations")
   parser.add_argument("-I", "--include", action="append", default=[], help="Add an additional search path for headers. This arg can be used multiple times.")
 
+  parser.add_argument("--slice", action="store_true", help="Drop the declarations not selected by `--only-from` before the parse, except those needed to parse and resolve the selected declarations. See 'Origin Filter' below.")
+  parser.add_argument("--only-from", action="append", default=[], help="Only generate output for declarations from headers under this directory, or matching this path or glob. Declarations from other headers are still used to resolve types. This arg can be used multiple times.")
+
+  parser.add_argument("--cache-dir", help="Directory for caching parsed headers. Repeat runs on unchanged headers skip the parse. Can be shared by concurrent builds.")
+  parser.add_argument("--cache-max-size", type=int, default=512, help="Maximum size of the `--cache-dir` in MB. Least recently used entries are evicted first. Default is '%(default)s'")
+
+  parser.add_argument("--stream", action="store_true", help="Parse and capture the header a few declarations at a time instead of building the whole AST. Reduces peak memory on very large headers. See 'Streaming' below.")
+  parser.add_argument("--fast-visit", action="store_true", help="Only walk the declaration structure of the AST - function bodies and expressions are skipped. See 'Fast Visit' below.")
+  parser.add_argument("--parse-jobs", type=int, default=1, help="Split the parse of the header across this many worker processes. Useful for very large headers. Default is '%(default)s'")
+
+  parser.add_argument("--save-ir", help="Save the captured declarations to this snapshot file. Render it later with the `from-ir` sub-command. See 'IR Snapshots' below.")
+
+  parser.add_argument("--timings", action="store_true", help="Print the wall and CPU time of each phase (preprocess, parse, visit, render, write) to stderr.")
+  parser.add_argument("--timings-json", help="Write the per-phase timings to this JSON file.")
+  parser.add_argument("--trace-malloc", action="store_true", help="Measure the peak memory allocated in each phase with `tracemalloc`. Implies `--timings` unless `--timings-json` is used.")
+  parser.add_argument("--profile", help="Run the generator under cProfile and write the stats to this file. View with `python -m pstats`")
+
   sub = parser.add_subparsers(help="Extraction Operations")
 
   ep = sub.add_parser("enums", help="Extract Enumerated Types into a Stanza Style")
   ep.add_argument("--pkg-prefix", help="Prefix string when declaring the 'defpackage'")
   ep.add_argument("--out-dir", help="Directory where stanza files will be created.")
   ep.add_argument("--dry-run", action="store_true", help="Generate all output to stdout instead of files in the `--out-dir`.")
-  ep.add_argument("--use-defenum", action="store_true", help="Generate defenum structures for all well-formed C enums.")
-  ep.add_argument("--skip", action="append", default=[], help="Don't generate any enumeration files for objects whose name matches the passed string. This argument can be used multiple times.")
+  add_enum_args(ep)
+  add_selection_args(ep)
   ep.set_defaults(func=process_enums)
 
   fp = sub.add_parser("func-decl", help="Extract Function Declarations into a Stanza Style")
@@ -107,15 +447,94 @@ def setup_opts():
   fp.add_argument("--output", help="Output file that will contain the wrapper declarations")
   fp.add_argument("--func-form", required=True, choices=['static', 'dynamic', 'both'], help="Select which form of function declaration output to generate.")
   fp.add_argument("--dry-run", action="store_true", help="Generate all output to stdout instead of to file.")
-  fp.add_argument("--dump-types", action="store_true", help="Dump the captured types, enums, structs, and functions to stdout.")
+  add_func_decl_args(fp)
+  add_selection_args(fp)
   fp.set_defaults(func=process_func_decl)
 
+  ap = sub.add_parser("all", help="Extract both Enumerated Types and Function Declarations from a single parse of the header")
+  ap.add_argument("--pkg-prefix", help="Prefix string when declaring the 'defpackage'")
+  ap.add_argument("--enum-pkg-prefix", help="Prefix string when declaring the enum 'defpackage's. Default is the `--pkg-prefix`")
+  ap.add_argument("--pkg-name", default="Wrapper", help="Name of the package containing the func decl. Default is '%(default)s'")
+  ap.add_argument("--output", help="Output file that will contain the wrapper declarations")
+  ap.add_argument("--out-dir", help="Directory where the enum stanza files will be created.")
+  ap.add_argument("--func-form", required=True, choices=['static', 'dynamic', 'both'], help="Select which form of function declaration output to generate.")
+  ap.add_argument("--dry-run", action="store_true", help="Generate all output to stdout instead of to files.")
+  add_enum_args(ap)
+  add_func_decl_args(ap)
+  add_selection_args(ap)
+  ap.set_defaults(func=process_all)
+
+  ip = sub.add_parser("from-ir", help="Generate the stanza packages from an IR snapshot saved with `--save-ir`")
+  ip.add_argument("snapshot", help="Path to the IR snapshot file.")
+  ip.add_argument("--pkg-prefix", help="Prefix string when declaring the 'defpackage'")
+  ip.add_argument("--enum-pkg-prefix", help="Prefix string when declaring the enum 'defpackage's. Default is the `--pkg-prefix`")
+  ip.add_argument("--pkg-name", default="Wrapper", help="Name of the package containing the func decl. Default is '%(default)s'")
+  ip.add_argument("--output", help="Output file that will contain the wrapper declarations")
+  ip.add_argument("--out-dir", help="Directory where the enum stanza files will be created.")
+  ip.add_argument("--func-form", default="both", choices=['static', 'dynamic', 'both'], help="Select which form of function declaration output to generate. Default is '%(default)s'")
+  ip.add_argument("--dry-run", action="store_true", help="Generate all output to stdout instead of to files.")
+  add_enum_args(ip)
+  add_func_decl_args(ip)
+  add_selection_args(ip)
+  ip.set_defaults(func=process_from_ir)
+
+  bp = sub.add_parser("batch", help="Run an extraction on many headers using a process pool")
+  bp.add_argument("headers", nargs="*", default=[], help="Paths to the headers to process.")
+  bp.add_argument("--manifest", help="JSON file listing the headers to process with optional per-header 'pkg-prefix', 'pkg-name', 'output', 'out-dir', 'include' and 'save-ir' values.")
+  bp.add_argument("--extract", default="func-decl", choices=["enums", "func-decl", "all"], help="Select which extraction to run on each header. Default is '%(default)s'")
+  bp.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="Number of worker processes. Default is '%(default)s'")
+  bp.add_argument("--pkg-prefix", help="Prefix string when declaring the 'defpackage'")
+  bp.add_argument("--out-dir", default=".", help="Directory where stanza files will be created. Default is '%(default)s'")
+  bp.add_argument("--func-form", default="both", choices=['static', 'dynamic', 'both'], help="Select which form of function declaration output to generate. Default is '%(default)s'")
+  bp.add_argument("--dry-run", action="store_true", help="Generate all output to stdout instead of to files. Output is printed in header order.")
+  add_enum_args(bp)
+  add_func_decl_args(bp)
+  add_selection_args(bp)
+  bp.set_defaults(func=process_batch)
+
+  wp = sub.add_parser("watch", help="Regenerate the output of headers whenever they or the headers they include change")
+  wp.add_argument("headers", nargs="*", default=[], help="Paths to the headers to watch.")
+  wp.add_argument("--manifest", help="JSON file listing the headers to watch - See the `batch` sub-command.")
+  wp.add_argument("--extract", default="func-decl", choices=["enums", "func-decl", "all"], help="Select which extraction to run on each header. Default is '%(default)s'")
+  wp.add_argument("--interval", type=float, default=0.5, help="Seconds between checks for changed files. Default is '%(default)s'")
+  wp.add_argument("--debounce", type=float, default=0.5, help="Seconds without further changes before regenerating. Default is '%(default)s'")
+  wp.add_argument("--pkg-prefix", help="Prefix string when declaring the 'defpackage'")
+  wp.add_argument("--out-dir", default=".", help="Directory where stanza files will be created. Default is '%(default)s'")
+  wp.add_argument("--func-form", default="both", choices=['static', 'dynamic', 'both'], help="Select which form of function declaration output to generate. Default is '%(default)s'")
+  wp.add_argument("--dry-run", action="store_true", help="Generate all output to stdout instead of to files.")
+  add_enum_args(wp)
+  add_func_decl_args(wp)
+  add_selection_args(wp)
+  wp.set_defaults(func=process_watch)
+
   opts = parser.parse_args()
+  try:
+    SymbolMatcher.from_opts(opts)
+  except (ValueError, OSError) as exc:
+    parser.error(str(exc))
   return opts
 
 def main():
   opts = setup_opts()
-  opts.func(opts)
+
+  opts.timer = None
+  if opts.timings or opts.timings_json or opts.trace_malloc:
+    opts.timer = PhaseTimer(traceMemory=opts.trace_malloc)
+
+  if opts.profile is not None:
+    prof = cProfile.Profile()
+    try:
+      prof.runcall(opts.func, opts)
+    finally:
+      prof.dump_stats(opts.profile)
+  else:
+    opts.func(opts)
+
+  if opts.timer is not None:
+    if opts.timings_json is not None:
+      opts.timer.dump_json(opts.timings_json)
+    if opts.timings or opts.timings_json is None:
+      opts.timer.report()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,142 @@
+import re
+import json
+from collections import OrderedDict
+
+from lbstanza_wrappers.StructLayout import stanza_primitive
+
+# Names of length arguments - `n`, `len`, `data_len`, `bufSize`, `nbytes`, etc
+DEFAULT_LEN_PATTERN = r"(?i)^(n|len|length|size|count|cnt|num)$|(len|length|size|count|cnt)$|^(n|num)_?(bytes|items|elems|elements|values|vals|chars|entries)$"
+
+# Stanza primitive of the pointed to type => Stanza array type
+#  whose storage can be passed to C.
+ARRAY_TYPES = {
+  "byte" : "ByteArray",
+  "int" : "IntArray",
+  "long" : "LongArray",
+  "float" : "FloatArray",
+  "double" : "DoubleArray",
+}
+# Stanza primitives of the length argument
+LENGTH_TYPES = ["int", "long"]
+
+
+class ArrayPairs(object):
+  """ Find the pointer + length argument pairs of a function - eg,
+  `int write(int fd, const char * buf, size_t n)`. The pointer can
+  then be passed the storage of a stanza array and the length
+  argument its length.
+  A pair is a pointer to a numeric type followed by an integer argument
+  whose name matches the length pattern. The C element type must have
+  the size of the stanza array element and the C length type the size
+  of an `int` or `long` - ie, `short *` can't be passed an IntArray. An annotation file lists the
+  pairs for specific functions instead:
+
+    {
+      "write": [["buf", "n"]],
+      "memset_all": [["dst", "count"]]
+    }
+
+  For the annotated functions, only the listed pairs are used and a
+  `void *` is passed a ByteArray.
+  """
+
+  def __init__(self, lenPattern=DEFAULT_LEN_PATTERN, annotations={}):
+    """
+    @param lenPattern Regular expression matched against the name
+      of the argument after a pointer.
+    @param annotations Dict of function name => list of (pointer
+      argument, length argument) names.
+    """
+    try:
+      self._lenPattern = re.compile(lenPattern)
+    except re.error as exc:
+      raise ValueError("Invalid Array Length Pattern '{}': {}".format(lenPattern, exc))
+    self._annotations = annotations
+
+  @classmethod
+  def from_opts(cls, opts):
+    """ Construct the pair finder from the command line options
+    @return ArrayPairs or None if array wrappers are not enabled.
+    """
+    fpath = getattr(opts, "array_annotations", None)
+    if not getattr(opts, "array_wrappers", False) and fpath is None:
+      return None
+    annotations = {}
+    if fpath is not None:
+      annotations = cls.load_annotations(fpath)
+    pattern = getattr(opts, "array_len_pattern", None) or DEFAULT_LEN_PATTERN
+    return cls(pattern, annotations)
+
+  @staticmethod
+  def load_annotations(fpath):
+    with open(fpath, "r") as f:
+      content = json.load(f)
+    if not isinstance(content, dict):
+      raise ValueError("{}: Array Annotations must be a JSON object of function name => pairs".format(fpath))
+    ret = {}
+    for name, pairs in content.items():
+      if not isinstance(pairs, list) or not all(isinstance(x, list) and len(x) == 2 for x in pairs):
+        raise ValueError("{}: Pairs of '{}' must be a list of [pointer, length] argument names".format(fpath, name))
+      ret[name] = [tuple(x) for x in pairs]
+    return ret
+
+  @staticmethod
+  def array_type(argType, layout, allowVoid):
+    """
+    @param layout CLayout of the pointed to type or None
+    @return Stanza array type for a pointer argument or None
+    """
+    lbType, numPtrs, _ = argType.resolve()
+    if numPtrs != 1:
+      return None
+    base = lbType.to_stanza()
+    if allowVoid and base == "void":
+      return "ByteArray"
+    if stanza_primitive(layout) != base:
+      return None
+    return ARRAY_TYPES.get(base)
+
+  @staticmethod
+  def is_length(argType, layout):
+    """
+    @param layout CLayout of the argument or None
+    """
+    if argType.resolve()[1] != 0:
+      return False
+    base = argType.to_stanza()
+    return base in LENGTH_TYPES and stanza_primitive(layout) == base
+
+  def find(self, name, data):
+    """ Find the pointer + length pairs of a function
+    @param name Name of the function
+    @param data FunctionData
+    @return OrderedDict of pointer argument name => Tuple of
+      (length argument name, stanza array type)
+    """
+    ret = OrderedDict()
+    args = data.args
+    layouts = data.layouts
+    annotated = self._annotations.get(name)
+    if annotated is not None:
+      for ptrName, lenName in annotated:
+        if ptrName not in args or lenName not in args:
+          raise ValueError("Array Annotation of '{}': No argument named '{}' or '{}'".format(name, ptrName, lenName))
+        arrType = self.array_type(args[ptrName], layouts.get(ptrName), True)
+        if arrType is None or not self.is_length(args[lenName], layouts.get(lenName)):
+          raise ValueError("Array Annotation of '{}': '{}' is not a numeric pointer or '{}' is not an integer of the same size in C and stanza".format(
+            name, ptrName, lenName
+          ))
+        ret[ptrName] = (lenName, arrType)
+      return ret
+
+    names = list(args.keys())
+    for ptrName, lenName in zip(names, names[1:]):
+      if ptrName in ret or lenName in ret:
+        continue
+      arrType = self.array_type(args[ptrName], layouts.get(ptrName), False)
+      if arrType is None or not self.is_length(args[lenName], layouts.get(lenName)):
+        continue
+      if self._lenPattern.search(lenName) is None:
+        continue
+      ret[ptrName] = (lenName, arrType)
+    return ret
@@ -0,0 +1,210 @@
+import io
+import os
+import json
+import logging
+import traceback
+from argparse import Namespace
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from lbstanza_wrappers.Pipeline import EXTRACTORS
+from lbstanza_wrappers.Timings import PhaseTimer
+
+
+@dataclass
+class BatchResult:
+  """ Outcome of processing one header in a batch run.
+  """
+  input:str
+  ok:bool
+  # Anything the extraction wrote to stdout (ie, `--dry-run` output)
+  stdout:str
+  error:Optional[str] = None
+  trace:Optional[str] = None
+  # PhaseTimer results if `--timings` is enabled
+  timings:Optional[dict] = None
+
+
+# Manifest keys that hold paths. These are resolved relative to
+#  the directory containing the manifest file.
+MANIFEST_PATH_KEYS = ["input", "output", "out_dir", "save_ir", "array_annotations", "out_annotations"]
+
+def load_manifest(fpath):
+  """ Load a batch manifest file.
+  The manifest is a JSON list. Each element is either a string
+  (the path to a header) or an object with an "input" key and optional
+  per-header overrides, eg:
+
+    [
+      "include/foo.h",
+      {"input": "include/bar.h", "pkg-name": "Bar", "pkg-prefix": "bar/lib"}
+    ]
+
+  @param fpath Path to the manifest file.
+  @return List of dicts with argparse style (underscore) keys.
+  """
+  with open(fpath, "r") as f:
+    content = json.load(f)
+
+  if not isinstance(content, list):
+    raise ValueError("{}: Manifest must be a JSON list of headers".format(fpath))
+
+  baseDir = os.path.dirname(fpath)
+  entries = []
+  for i, item in enumerate(content):
+    if isinstance(item, str):
+      item = {"input": item}
+    elif not isinstance(item, dict) or "input" not in item:
+      raise ValueError("{}: Entry {} must be a path or an object with an 'input' key".format(fpath, i))
+
+    entry = {}
+    for k, v in item.items():
+      entry[k.replace("-", "_")] = v
+
+    for k in MANIFEST_PATH_KEYS:
+      if k in entry:
+        entry[k] = os.path.join(baseDir, entry[k])
+    entry["include"] = [os.path.join(baseDir, x) for x in entry.get("include", [])]
+    if "only_from" in entry:
+      entry["only_from"] = [os.path.join(baseDir, x) for x in entry["only_from"]]
+    entries.append(entry)
+  return entries
+
+def join_prefix(prefix, name):
+  """ Package prefix under the optional `--pkg-prefix`
+  """
+  return name if prefix is None else "{}/{}".format(prefix, name)
+
+def entry_opts(opts, entry):
+  """ Construct the options namespace for a single header in the batch.
+  Each header gets its own output:
+    - `func-decl` writes `{out_dir}/{pkg_name}.stanza`
+    - `enums` writes to `{out_dir}/{pkg_name}/` with the enum packages
+       declared under `{pkg_prefix}/{pkg_name}`
+    - `all` does both of the above.
+  Unless the manifest entry overrides these.
+  @param opts Batch command line options
+  @param entry Dict from the manifest or a header path from the command line.
+  """
+  # The `func` default is the batch sub-command itself and
+  #  isn't needed (or always picklable) in the worker.
+  ret = Namespace(**{k:v for k,v in vars(opts).items() if k != "func"})
+  # Each header is timed separately and the results are merged
+  #  by `run_batch`.
+  timer = getattr(opts, "timer", None)
+  if timer is not None:
+    ret.timer = PhaseTimer(timer.traceMemory)
+  ret.input = entry["input"]
+  ret.include = opts.include + entry.get("include", [])
+  ret.only_from = opts.only_from + entry.get("only_from", [])
+  ret.save_ir = entry.get("save_ir")
+
+  stem = os.path.splitext(os.path.basename(ret.input))[0]
+  ret.pkg_name = entry.get("pkg_name", stem)
+  ret.pkg_prefix = entry.get("pkg_prefix", opts.pkg_prefix)
+
+  # The wrapper package is written to the entry's `out_dir` - the
+  #  enum packages default to a sub-directory of the batch `out_dir`.
+  funcDir = entry.get("out_dir", opts.out_dir)
+  if opts.extract == "func-decl":
+    ret.out_dir = funcDir
+  else:
+    ret.out_dir = entry.get("out_dir", os.path.join(opts.out_dir, ret.pkg_name))
+
+  if opts.extract == "enums":
+    if "pkg_prefix" not in entry:
+      ret.pkg_prefix = join_prefix(opts.pkg_prefix, ret.pkg_name)
+  else:
+    ret.output = entry.get("output", os.path.join(funcDir, "{}.stanza".format(ret.pkg_name)))
+
+  if opts.extract == "all":
+    ret.enum_pkg_prefix = entry.get("enum_pkg_prefix", join_prefix(ret.pkg_prefix, ret.pkg_name))
+
+  for k, v in entry.items():
+    if k not in ["input", "include", "only_from", "pkg_name", "pkg_prefix", "out_dir", "output", "enum_pkg_prefix", "save_ir"]:
+      setattr(ret, k, v)
+  return ret
+
+def output_targets(opts):
+  """ The packages and files written for one header
+  @param opts Options from `entry_opts`
+  @return List of strings
+  """
+  ret = []
+  if opts.extract != "enums":
+    ret.append("package '{}'".format(join_prefix(opts.pkg_prefix, opts.pkg_name)))
+    ret.append("file '{}'".format(os.path.normpath(opts.output)))
+  if opts.extract != "func-decl":
+    prefix = opts.pkg_prefix if opts.extract == "enums" else opts.enum_pkg_prefix
+    ret.append("enum packages '{}/*' in '{}'".format(prefix, os.path.normpath(opts.out_dir)))
+  return ret
+
+def check_outputs(jobOpts):
+  """ Check that no two headers write the same packages or files -
+  ie, `a/foo.h` and `b/foo.h` both default to the package name `foo`.
+  @param jobOpts List of options from `entry_opts`
+  @throws ValueError if two headers collide.
+  """
+  owners = {}
+  for i, x in enumerate(jobOpts):
+    for target in output_targets(x):
+      other = owners.setdefault(target, i)
+      if other != i:
+        raise ValueError("Headers '{}' and '{}' both write the {} - Set a different 'pkg-name' for one of them in the `--manifest`".format(
+          jobOpts[other].input, x.input, target
+        ))
+
+def run_entry(opts):
+  """ Process Pool worker - runs the extraction for one header
+  and captures the result instead of raising.
+  """
+  out = io.StringIO()
+  timer = getattr(opts, "timer", None)
+  timings = None
+  try:
+    with redirect_stdout(out):
+      EXTRACTORS[opts.extract](opts)
+  except Exception as exc:
+    err = "{}: {}".format(type(exc).__name__, exc)
+    return BatchResult(opts.input, False, out.getvalue(), err, traceback.format_exc())
+  if timer is not None:
+    timings = timer.results
+  return BatchResult(opts.input, True, out.getvalue(), timings=timings)
+
+def run_batch(opts, entries):
+  """ Run an extraction over many headers.
+  The work is spread across a process pool of `opts.jobs` workers.
+  Results are always reported in the order of `entries` so that
+  the output does not depend on how the work was scheduled.
+  @param opts Batch command line options
+  @param entries List of dicts (see `load_manifest`)
+  @return List of BatchResult objects in the same order as `entries`
+  @throws ValueError if two headers write the same output.
+  """
+  jobOpts = [entry_opts(opts, e) for e in entries]
+  check_outputs(jobOpts)
+  if not opts.dry_run and opts.extract != "enums":
+    for x in jobOpts:
+      os.makedirs(os.path.dirname(x.output) or ".", exist_ok=True)
+
+  if opts.jobs <= 1 or len(jobOpts) <= 1:
+    results = [run_entry(x) for x in jobOpts]
+  else:
+    with ProcessPoolExecutor(max_workers=min(opts.jobs, len(jobOpts))) as pool:
+      results = list(pool.map(run_entry, jobOpts))
+
+  timer = getattr(opts, "timer", None)
+  for res in results:
+    if res.stdout:
+      print(res.stdout, end="")
+    if timer is not None and res.timings is not None:
+      timer.merge(res.timings)
+
+  failed = [x for x in results if not x.ok]
+  for res in failed:
+    logging.error("{}: Extraction Failed - {}".format(res.input, res.error))
+    logging.debug(res.trace)
+  logging.info("Batch Complete: {} headers processed, {} failed".format(len(results), len(failed)))
+  return results
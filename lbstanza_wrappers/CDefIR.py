@@ -1,29 +1,111 @@
+import weakref
 from dataclasses import dataclass
-from typing import OrderedDict
-
-from pycparser import c_ast
+from typing import Optional, OrderedDict
 
 class ToStanzable:
   """ Base class for Stanzable Definitions
     All inheritors must implement `to_stanza`
   """
+  __slots__ = ()
+
   def to_stanza(self):
     raise NotImplementedError("This class Failed to implement to stanza")
 
-@dataclass
-class Identifier(ToStanzable):
-  """ Identifier describes named symbols like 'int', 'char', etc.
+class Interned(ToStanzable):
+  """ Base class for the immutable IR values.
+  The values are hash-consed - constructing a value equal to an existing
+  value returns the existing object. For example, every `int` argument
+  of every function is the same `ArgType` object. The stanza string of
+  each value is computed once, on first use, and then cached.
+  Because of this, the values compare and hash by identity.
+  Inheritors list their fields in `_FIELDS` and implement `_to_stanza`.
+  Default values for the trailing fields are listed in `_DEFAULTS`.
   """
-  name:str
+  __slots__ = ("_stanza", "__weakref__")
+  _FIELDS = ()
+  _DEFAULTS = ()
+  _interned = weakref.WeakValueDictionary()
+
+  def __new__(cls, *args, **kwargs):
+    if len(kwargs) > 0:
+      args = cls._bind(args, kwargs)
+    if len(args) != len(cls._FIELDS):
+      args = cls._fill(args)
+    key = (cls, *args)
+    ret = cls._interned.get(key)
+    if ret is None:
+      ret = object.__new__(cls)
+      for name, value in zip(cls._FIELDS, args):
+        object.__setattr__(ret, name, value)
+      object.__setattr__(ret, "_stanza", None)
+      cls._interned[key] = ret
+    return ret
+
+  @classmethod
+  def _bind(cls, args, kwargs):
+    """ Convert keyword arguments to positional arguments
+    """
+    values = list(args)
+    for name in cls._FIELDS[len(args):]:
+      if name not in kwargs:
+        break
+      values.append(kwargs.pop(name))
+    if len(kwargs) > 0:
+      raise TypeError("{} got unexpected arguments: {}".format(cls.__name__, ", ".join(kwargs.keys())))
+    return tuple(values)
+
+  @classmethod
+  def _fill(cls, args):
+    """ Add the default values of the missing trailing arguments
+    """
+    numRequired = len(cls._FIELDS) - len(cls._DEFAULTS)
+    if len(args) < numRequired or len(args) > len(cls._FIELDS):
+      raise TypeError("{} expects the arguments: {}".format(cls.__name__, ", ".join(cls._FIELDS)))
+    return tuple(args) + cls._DEFAULTS[len(args) - numRequired:]
+
+  def __setattr__(self, name, value):
+    raise AttributeError("{} is immutable".format(self.__class__.__name__))
+
+  def __reduce__(self):
+    return (self.__class__, tuple(getattr(self, name) for name in self._FIELDS))
+
+  def __repr__(self):
+    fields = ", ".join("{}={!r}".format(name, getattr(self, name)) for name in self._FIELDS)
+    return "{}({})".format(self.__class__.__name__, fields)
 
   def to_stanza(self):
+    ret = self._stanza
+    if ret is None:
+      ret = self._to_stanza()
+      object.__setattr__(self, "_stanza", ret)
+    return ret
+
+  def _to_stanza(self):
+    raise NotImplementedError("This class Failed to implement to stanza")
+
+class Identifier(Interned):
+  """ Identifier describes named symbols like 'int', 'char', etc.
+  """
+  __slots__ = ("name",)
+  _FIELDS = ("name",)
+
+  def _to_stanza(self):
     return self.name
 
-@dataclass
+class CharIdentifier(Identifier):
+  """ The C `char` type. This is a `byte` in stanza - but unlike
+  the other types that map to `byte`, a `const char *` is a string.
+  """
+  __slots__ = ()
+
+@dataclass(eq=False)
 class EnumArg(ToStanzable):
   """ Defines an Enum Argument that is typically used in
   place of an Identifier
+  @NOTE - The enumerators are filled in after construction
+    so this type is not interned.
   """
+  __slots__ = ("enumVals",)
   enumVals:list[str]
 
   def to_stanza(self):
@@ -31,30 +113,116 @@ class EnumArg(ToStanzable):
     # interface.
     return "int"
 
-@dataclass
+class CLayout(Interned):
+  """ Size, alignment and kind of a C type in the x86-64 System V
+  ABI - See `StructLayout`. The kind is one of "signed", "unsigned",
+  "float", "pointer" or "struct".
+  This unpacks into the lostanza type used to read and write a
+  value of the type in memory.
+  """
+  __slots__ = ("size", "align", "kind")
+  _FIELDS = ("size", "align", "kind")
+
+  ACCESS_TYPES = {
+    ("signed", 1) : "byte",
+    ("unsigned", 1) : "byte",
+    # Stanza doesn't have a `short` type - 2 byte values
+    #  are accessed as bytes and converted to `int`.
+    ("signed", 2) : "int",
+    ("unsigned", 2) : "int",
+    ("signed", 4) : "int",
+    ("unsigned", 4) : "int",
+    ("signed", 8) : "long",
+    ("unsigned", 8) : "long",
+    ("float", 4) : "float",
+    ("float", 8) : "double",
+  }
+
+  def _to_stanza(self):
+    if self.kind in ["pointer", "struct"]:
+      return "ptr<?>"
+    ret = self.ACCESS_TYPES.get((self.kind, self.size))
+    if ret is None:
+      raise NotImplementedError("No Stanza Type for {} Type of Size {}".format(self.kind, self.size))
+    return ret
+
+@dataclass(eq=False)
+class StructMember:
+  """ Defines a member of a struct - the type of one element,
+  the layout of that type, and the offset of the member from
+  the start of the struct.
+  `dims` are the array dimensions - ie, `(2, 3)` for `int v[2][3]`
+  and `()` if the member is not an array. A flexible array
+  member has a dimension of 0.
+  """
+  __slots__ = ("argType", "layout", "dims", "offset")
+  argType:"ArgType"
+  layout:CLayout
+  dims:tuple
+  offset:int
+
+  @property
+  def count(self):
+    """ Number of elements in the member
+    """
+    ret = 1
+    for dim in self.dims:
+      ret *= dim
+    return ret
+
+  @property
+  def size(self):
+    return self.layout.size * self.count
+
+@dataclass(eq=False)
 class StructArg(ToStanzable):
   """ Defines an Struct Argument that is typically used in
   place of an Identifier
+  `members` is empty for opaque structs - either only declared
+  or with members whose layout can't be computed.
+  @NOTE - The members are filled in when the struct is defined
+    so this type is not interned.
   """
-  members:list[str]
+  __slots__ = ("members", "tag", "origin")
+  members:OrderedDict[str, StructMember]
+  # `foo` for `struct foo` - None for anonymous structs
+  tag:Optional[str]
+  # Path of the header that defined the struct - if known.
+  origin:Optional[str]
+
+  @property
+  def complete(self):
+    return len(self.members) > 0
+
+  @property
+  def align(self):
+    return max(m.layout.align for m in self.members.values())
+
+  @property
+  def size(self):
+    end = max(m.offset + m.size for m in self.members.values())
+    # Trailing padding makes the size a multiple of the alignment
+    return -(-end // self.align) * self.align
 
   def to_stanza(self):
     # We replace enums with int to satisfy the C calling
     # interface.
     return "struct"
 
-@dataclass
-class ArgType(ToStanzable):
+class ArgType(Interned):
   """ The ArgType encapsulates type and the number of pointers
   to that type.
   This typically unpacks into something like `int` for no
   pointers or  `ptr<int>` for 1 pointer.
   Example: Void or struct pointers unpack to `ptr<?>`
+  `isConst` is True if the base type is `const` qualified -
+  ie, `const char *`.
   """
-  lbType:ToStanzable
-  numPtrs:int
+  __slots__ = ("lbType", "numPtrs", "isConst")
+  _FIELDS = ("lbType", "numPtrs", "isConst")
+  _DEFAULTS = (False,)
 
-  def to_stanza(self) -> str:
+  def _to_stanza(self) -> str:
     if self.numPtrs > 0 :
       return self.to_ptr_str()
     else:
@@ -84,29 +252,57 @@ class ArgType(ToStanzable):
     suffix = ">" * self.numPtrs
     return prefix + ptrType + suffix
 
-@dataclass
-class ReturnType(ToStanzable):
+  def resolve(self):
+    """ Follow the typedefs to the base type.
+    @return Tuple of (base type, total number of pointers, isConst)
+    """
+    lbType = self.lbType
+    numPtrs = self.numPtrs
+    isConst = self.isConst
+    while isinstance(lbType, ArgType):
+      numPtrs += lbType.numPtrs
+      isConst = isConst or lbType.isConst
+      lbType = lbType.lbType
+    return (lbType, numPtrs, isConst)
+
+  def is_const_string(self):
+    """ Check whether this is a `const char *` - a C string that
+    the function doesn't modify.
+    """
+    lbType, numPtrs, isConst = self.resolve()
+    return numPtrs == 1 and isConst and isinstance(lbType, CharIdentifier)
+
+class ReturnType(Interned):
   """ Captures the Return Type from a Function
   This basically consists of an ArgType and a
   flag to indicate whether the return is `void` or not
   LoStanza doesn't handle `void` - it just expects everything
   to be converted to `int`
   """
-  retType:ArgType
-  isVoid:bool
+  __slots__ = ("retType", "isVoid")
+  _FIELDS = ("retType", "isVoid")
 
-  def to_stanza(self) -> str:
+  def _to_stanza(self) -> str:
     return self.retType.to_stanza()
 
-@dataclass
+@dataclass(eq=False)
 class FunctionData(ToStanzable):
   """ Function Declaration Data Type
   This encapsulates the args and return type that are used
   to generate the stanza code that wraps a C declaration.
   """
+  __slots__ = ("args", "ret", "origin", "layouts")
   args:OrderedDict[str, ArgType]
   ret:ReturnType
-  fdef:c_ast.Node
+  # Path of the header that declared this function - if known.
+  #  The IR doesn't reference the AST so that the AST can be
+  #  released as soon as a declaration is captured.
+  origin:Optional[str]
+  # Argument name => CLayout of the base type of the argument - the
+  #  type after the pointers, ie `short` for `short * v`. Only for
+  #  arithmetic and enum types. The stanza types don't keep the
+  #  size of the C type - ie, `short` and `size_t` can both be `int`.
+  layouts:dict[str, CLayout]
 
   def to_stanza(self) -> str:
     argStr = ",".join([v.to_stanza() for _,v in self.args.items()])
@@ -0,0 +1,93 @@
+from argparse import Namespace
+from pycparser import c_ast
+
+from lbstanza_wrappers.EnumVisitor import EnumVisitor
+from lbstanza_wrappers.FuncDeclVisitor import FuncDeclVisitor
+from lbstanza_wrappers.CDefIR import EnumArg
+from lbstanza_wrappers.PrunedWalk import iter_decl_nodes, TOP_LEVEL
+
+
+class CombinedVisitor(c_ast.NodeVisitor):
+  """ Run the Enum and Function Declaration extraction in a single
+  walk of the AST.
+  This dispatches each node to the `EnumVisitor` and `FuncDeclVisitor`
+  exactly as if each of them had walked the AST on its own:
+    - The FuncDeclVisitor handles `Typedef` and `Decl` nodes and does
+       not descend into them.
+    - The EnumVisitor handles `TypeDecl` nodes and does not descend
+       into them, and the `Enum` nodes outside of a `TypeDecl`.
+  """
+
+  def __init__(self, opts):
+    self._opts = opts
+    enumOpts = Namespace(**vars(opts))
+    if opts.enum_pkg_prefix is not None:
+      enumOpts.pkg_prefix = opts.enum_pkg_prefix
+    self.enums = EnumVisitor(enumOpts)
+    self.funcs = FuncDeclVisitor(opts)
+    # Number of Typedef/Decl nodes above the current node. The
+    #  FuncDeclVisitor only sees the outermost of these.
+    self._declDepth = 0
+    super().__init__()
+
+  def visit_Typedef(self, node):
+    self._visit_decl(node, self.funcs.visit_Typedef)
+
+  def visit_Decl(self, node):
+    self._visit_decl(node, self.funcs.visit_Decl)
+
+  def _visit_decl(self, node, handler):
+    if self._declDepth == 0:
+      handler(node)
+    self._declDepth += 1
+    try:
+      self.generic_visit(node)
+    finally:
+      self._declDepth -= 1
+
+  def visit_TypeDecl(self, node):
+    self.enums.visit_TypeDecl(node)
+    if self._declDepth == 0:
+      # A TypeDecl outside of any declaration (ie, a `Typename` in
+      #  a cast) - the FuncDeclVisitor would have walked into it.
+      self.funcs.visit(node)
+
+  def visit_Enum(self, node):
+    self.enums.visit_Enum(node)
+
+  def visit_pruned(self, root):
+    """ Faster alternative to `visit` that skips function bodies
+    and expressions - See `iter_decl_nodes`.
+    """
+    for node, parent in iter_decl_nodes(root, stop=(c_ast.TypeDecl,)):
+      if type(node) is c_ast.TypeDecl:
+        self.enums.visit_TypeDecl(node)
+      elif type(node) is c_ast.Enum:
+        self.enums.visit_Enum(node)
+      elif isinstance(parent, TOP_LEVEL):
+        if type(node) is c_ast.Typedef:
+          self.funcs.visit_Typedef(node)
+        elif type(node) is c_ast.Decl:
+          self.funcs.visit_Decl(node)
+
+  def link_enums(self):
+    """ Share the captured enumerators with the function declaration
+    type table so that `EnumArg` types list their values.
+    """
+    for name, t in self.funcs._types.items():
+      if isinstance(t, EnumArg) and len(t.enumVals) == 0:
+        enumerators = self.enums._enums.get(name, [])
+        t.enumVals.extend([eName for eName, _ in enumerators])
+
+  def snapshot(self):
+    self.link_enums()
+    return self.funcs.snapshot().merge(self.enums.snapshot())
+
+  def restore(self, snap):
+    self.funcs.restore(snap)
+    self.enums.restore(snap)
+
+  def export(self):
+    self.link_enums()
+    self.enums.export()
+    self.funcs.export()
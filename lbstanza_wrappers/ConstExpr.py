@@ -0,0 +1,107 @@
+import re
+from pycparser import c_ast
+
+# Suffixes of C integer constants - `10u`, `0x10UL`, etc
+INT_SUFFIX_RE = re.compile(r"[uUlL]+$")
+
+CHAR_ESCAPES = {
+  "n" : 10, "t" : 9, "r" : 13, "0" : 0, "\\" : 92, "'" : 39, '"' : 34,
+  "a" : 7, "b" : 8, "f" : 12, "v" : 11, "?" : 63,
+}
+
+
+def c_div(a, b):
+  """ C integer division truncates towards zero.
+  """
+  q = abs(a) // abs(b)
+  return q if (a < 0) == (b < 0) else -q
+
+BINARY_OPS = {
+  "<<" : lambda a, b: a << b,
+  ">>" : lambda a, b: a >> b,
+  "|" : lambda a, b: a | b,
+  "&" : lambda a, b: a & b,
+  "^" : lambda a, b: a ^ b,
+  "+" : lambda a, b: a + b,
+  "-" : lambda a, b: a - b,
+  "*" : lambda a, b: a * b,
+  "/" : c_div,
+  "%" : lambda a, b: a - b * c_div(a, b),
+  "==" : lambda a, b: int(a == b),
+  "!=" : lambda a, b: int(a != b),
+  "<" : lambda a, b: int(a < b),
+  "<=" : lambda a, b: int(a <= b),
+  ">" : lambda a, b: int(a > b),
+  ">=" : lambda a, b: int(a >= b),
+  "&&" : lambda a, b: int(bool(a) and bool(b)),
+  "||" : lambda a, b: int(bool(a) or bool(b)),
+}
+
+UNARY_OPS = {
+  "-" : lambda a: -a,
+  "+" : lambda a: a,
+  "~" : lambda a: ~a,
+  "!" : lambda a: int(not a),
+}
+
+
+def parse_int_constant(value):
+  """ Convert the text of a C integer or character constant to an int
+  """
+  if value.startswith("'"):
+    body = value[1:-1]
+    if body.startswith("\\"):
+      esc = body[1:]
+      if esc in CHAR_ESCAPES:
+        return CHAR_ESCAPES[esc]
+      if esc.startswith("x"):
+        return int(esc[1:], 16)
+      return int(esc, 8)
+    return ord(body)
+  value = INT_SUFFIX_RE.sub("", value)
+  # C octal constants - `010`. Python requires the `0o` prefix.
+  if len(value) > 1 and value[0] == "0" and value[1].isdigit():
+    return int(value, 8)
+  return int(value, 0)
+
+def eval_const(node, names={}):
+  """ Evaluate an integer constant expression like the value of an
+  enumerator - eg `(1 << 3) | FOO_A`.
+  @param node AST node of the expression
+  @param names Dict of identifier => value for the enumerators
+    that the expression can refer to.
+  @return int
+  @throws NotImplementedError if the expression is not a supported
+    integer constant expression.
+  """
+  t = type(node)
+  if t is c_ast.Constant:
+    # pycparser types integer constants as `int`, `unsigned long int`, etc
+    if node.type != "char" and not node.type.endswith("int"):
+      raise NotImplementedError("Unhandled Constant Type: {}".format(node.type))
+    return parse_int_constant(node.value)
+  elif t is c_ast.ID:
+    if node.name not in names:
+      raise NotImplementedError("Unknown Identifier in Constant Expression: {}".format(node.name))
+    return names[node.name]
+  elif t is c_ast.UnaryOp:
+    op = UNARY_OPS.get(node.op)
+    if op is None:
+      raise NotImplementedError("Unhandled Unary Op in Constant Expression: {}".format(node.op))
+    return op(eval_const(node.expr, names))
+  elif t is c_ast.BinaryOp:
+    op = BINARY_OPS.get(node.op)
+    if op is None:
+      raise NotImplementedError("Unhandled Binary Op in Constant Expression: {}".format(node.op))
+    # Both sides are always evaluated - constant
+    #  expressions have no side effects.
+    return op(eval_const(node.left, names), eval_const(node.right, names))
+  elif t is c_ast.TernaryOp:
+    if eval_const(node.cond, names):
+      return eval_const(node.iftrue, names)
+    return eval_const(node.iffalse, names)
+  elif t is c_ast.Cast:
+    # The casts in enumerator values are to integer types
+    return eval_const(node.expr, names)
+  else:
+    raise NotImplementedError("Unhandled AST Node in Constant Expression: {}".format(node))
@@ -1,105 +1,231 @@
+import io
 import os
 import logging
 import sys
+from argparse import Namespace
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from pycparser import c_ast
 
-from lbstanza_wrappers.Lbstanza import NativeEnumExporter, EnumExporter
+from lbstanza_wrappers.Lbstanza import NativeEnumExporter, EnumExporter, FlagEnumExporter
+from lbstanza_wrappers.ConstExpr import eval_const
+from lbstanza_wrappers.OutputWriter import OutputTree
+from lbstanza_wrappers.Timings import get_timer
+from lbstanza_wrappers.PrunedWalk import iter_decl_nodes
+from lbstanza_wrappers.Selection import OriginFilter, SymbolMatcher
+from lbstanza_wrappers.IRSnapshot import IRSnapshot, select
+
+
+def is_well_formed(enumerators):
+  """ This function attempts to determine whether the enumerators
+  for this C enum are well formed. In this context, well-formed means:
+    - Enumerators start at value 0
+    - Enumerators are monotically increasing
+    - Enumerators always increment by one for the next value (ie, there
+       are no gaps.)
+  """
+  for i, e in enumerate(enumerators):
+    eName, v = e
+    if i != v:
+      return False
+
+  return True
+
+def is_flag_enum(enumerators):
+  """ Determine whether a C enum is a set of bit flags, ie:
+    - At least two enumerators are single bits
+    - Every other enumerator is zero or a combination of those bits
+    - The values are not a contiguous range - `0, 1, 2, 3` is a
+       regular enum even though the values would work as flags.
+  """
+  values = set(v for _, v in enumerators)
+  bits = [v for v in values if v > 0 and (v & (v - 1)) == 0]
+  if len(bits) < 2:
+    return False
+  mask = 0
+  for v in bits:
+    mask |= v
+  if any(v < 0 or (v & ~mask) != 0 for v in values):
+    return False
+  return max(values) - min(values) + 1 != len(values)
+
+def render_enum(args):
+  """ Render the stanza package for one enum. This is a module
+  level function so that it can run in a process pool.
+  @param args Tuple of (name, enumerators, useDefenum, pkgPrefix, flagEnums)
+  @return String content of the package.
+  """
+  name, enumerators, useDefenum, pkgPrefix, flagEnums = args
+  if flagEnums and is_flag_enum(enumerators):
+    expCls = FlagEnumExporter
+  elif useDefenum and is_well_formed(enumerators):
+    expCls = NativeEnumExporter
+  else:
+    expCls = EnumExporter
+  buf = io.StringIO()
+  exp = expCls(buf, name, enumerators)
+  exp.dump_enums(Namespace(pkg_prefix=pkgPrefix))
+  return buf.getvalue()
 
 
 class EnumVisitor(c_ast.NodeVisitor):
   """ Extract Enums into Stanza Syntax
+  The visit only collects the enumerators. The packages are
+  rendered and written by `export`.
   """
 
   def __init__(self, opts):
     self._opts = opts
+    self._timer = get_timer(opts)
+    self._tree = None
     if not self._opts.dry_run:
-      if os.path.exists(self._opts.out_dir):
-        if not os.path.isdir(self._opts.out_dir):
-          raise ValueError("Output Directory Exists but isn't a Directory")
-      else:
-        os.makedirs(self._opts.out_dir)
+      self._tree = OutputTree(self._opts.out_dir, self._opts.input)
 
     self._enums = OrderedDict()
+    # Enumerator name => value for all captured enums. Enumerator
+    #  values can refer to any enumerator declared before them.
+    self._constants = {}
+    self._origin = OriginFilter.from_opts(opts)
+    self._symbols = SymbolMatcher.from_opts(opts)
 
     super().__init__()
 
-  def gen_enumerators(self, node):
-    values = node.values
+  def capture_enumerators(self, node):
+    """ Compute the value of each enumerator. Explicit values can be
+    any integer constant expression - eg `1 << 3` or `FOO_A | FOO_B` -
+    that refers to the enumerators declared before it.
+    The values are recorded for the enumerators that follow - this is
+    done for every enum, including the ones that are not selected.
+    @param node c_ast.Enum with values
+    @return List of (name, value) or None if a value can't be
+      evaluated - the values after it would be wrong.
+    """
+    ret = []
     currValue = 0
-    for value in values:
+    for value in node.values:
       name = value.name
-      if value.value is None:
-        yield (name, currValue)
-      else:
+      if value.value is not None:
         try:
-          # Sometimes this value can be set to a negative value
-          #  and when that happens we get a `UnaryOp` node for the minus sign.
-          #  Unfortunately, that opens up a bit of a bag of worms -
-          #    do we use the AST to change this into python math and then
-          #    compute the value ?
-          obj = value.value
-          if type(obj) is c_ast.Constant:
-            currValue = int(obj.value, base=0)
-            yield (name, currValue)
-          elif type(obj) is c_ast.UnaryOp:
-            if obj.op != '-':
-              raise NotImplementedError("Unhandled Unary Op for Enum Value Def: {}".format(obj.op))
-            currValue = int (obj.op + obj.expr.value, base=0)
-            yield (name, currValue)
-          else:
-            raise NotImplementedError("Unhandled AST Node for Enum Value Extraction: {}".format(obj))
+          currValue = eval_const(value.value, self._constants)
         except Exception as exc:
           logging.error("Enumerator[{}] : Failed Extract Value: {}".format(name, exc))
-          logging.error("Node: {}", node)
-
+          logging.error("Node: {}".format(node))
+          return None
+      self._constants[name] = currValue
+      ret.append((name, currValue))
       currValue += 1
+    return ret
 
   def is_well_formed(self, enumerators):
-    """ This function attempts to determine whether the enumerators
-    for this C enum are well formed. In this context, well-formed means:
-      - Enumerators start at value 0
-      - Enumerators are monotically increasing
-      - Enumerators always increment by one for the next value (ie, there
-         are no gaps.)
+    return is_well_formed(enumerators)
+
+  def visit_pruned(self, root):
+    """ Faster alternative to `visit` that skips function bodies
+    and expressions - See `iter_decl_nodes`.
     """
-    for i, e in enumerate(enumerators):
-      eName, v = e
-      if i != v:
-        return False
+    for node, _ in iter_decl_nodes(root, stop=(c_ast.TypeDecl,)):
+      if type(node) is c_ast.TypeDecl:
+        self.visit_TypeDecl(node)
+      elif type(node) is c_ast.Enum:
+        self.visit_Enum(node)
+
+  def snapshot(self):
+    """ Capture the enumerators for `--save-ir`
+    @return IRSnapshot
+    """
+    return IRSnapshot(getattr(self._opts, "input", None), enums=self._enums)
 
-    return True
+  def restore(self, snap):
+    """ Load the enumerators from a snapshot instead of visiting
+    an AST. The symbol selection is applied to the enums.
+    @param snap IRSnapshot with the captured enums.
+    """
+    enums = select(snap.enums, self._symbols, "enum")
+    self._enums = OrderedDict((k, v) for k, v in enums.items() if k not in self._opts.skip)
 
   def visit_TypeDecl(self, node):
     #print("Node: {}".format(node))
     declName = node.declname
 
+    declType = node.type
+    if not isinstance(declType, c_ast.Enum) or declType.values is None:
+      return
+
+    # Later enums can refer to these enumerators even if
+    #  this enum is not selected.
+    enumerators = self.capture_enumerators(declType)
+
     if declName in self._opts.skip:
       return
 
-    declType = node.type
-    if not isinstance(declType, c_ast.Enum):
+    if self._symbols is not None and not self._symbols.accepts(declName, "enum"):
+      return
+
+    if self._origin is not None and not self._origin.accepts(node, "enum"):
       return
 
     if declName in self._enums.keys():
       logging.info("Ignoring Duplicate Enum: {}".format(declName))
       return
 
-    enumerators = list(self.gen_enumerators(declType))
-    wellFormed = self.is_well_formed(enumerators)
+    if enumerators is None:
+      logging.error("Skipping Enum '{}': Failed to Evaluate its Enumerators".format(declName))
+      return
 
-    if wellFormed and self._opts.use_defenum:
-      expCls = NativeEnumExporter
-    else:
-      expCls = EnumExporter
+    self._enums[declName] = enumerators
 
-    if not self._opts.dry_run:
-      fpath = os.path.join(self._opts.out_dir, "{}.stanza".format(declName))
-      with open(fpath, "w") as f:
-        exp = expCls(f, declName, enumerators)
-        exp.dump_enums(self._opts)
+  def visit_Enum(self, node):
+    """ An enum that is not part of a typedef - ie, `enum { X = 8 };`
+    or `enum color { ... };`. No package is generated for these, but
+    later enums can refer to their enumerators.
+    """
+    if node.values is not None:
+      self.capture_enumerators(node)
+
+  def render(self):
+    """ Render the package for each captured enum. With `--render-jobs`
+    greater than 1, the packages are rendered in a process pool.
+    @return List of (name, content) in the order the enums were captured.
+    """
+    flagEnums = getattr(self._opts, "flag_enums", False)
+    if flagEnums:
+      for name, enumerators in self._enums.items():
+        if is_flag_enum(enumerators):
+          logging.info("Flag Enum: {}".format(name))
+    work = [
+      (name, enumerators, self._opts.use_defenum, self._opts.pkg_prefix, flagEnums)
+      for name, enumerators in self._enums.items()
+    ]
+    jobs = getattr(self._opts, "render_jobs", 1)
+    if jobs <= 1 or len(work) <= 1:
+      contents = [render_enum(x) for x in work]
     else:
-        exp = expCls(sys.stdout, declName, enumerators)
-        exp.dump_enums(self._opts)
+      chunksize = max(1, len(work) // (jobs * 4))
+      with ProcessPoolExecutor(max_workers=jobs) as pool:
+        contents = list(pool.map(render_enum, work, chunksize=chunksize))
+    return [(x[0], content) for x, content in zip(work, contents)]
+
+  def export(self):
+    """ Render and write the enum packages. Packages generated
+    by a previous run from the same header that were not generated
+    by this run are removed.
+    """
+    if self._symbols is not None:
+      self._symbols.log_summary()
+    if self._origin is not None:
+      self._origin.log_summary()
+
+    with self._timer.phase("render"):
+      rendered = self.render()
+
+    if self._opts.dry_run:
+      with self._timer.phase("render"):
+        for _, content in rendered:
+          sys.stdout.write(content)
+      return
 
-    self._enums[declName] = enumerators
\ No newline at end of file
+    files = [("{}.stanza".format(name), content) for name, content in rendered]
+    with self._timer.phase("write"):
+      self._tree.write_all(files, getattr(self._opts, "write_jobs", 1))
+      stats = self._tree.finish()
+    logging.info("Enum Packages in '{}': {}".format(self._opts.out_dir, stats))
\ No newline at end of file
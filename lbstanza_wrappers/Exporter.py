@@ -1,30 +1,92 @@
-
 from contextlib import contextmanager
 
 class Exporter(object):
+  """ Base class for generating indented text output.
+  Lines are written to the output file as they are printed. Inside
+  a `buffered` block, they are collected in memory instead and
+  written to the output file in a single call at the end of the block.
+  """
 
   INDENT_STR = "  "
 
   def __init__(self, fout):
     self._fout = fout
     self._indent_level = 0
+    self._prefix = ""
+    self._prefixes = [""]
+    # Strings waiting to be written - None if not buffering
+    self._buf = None
+
+  def _indent_prefix(self, level):
+    prefixes = self._prefixes
+    while len(prefixes) <= level:
+      prefixes.append(self.INDENT_STR * len(prefixes))
+    return prefixes[level]
+
+  def lprint(self, outstr, *args, sep=" ", end="\n", flush=False, **kwargs):
+    """ Print a line at the current indent level.
+    This accepts the same arguments as `print` except for `file`.
+    """
+    if len(args) > 0:
+      outstr = sep.join([outstr] + [str(x) for x in args])
+    self._write(self._prefix + outstr + end)
+    if flush:
+      self.flush()
+      self._fout.flush()
+
+  def lines(self, outlines):
+    """ Print a block of lines at the current indent level.
+    @param outlines Iterable of strings - one per line.
+    """
+    prefix = self._prefix
+    if prefix:
+      self._write("".join([prefix + x + "\n" for x in outlines]))
+    else:
+      self._write("".join([x + "\n" for x in outlines]))
 
-  def lprint(self, outstr, *args, **kwargs):
-    kwargs["file"] = self._fout
-    indents = self.INDENT_STR * self._indent_level
-    outstr = indents + outstr
-    print(outstr, *args, **kwargs)
+  def _write(self, content):
+    if self._buf is None:
+      self._fout.write(content)
+    else:
+      self._buf.append(content)
+
+  def flush(self):
+    """ Write the buffered output to the output file.
+    """
+    if self._buf:
+      self._fout.write("".join(self._buf))
+      self._buf.clear()
+
+  @contextmanager
+  def buffered(self):
+    """ Collect the output printed in the block and write it to the
+    output file in one call at the end of the block. Nested blocks
+    are written by the outermost block.
+    """
+    if self._buf is not None:
+      yield
+      return
+    self._buf = []
+    try:
+      yield
+    finally:
+      try:
+        self.flush()
+      finally:
+        self._buf = None
 
   def indent(self, cnt=1):
     self._indent_level += cnt
+    self._prefix = self._indent_prefix(self._indent_level)
 
   def dedent(self, cnt=1):
     self._indent_level -= cnt
     if self._indent_level < 0:
       raise RuntimeError("Indent Stack Violation - Can't be negative")
+    self._prefix = self._indent_prefix(self._indent_level)
 
   @contextmanager
   def indented(self, cnt=1):
     self.indent(cnt)
     yield
-    self.dedent(cnt)
\ No newline at end of file
+    self.dedent(cnt)
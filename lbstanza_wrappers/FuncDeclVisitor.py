@@ -1,3 +1,5 @@
+import io
+import os
 import logging
 import sys
 from collections import OrderedDict
@@ -5,6 +7,16 @@ from pycparser import c_ast
 
 from lbstanza_wrappers.Lbstanza import FuncDeclExporter, LBStanzaExporter
 from lbstanza_wrappers.CDefIR import *
+from lbstanza_wrappers.OutputWriter import OutputTree, write_if_changed
+from lbstanza_wrappers.Sharding import shard_funcs
+from lbstanza_wrappers.Timings import get_timer
+from lbstanza_wrappers.PrunedWalk import iter_decl_nodes
+from lbstanza_wrappers.Selection import OriginFilter, SymbolMatcher
+from lbstanza_wrappers.IRSnapshot import IRSnapshot, select
+from lbstanza_wrappers.ArrayPairs import ArrayPairs
+from lbstanza_wrappers.OutParams import OutParams
+from lbstanza_wrappers.ConstExpr import eval_const
+from lbstanza_wrappers.StructLayout import POINTER_LAYOUT, ENUM_LAYOUT, FIXED_LAYOUTS, primitive_layout, layout_members
 
 class FuncDeclVisitor(c_ast.NodeVisitor):
   """ Extract the Type Declarations into an Intermediate store.
@@ -67,49 +79,116 @@ class FuncDeclVisitor(c_ast.NodeVisitor):
 
     self._types = self._init_types()
     self._funcs = OrderedDict()
+    # Struct tag => StructArg. The tags share the type table with
+    #  the typedef names but `struct foo` must find the struct even
+    #  if a typedef is also named `foo`.
+    self._structs = {}
+    # Type name => CLayout for the arithmetic types - the
+    #  type table doesn't keep the size of the C types.
+    self._layouts = dict(FIXED_LAYOUTS)
+    self._origin = OriginFilter.from_opts(opts)
+    self._symbols = SymbolMatcher.from_opts(opts)
+    self._arrayPairs = ArrayPairs.from_opts(opts)
+    self._outParams = OutParams.from_opts(opts)
     self.logger = None
-    self.rootNode = None
+    # Location of the declaration being captured for messages
+    self.rootCoord = None
 
   def _init_types(self):
     ret = {}
     for k,v in self.FIXED_TYPE_MAPPING.items():
       ret[k] = Identifier(v)
+    # `const char *` arguments are strings
+    ret["char"] = CharIdentifier(self.FIXED_TYPE_MAPPING["char"])
     return ret
 
   def debug(self, msg):
-    if self.rootNode is not None:
-      logging.debug("{}: {}".format(self.rootNode.coord, msg))
+    if self.rootCoord is not None:
+      logging.debug("{}: {}".format(self.rootCoord, msg))
     else:
       logging.debug("UNKNOWN: {}".format(msg))
 
   @property
   def types(self):
-      return self._type
+      return self._types
 
   @property
   def func_defs(self):
-    for name, t in self._type.items():
+    for name, t in self._types.items():
       if isinstance(t, FunctionData):
         yield name
 
   @property
   def enum_defs(self):
-    for name,t in self._type.items():
+    for name,t in self._types.items():
       if isinstance(t, EnumArg):
         yield name
 
   @property
   def struct_defs(self):
-    for name, t in self._type.items():
-      if isinstance(t, StructArg):
+    for name, t in self._types.items():
+      if isinstance(t, ArgType) and isinstance(t.lbType, StructArg):
         yield name
 
+  def accessor_structs(self):
+    """ Select the structs that get field accessors - the complete
+    structs that are named by a typedef or a tag and pass the symbol
+    and origin selection. A struct with both is named by the typedef.
+    @return OrderedDict of name => StructArg
+    """
+    if not getattr(self._opts, "struct_accessors", False):
+      return OrderedDict()
+    names = OrderedDict()
+    for name, t in self._types.items():
+      if not isinstance(t, ArgType) or t.numPtrs != 0:
+        continue
+      s = t.lbType
+      if not isinstance(s, StructArg) or not s.complete:
+        continue
+      current = names.get(id(s))
+      if current is None or current[0] == s.tag:
+        names[id(s)] = (name, s)
+
+    ret = OrderedDict()
+    for name, s in names.values():
+      if self._symbols is not None and not self._symbols.accepts(name, "struct"):
+        continue
+      if self._origin is not None and s.origin is not None and not self._origin.accepts_file(s.origin):
+        self._origin.filtered["struct"] += 1
+        continue
+      ret[name] = s
+    return ret
+
+  def visit_pruned(self, root):
+    """ Faster alternative to `visit` that skips function bodies
+    and expressions - See `iter_decl_nodes`.
+    """
+    for node, _ in iter_decl_nodes(root, stop=(c_ast.Typedef, c_ast.Decl)):
+      if type(node) is c_ast.Typedef:
+        self.visit_Typedef(node)
+      elif type(node) is c_ast.Decl:
+        self.visit_Decl(node)
+
+  def snapshot(self):
+    """ Capture the type table and functions for `--save-ir`
+    @return IRSnapshot
+    """
+    return IRSnapshot(getattr(self._opts, "input", None), types=self._types, funcs=self._funcs)
+
+  def restore(self, snap):
+    """ Load the declarations from a snapshot instead of visiting
+    an AST. The symbol selection is applied to the functions.
+    @param snap IRSnapshot with the captured functions.
+    """
+    self._types = snap.types
+    self._funcs = select(snap.funcs, self._symbols, "function")
+
   def visit_Typedef(self, node):
     # We use this to capture the type declarations and
     #  Store a mapping of how translate these from C to Stanza
     #  Stanza has only a handful of types and so there is a need to
     #  handle conversion properly.
-    self.rootNode = node
+    self.rootCoord = node.coord
     comps = self.capture_typedef(node)
     if comps is not None:
       name, lbType, *_ = comps
@@ -122,9 +201,13 @@ class FuncDeclVisitor(c_ast.NodeVisitor):
       self._types[name] = lbType
 
   def visit_Decl(self, node):
-    self.rootNode = node
+    self.rootCoord = node.coord
     numPtrs = 0
     if type(node.type) is c_ast.FuncDecl:
+      if self._symbols is not None and not self._symbols.accepts(node.name, "function"):
+        return
+      if self._origin is not None and not self._origin.accepts(node, "function"):
+        return
       if node.name in self._funcs:
         logging.info("{}: Ignoring Existing Function Decl: {}".format(node.coord, node.name))
         return
@@ -133,14 +216,7 @@ class FuncDeclVisitor(c_ast.NodeVisitor):
       self._funcs[node.name] = funcData
       logging.debug("{}: Captured Function Decl: {}".format(node.coord, node.name))
     elif type(node.type) is c_ast.Struct:
-      declname = node.type.name
-      if declname in self._types:
-        self.debug("Type with name '{}' Already Exists - Ignoring New Struct Declaration".format(declname))
-        return
-      # @TODO - capture struct members here ?
-      lbType = ArgType(StructArg({}), 0)
-      self._types[declname] = lbType
-      self.debug("Captured Struct Decl '{}' as Dummy Definition".format(declname))
+      self.struct_type(node.type)
     else:
       self.debug("Unhandled Type: {}" % [type(node.type)])
 
@@ -158,13 +234,14 @@ class FuncDeclVisitor(c_ast.NodeVisitor):
         if type(baseNode) is c_ast.Struct:
           return self.capture_struct(baseNode, numPtrs, param.type.declname)
         elif type(baseNode) is c_ast.IdentifierType:
-          return self.capture_identifier(baseNode, numPtrs, param.type.declname)
+          isConst = "const" in param.type.quals
+          return self.capture_identifier(baseNode, numPtrs, param.type.declname, isConst)
         elif type(baseNode) is c_ast.Enum:
           return self.capture_enum_typedef(baseNode, param.type.declname)
         elif type(baseNode) is c_ast.Union:
           self.debug("Ignoring Typedef of Base Union: {}".format(baseNode))
         else:
-          raise RuntimeError("{}: Unhandled declaration base: {}".format(self.rootNode.coord, baseNode))
+          raise RuntimeError("{}: Unhandled declaration base: {}".format(self.rootCoord, baseNode))
       elif type(param.type) in [c_ast.PtrDecl, c_ast.ArrayDecl]:
         numPtrs += 1
         param = param.type
@@ -179,15 +256,109 @@ class FuncDeclVisitor(c_ast.NodeVisitor):
         raise RuntimeError("{}: Unhandled Node in Declaration: {}".format(node.coord, node))
 
   def capture_struct(self, node, numPtrs, declname):
-    # Currently, I'm not capturing the struct parameters because we
-    #  don't actually use them in the wrapper generator. We generally
-    #  assumes structs are opaque types.
-    structContent = {}
-    lbType = ArgType(StructArg(structContent), numPtrs)
+    lbType = ArgType(self.struct_type(node), numPtrs)
+    if numPtrs > 0:
+      self._layouts.setdefault(declname, POINTER_LAYOUT)
     self.debug("Captured Struct: {} = {}".format(declname, lbType))
     return (declname, lbType)
 
-  def capture_identifier(self, node, numPtrs, declname):
+  def struct_type(self, node):
+    """ Find or create the StructArg of a struct declaration or
+    definition. The members are captured when the struct is defined
+    so that every reference to `struct foo` - before or after the
+    definition - is the same StructArg.
+    @param node c_ast.Struct
+    @return StructArg
+    """
+    origin = node.coord.file if node.coord is not None else None
+    if node.name is None:
+      ret = StructArg(OrderedDict(), None, origin)
+    else:
+      ret = self._structs.get(node.name)
+      if ret is None:
+        ret = StructArg(OrderedDict(), node.name, origin)
+        self._structs[node.name] = ret
+        if node.name in self._types:
+          self.debug("Type with name '{}' Already Exists - Struct is only available as `struct {}`".format(node.name, node.name))
+        else:
+          self._types[node.name] = ArgType(ret, 0)
+
+    if node.decls is not None and not ret.complete:
+      ret.origin = origin
+      self.capture_members(ret, node)
+    return ret
+
+  def capture_members(self, struct, node):
+    """ Capture the members of a struct definition and compute
+    their layout. If any member is not supported (ie, bit fields,
+    unions, array sizes that aren't constant) the struct is left
+    opaque.
+    """
+    members = []
+    try:
+      for decl in node.decls:
+        if decl.bitsize is not None:
+          raise NotImplementedError("Bit Field '{}'".format(decl.name))
+        if decl.name is None:
+          raise NotImplementedError("Anonymous Member")
+        members.append((decl.name, *self.capture_member(decl)))
+    except (NotImplementedError, ValueError, RuntimeError) as exc:
+      self.debug("Struct '{}' is Opaque - {}".format(node.name, exc))
+      return
+    struct.members = layout_members(members)
+    self.debug("Captured Struct Members '{}': size={} align={}".format(node.name, struct.size, struct.align))
+
+  def capture_member(self, decl):
+    """ Extract the type of a struct member.
+    @param decl c_ast.Decl of the member
+    @return Tuple of (element ArgType, element CLayout, array dims)
+    """
+    dims = []
+    numPtrs = 0
+    t = decl.type
+    while type(t) in [c_ast.PtrDecl, c_ast.ArrayDecl]:
+      if type(t) is c_ast.ArrayDecl and numPtrs == 0:
+        dims.append(0 if t.dim is None else eval_const(t.dim))
+      else:
+        numPtrs += 1
+      t = t.type
+
+    if type(t) is c_ast.TypeDecl and type(t.type) is c_ast.Struct:
+      argType = ArgType(self.struct_type(t.type), numPtrs, "const" in t.quals)
+    elif type(t) is c_ast.TypeDecl and type(t.type) is c_ast.Union:
+      raise NotImplementedError("Union Member '{}'".format(decl.name))
+    else:
+      _, argType = self.get_decl(decl)
+      argType = ArgType(argType.lbType, argType.numPtrs - len(dims), argType.isConst)
+    return (argType, self.member_layout(argType, t), dims)
+
+  def member_layout(self, argType, node):
+    """
+    @param argType Type of one element of the member
+    @param node Innermost declaration node of the member
+    @return CLayout
+    """
+    lbType, numPtrs, _ = argType.resolve()
+    if numPtrs > 0 or isinstance(lbType, FunctionData):
+      return POINTER_LAYOUT
+    elif isinstance(lbType, StructArg):
+      if not lbType.complete:
+        raise ValueError("Struct Member of Incomplete Type '{}'".format(lbType.tag))
+      return CLayout(lbType.size, lbType.align, "struct")
+    elif isinstance(lbType, EnumArg):
+      return ENUM_LAYOUT
+    return self.identifier_layout(node.type.names)
+
+  def identifier_layout(self, names):
+    """ Layout of a type named by identifiers - a typedef name
+    or arithmetic type specifiers.
+    """
+    ret = self._layouts.get(" ".join(names))
+    if ret is None:
+      ret = primitive_layout(names)
+    return ret
+
+  def capture_identifier(self, node, numPtrs, declname, isConst=False):
     baseType = " ".join(node.names[-2:])
     # Attempt to convert to lbtype - and if that
     #  doesn't work return the baseType - we will
@@ -196,9 +367,16 @@ class FuncDeclVisitor(c_ast.NodeVisitor):
     if aliasType is None:
       # This type is referencing a type we don't know about yet - that
       # is a little strange.
-      raise RuntimeError("{}: Unhandled declaration base: {}".format(self.rootNode.coord, node))
+      raise RuntimeError("{}: Unhandled declaration base: {}".format(self.rootCoord, node))
 
-    lbType = ArgType(aliasType, numPtrs)
+    lbType = ArgType(aliasType, numPtrs, isConst)
+    if numPtrs > 0:
+      self._layouts.setdefault(declname, POINTER_LAYOUT)
+    elif isinstance(aliasType, Identifier) or (isinstance(aliasType, ArgType) and isinstance(aliasType.resolve()[0], Identifier)):
+      try:
+        self._layouts.setdefault(declname, self.identifier_layout(node.names))
+      except ValueError:
+        pass
 
     self.debug("Captured Identifier: {} = {}".format(declname, lbType))
 
@@ -218,10 +396,11 @@ class FuncDeclVisitor(c_ast.NodeVisitor):
   def capture_funcdecl(self, fdef):
     # Now we need to extract the function declaration - parameters and
     #   return arguments.
-    args = self.get_args(fdef)
+    args, layouts = self.get_args(fdef)
     retType = self.get_retType(fdef)
 
-    return FunctionData(args, retType, fdef)
+    origin = fdef.coord.file if fdef.coord is not None else None
+    return FunctionData(args, retType, origin, layouts)
 
   def capture_funcdef(self, node, numPtrs, fdef):
     """ Capture a Function Pointer Definition
@@ -278,10 +457,13 @@ class FuncDeclVisitor(c_ast.NodeVisitor):
         numPtrs => Number of * pointers in the declaration
         completeType => Fully formatted type including any `ptr<>`
           decorators.
+      and a Dict of argument name => CLayout of the base type of
+        the argument - See `FunctionData.layouts`
     """
     ret = OrderedDict()
+    layouts = {}
     if n.args is None:
-      return ret
+      return ret, layouts
     for p in n.args.params:
       name, argType = self.get_decl(p)
 
@@ -293,8 +475,35 @@ class FuncDeclVisitor(c_ast.NodeVisitor):
       name = self.fix_arg_name(name, ret)
 
       ret[name] = argType
-
-    return ret
+      layout = self.arg_layout(p, argType)
+      if layout is not None:
+        layouts[name] = layout
+
+    return ret, layouts
+
+  def arg_layout(self, param, argType):
+    """ Layout of the base type of a function argument - the type
+    after the pointers of the declaration.
+    @param param c_ast node of the argument
+    @param argType ArgType of the argument
+    @return CLayout or None if the base type is not an arithmetic
+      type or an enum.
+    """
+    t = param.type
+    while type(t) in [c_ast.PtrDecl, c_ast.ArrayDecl]:
+      t = t.type
+    lbType, numPtrs, _ = argType.resolve()
+    if numPtrs != argType.numPtrs:
+      # Typedef of a pointer type
+      return None
+    elif isinstance(lbType, EnumArg):
+      return ENUM_LAYOUT
+    elif not isinstance(lbType, Identifier) or type(t) is not c_ast.TypeDecl or type(t.type) is not c_ast.IdentifierType:
+      return None
+    try:
+      return self.identifier_layout(t.type.names)
+    except ValueError:
+      return None
 
   def get_retType(self, n):
     """ Get the return type for function definition
@@ -323,16 +532,17 @@ class FuncDeclVisitor(c_ast.NodeVisitor):
     while True:
       if type(p.type) is c_ast.TypeDecl:
         baseNode = p.type.type
-        try:
-          baseType = baseNode.name
-        except AttributeError:
+        if type(baseNode) is c_ast.IdentifierType:
           baseType = " ".join(baseNode.names[-2:])
+        else:
+          baseType = baseNode.name
 
         lbType = self._types.get(baseType)
         if lbType is None:
           raise ValueError("Failed to Find Type Mapping for TypeDecl '{}'".format(baseType))
 
-        return (p.type.declname, ArgType(lbType, numPtrs))
+        isConst = "const" in p.type.quals
+        return (p.type.declname, ArgType(lbType, numPtrs, isConst))
       elif type(p.type) in [c_ast.PtrDecl, c_ast.ArrayDecl]:
         numPtrs += 1
         p = p.type
@@ -340,7 +550,7 @@ class FuncDeclVisitor(c_ast.NodeVisitor):
         baseType = p.type.names[-1]
         lbType = self._types.get(baseType)
         if lbType is None:
-          raise ValueError("{}: Failed to Find Type Mapping for Identifier '{}'".format(self.rootNode.coord, baseType))
+          raise ValueError("{}: Failed to Find Type Mapping for Identifier '{}'".format(self.rootCoord, baseType))
         # @NOTE - this is primarily for parsing functions
         #   that return void.
         return ("", ArgType(lbType, numPtrs))
@@ -364,6 +574,9 @@ class FuncDeclVisitor(c_ast.NodeVisitor):
     fNames = list(self._funcs.keys())
     pprint(fNames)
 
+  def exporter(self, fout):
+    return FuncDeclExporter(fout, getattr(self._opts, "string_wrappers", False), self._arrayPairs, self._outParams)
+
   def export(self):
     """ Generate the exported stanza wrapper file for the
     captured header.
@@ -371,16 +584,76 @@ class FuncDeclVisitor(c_ast.NodeVisitor):
     if self._opts.dump_types:
       self.dump_types()
 
+    structs = self.accessor_structs()
+    if self._symbols is not None:
+      self._symbols.log_summary()
+    if self._origin is not None:
+      self._origin.log_summary()
+
+    if getattr(self._opts, "shard_by", None) is not None:
+      self.export_shards(structs)
+      return
+
+    timer = get_timer(self._opts)
     if self._opts.dry_run:
-      fout = sys.stdout
+      with timer.phase("render"):
+        exp = self.exporter(sys.stdout)
+        exp.dump_func_decls(self._funcs, self._opts, structs)
+    elif isinstance(self._opts.output, str):
+      # Render into memory and only replace the file if the
+      #  content changed so that stanza doesn't rebuild it.
+      with timer.phase("render"):
+        buf = io.StringIO()
+        exp = self.exporter(buf)
+        exp.dump_func_decls(self._funcs, self._opts, structs)
+      with timer.phase("write"):
+        status = write_if_changed(self._opts.output, buf.getvalue())
+      logging.info("Wrapper Package '{}': {}".format(self._opts.output, status))
     else:
-      if isinstance(self._opts.output, str):
-        fout = open(self._opts.output, "w")
-      else:
-        # Unit Tests pass a File object directly
-        #  so that we can more easily output the result
-        #  to the desired location or a string buffer.
-        fout = self._opts.output
-
-    exp = FuncDeclExporter(fout)
-    exp.dump_func_decls(self._funcs, self._opts)
+      # Unit Tests pass a File object directly
+      #  so that we can more easily output the result
+      #  to the desired location or a string buffer.
+      with timer.phase("render"):
+        exp = self.exporter(self._opts.output)
+        exp.dump_func_decls(self._funcs, self._opts, structs)
+
+  def export_shards(self, structs=None):
+    """ Generate the functions in multiple packages - one for each shard -
+    and an umbrella package that forwards them. The umbrella package
+    is written to `--output` and the shards to a directory named
+    after the package next to it.
+    @param structs Dictionary of struct name => StructArg for
+      the accessors in the umbrella package or None.
+    """
+    opts = self._opts
+    timer = get_timer(opts)
+    shardPrefix = "{}/{}".format(opts.pkg_prefix, opts.pkg_name)
+    with timer.phase("render"):
+      shards = shard_funcs(self._funcs, opts.shard_by, opts.shard_size, opts.shard_prefix_parts)
+      umbrella = io.StringIO()
+      self.exporter(umbrella).dump_umbrella(opts.pkg_prefix, opts.pkg_name, shards.keys(), structs)
+      rendered = []
+      for name, funcs in shards.items():
+        buf = io.StringIO()
+        self.exporter(buf).dump_funcs_package(funcs, shardPrefix, name)
+        rendered.append((name, buf.getvalue()))
+
+    if opts.dry_run:
+      with timer.phase("render"):
+        sys.stdout.write(umbrella.getvalue())
+        for _, content in rendered:
+          sys.stdout.write(content)
+      return
+
+    if not isinstance(opts.output, str):
+      raise ValueError("Sharded output requires an `--output` path for the umbrella package")
+
+    shardDir = os.path.join(os.path.dirname(opts.output), opts.pkg_name)
+    with timer.phase("write"):
+      tree = OutputTree(shardDir, opts.input)
+      for name, content in rendered:
+        tree.write("{}.stanza".format(name), content)
+      stats = tree.finish()
+      status = write_if_changed(opts.output, umbrella.getvalue())
+    logging.info("Wrapper Shards in '{}': {}".format(shardDir, stats))
+    logging.info("Wrapper Package '{}': {}".format(opts.output, status))
@@ -0,0 +1,99 @@
+import pickle
+import logging
+from collections import OrderedDict
+
+from lbstanza_wrappers.OutputWriter import atomic_write
+
+
+class IRSnapshot(object):
+  """ The declarations captured from a header - everything needed
+  to render the stanza packages without parsing the header again.
+    - `types` - Type name => CDefIR type. The function declaration
+       type table.
+    - `funcs` - Function name => FunctionData
+    - `enums` - Enum name => List of (enumerator name, value)
+  Either `types`/`funcs` or `enums` is None if that extraction was
+  not run when the snapshot was taken.
+  The snapshot is saved as a versioned pickle. The CDefIR values are
+  re-interned when they are loaded.
+  """
+  MAGIC = "lbstanza-wrappers-ir"
+  # Bump this when the content of the snapshot or the
+  #  CDefIR classes change.
+  FORMAT_VERSION = 4
+
+  def __init__(self, input, types=None, funcs=None, enums=None):
+    """
+    @param input Path of the header the declarations were captured from.
+    """
+    self.input = input
+    self.types = types
+    self.funcs = funcs
+    self.enums = enums
+
+  @property
+  def has_funcs(self):
+    return self.funcs is not None
+
+  @property
+  def has_enums(self):
+    return self.enums is not None
+
+  def merge(self, other):
+    """ Combine the parts captured by two visitors of the same header.
+    @return New IRSnapshot
+    """
+    return IRSnapshot(
+      self.input,
+      types = self.types if self.types is not None else other.types,
+      funcs = self.funcs if self.funcs is not None else other.funcs,
+      enums = self.enums if self.enums is not None else other.enums,
+    )
+
+  def save(self, fpath):
+    """ Write the snapshot to `fpath`. The file is written to a temp
+    file and then renamed into place so that a reader never sees a
+    partial snapshot.
+    """
+    content = {
+      "magic" : self.MAGIC,
+      "version" : self.FORMAT_VERSION,
+      "input" : self.input,
+      "types" : self.types,
+      "funcs" : self.funcs,
+      "enums" : self.enums,
+    }
+    data = pickle.dumps(content, protocol=pickle.HIGHEST_PROTOCOL)
+    atomic_write(fpath, data)
+    logging.info("IR Snapshot '{}': {} bytes".format(fpath, len(data)))
+
+  @classmethod
+  def load(cls, fpath):
+    """ Read a snapshot written by `save`
+    @return IRSnapshot
+    """
+    with open(fpath, "rb") as f:
+      try:
+        content = pickle.load(f)
+      except Exception as exc:
+        raise ValueError("{}: Not an IR Snapshot - {}".format(fpath, exc))
+
+    if not isinstance(content, dict) or content.get("magic") != cls.MAGIC:
+      raise ValueError("{}: Not an IR Snapshot".format(fpath))
+    version = content.get("version")
+    if version != cls.FORMAT_VERSION:
+      raise ValueError("{}: Unsupported IR Snapshot Version {} - Expected {}. Regenerate it with `--save-ir`".format(
+        fpath, version, cls.FORMAT_VERSION
+      ))
+    return cls(content["input"], content["types"], content["funcs"], content["enums"])
+
+
+def select(items, symbols, kind):
+  """ Apply the symbol selection to the functions or enums of a snapshot.
+  @param items OrderedDict of name => captured declaration
+  @param symbols SymbolMatcher or None
+  @return OrderedDict of the selected declarations.
+  """
+  if symbols is None or items is None:
+    return items
+  return OrderedDict((k, v) for k, v in items.items() if symbols.accepts(k, kind))
@@ -1,5 +1,6 @@
 from lbstanza_wrappers.Exporter import Exporter
 from lbstanza_wrappers import __version__
+from lbstanza_wrappers.CDefIR import ArgType
 
 
 class LBStanzaExporter(Exporter):
@@ -21,76 +22,405 @@ class LBStanzaExporter(Exporter):
     self.lprint("; Version {}".format(__version__))
     self.lprint("; Manual editing would be unwise")
 
-  def dump_package_decl(self, prefix, pkgName, imports):
+  def dump_package_decl(self, prefix, pkgName, imports, forwards=[]):
     self.lprint("defpackage {}/{} :".format(prefix, pkgName))
     with self.indented():
       for imp in imports:
         self.lprint("import {}".format(imp))
+      for fwd in forwards:
+        self.lprint("forward {}".format(fwd))
     self.lprint("")
 
 
 class FuncDeclExporter(LBStanzaExporter):
   """ Function Declarations Exporter
   """
+  # Lostanza primitive => HiStanza type for the
+  #  arguments and returns of the string wrappers.
+  BOXED_TYPES = {
+    "int" : "Int",
+    "long" : "Long",
+    "byte" : "Byte",
+    "float" : "Float",
+    "double" : "Double",
+  }
+  # Initial value of the out parameter variables
+  ZERO_VALUES = {
+    "int" : "0",
+    "long" : "0L",
+    "byte" : "0Y",
+    "float" : "0.0F",
+    "double" : "0.0",
+  }
+
+  def __init__(self, fout, stringWrappers=False, arrayPairs=None, outParams=None):
+    """
+    @param fout Output File Object to export to
+    @param stringWrappers If True, functions with `const char *`
+      arguments or returns get an additional `w_{name}_str` wrapper
+      that is called with and returns stanza Strings.
+    @param arrayPairs ArrayPairs or None. If set, functions with
+      pointer + length argument pairs get an additional
+      `w_{name}_arr` wrapper that is called with stanza arrays.
+    @param outParams OutParams or None. If set, functions with out
+      parameters get an additional `w_{name}_out` wrapper that
+      returns the values of the out parameters.
+    """
+    super().__init__(fout)
+    self._stringWrappers = stringWrappers
+    self._arrayPairs = arrayPairs
+    self._outParams = outParams
 
-  def dump_static_decl(self, funcs):
-    """ Dump static function declarations.
+  def static_decl(self, name, data):
+    """ Static function declaration for one function.
     @NOTE - the lack of prefix - this is because these function
       names are searched for in the compiled objects and must match
       as symbol names.
     """
-    for name, data in funcs.items():
-      voidComment = ""
-      if data.ret.isVoid:
-        voidComment = "  ;  void"
-      funcType = data.to_stanza()
-      self.lprint("extern {} : {}{}".format(name, funcType, voidComment))
+    voidComment = "  ;  void" if data.ret.isVoid else ""
+    return "extern {} : {}{}".format(name, data.to_stanza(), voidComment)
 
-  def dump_wrapper(self, funcs):
+  def wrapper_lines(self, name, data):
     """ Generate the wrapper lostanza function that is used to make
     consistent calling interface from high stanza code.
     @note: These functions have the `w_` prefix.
+    @return List of lines
     """
     # public lostanza defn w_func_name (v:int) -> int :
     #   val ret = call-c func_name(v)
     #   return ret
+    indent = self.INDENT_STR
+    argDecls = ", ".join(["{}:{}".format(k, v.to_stanza()) for k,v in data.args.items()])
+    fArgs = ", ".join(data.args.keys())
+
+    if data.ret.isVoid:
+      return [
+        "public lostanza defn w_{} ({}) -> ref<False> :".format(name, argDecls),
+        "{}call-c {}({})".format(indent, name, fArgs),
+        "{}return false".format(indent),
+      ]
+    else:
+      retDecl = data.ret.retType.to_stanza()
+      return [
+        "public lostanza defn w_{} ({}) -> {} :".format(name, argDecls, retDecl),
+        "{}val ret = call-c {}({})".format(indent, name, fArgs),
+        "{}return ret".format(indent),
+      ]
+
+  def string_wrapper_lines(self, name, data):
+    """ Generate a wrapper callable from HiStanza for a function with
+    `const char *` arguments or return.
+    String arguments pass the String's own null terminated bytes to C
+    without a copy. A string return is copied into a new String in one
+    pass, or is `false` if the function returns NULL.
+    The other arguments and the return must be numeric.
+    @return List of lines - empty if the function has no const strings
+      or has arguments that can't be passed from HiStanza.
+    """
+    # public lostanza defn w_func_name_str (s:ref<String>, v:ref<Int>) -> ref<Int> :
+    #   val ret = w_func_name(addr!(s.chars), v.value)
+    #   return new Int{ret}
+    return self.boxed_wrapper_lines(name, data, "str", {})
+
+  def array_wrapper_lines(self, name, data):
+    """ Generate a wrapper callable from HiStanza for a function with
+    pointer + length argument pairs - See `ArrayPairs`.
+    Each pair is replaced by a stanza array argument. The array's own
+    storage and its length are passed to C - there is no copy. The
+    `const char *` arguments and returns are Strings, as in the
+    string wrappers.
+    @return List of lines - empty if the function has no pairs or
+      has arguments that can't be passed from HiStanza.
+    """
+    # public lostanza defn w_func_name_arr (fd:ref<Int>, buf:ref<ByteArray>) -> ref<Int> :
+    #   val ret = w_func_name(fd.value, addr!(buf.data), buf.length as int)
+    #   return new Int{ret}
+    pairs = self._arrayPairs.find(name, data)
+    if len(pairs) == 0:
+      return []
+    return self.boxed_wrapper_lines(name, data, "arr", pairs)
+
+  def out_wrapper_lines(self, name, data):
+    """ Generate a wrapper callable from HiStanza for a function with
+    out parameters - See `OutParams`.
+    Each out parameter is a local variable of the wrapper - its
+    address is passed to C so there is no heap allocation for it.
+    The wrapper returns the values of the out parameters after the
+    return value of the function. A single value is returned as is and
+    multiple values as a tuple. The `const char *` arguments and the
+    array pairs are converted as in the other wrappers.
+    @return List of lines - empty if the function has no out
+      parameters or has arguments that can't be passed from HiStanza.
+    """
+    # defn w_func_name_out_values (v0:Int, v1:Double) -> [Int, Double] :
+    #   [v0, v1]
+    # public lostanza defn w_func_name_out (a:ref<Int>) -> ref<[Int, Double]> :
+    #   var out_x:double = 0.0
+    #   val ret = w_func_name(a.value, addr(out_x))
+    #   return w_func_name_out_values(new Int{ret}, new Double{out_x})
+    outs = self._outParams.find(name, data)
+    if len(outs) == 0:
+      return []
+    pairs = {}
+    if self._arrayPairs is not None:
+      pairs = self._arrayPairs.find(name, data)
+      pairs = {k: v for k, v in pairs.items() if k not in outs}
+    return self.boxed_wrapper_lines(name, data, "out", pairs, outs)
+
+  def boxed_wrapper_lines(self, name, data, suffix, pairs, outs={}):
+    """ Generate a `w_{name}_{suffix}` wrapper with HiStanza arguments
+    and return that calls the `w_` wrapper.
+    @param pairs Dict of pointer argument name => Tuple of (length
+      argument name, stanza array type)
+    @param outs Dict of out parameter name => stanza primitive
+    @return List of lines - empty if there is nothing to convert
+      or an argument can't be passed from HiStanza.
+    """
+    indent = self.INDENT_STR
+    lengths = {v[0]: k for k, v in pairs.items()}
+    converted = len(pairs) > 0 or len(outs) > 0
+    argDecls = []
+    fArgs = []
+    for k, v in data.args.items():
+      if k in outs:
+        fArgs.append("addr({})".format(k))
+      elif k in pairs:
+        argDecls.append("{}:ref<{}>".format(k, pairs[k][1]))
+        fArgs.append("addr!({}.data)".format(k))
+      elif k in lengths:
+        # Stanza array lengths are `long` - the C length has the size
+        #  of its stanza type. See `ArrayPairs.is_length`
+        arr = lengths[k]
+        fArgs.append("{}.length".format(arr) if v.to_stanza() == "long" else "{}.length as int".format(arr))
+      elif v.is_const_string():
+        converted = True
+        argDecls.append("{}:ref<String>".format(k))
+        fArgs.append("addr!({}.chars)".format(k))
+      else:
+        boxed = self.BOXED_TYPES.get(v.to_stanza())
+        if boxed is None:
+          return []
+        argDecls.append("{}:ref<{}>".format(k, boxed))
+        fArgs.append("{}.value".format(k))
+
+    retType = data.ret.retType
+    call = "w_{}({})".format(name, ", ".join(fArgs))
+    fName = "w_{}_{}".format(name, suffix)
+    decl = "public lostanza defn {} ({}) -> ".format(fName, ", ".join(argDecls))
+    body = ["{}var {}:{} = {}".format(indent, k, t, self.ZERO_VALUES[t]) for k, t in outs.items()]
+    # Tuples of (HiStanza type, expression) for the returned values
+    values = []
+    if data.ret.isVoid:
+      body.append("{}{}".format(indent, call))
+    elif isinstance(retType, ArgType) and retType.is_const_string():
+      converted = True
+      body.append("{}val ret = {}".format(indent, call))
+      if len(outs) == 0:
+        return [
+          decl + "ref<String|False> :",
+          *body,
+          "{}if ret == null : return false".format(indent),
+          "{}return String(ret)".format(indent),
+        ]
+      body.extend([
+        "{}var ret_str:ref<String|False> = false".format(indent),
+        "{}if ret != null : ret_str = String(ret)".format(indent),
+      ])
+      values.append(("String|False", "ret_str"))
+    else:
+      boxed = self.BOXED_TYPES.get(retType.to_stanza())
+      if boxed is None:
+        return []
+      body.append("{}val ret = {}".format(indent, call))
+      values.append((boxed, "new {}{{ret}}".format(boxed)))
+    for k, t in outs.items():
+      boxed = self.BOXED_TYPES[t]
+      values.append((boxed, "new {}{{{}}}".format(boxed, k)))
+
+    if not converted:
+      return []
+    if len(values) == 0:
+      return [decl + "ref<False> :", *body, "{}return false".format(indent)]
+    elif len(values) == 1:
+      return [decl + "ref<{}> :".format(values[0][0]), *body, "{}return {}".format(indent, values[0][1])]
+
+    # Lostanza can't construct a tuple - a HiStanza
+    #  function collects the values.
+    tupleType = "[{}]".format(", ".join(t for t, _ in values))
+    params = ", ".join("v{}:{}".format(i, t) for i, (t, _) in enumerate(values))
+    return [
+      "defn {}_values ({}) -> {} :".format(fName, params, tupleType),
+      "{}[{}]".format(indent, ", ".join("v{}".format(i) for i in range(len(values)))),
+      decl + "ref<{}> :".format(tupleType),
+      *body,
+      "{}return {}_values({})".format(indent, fName, ", ".join(x for _, x in values)),
+    ]
+
+  def extra_wrapper_lines(self, name, data):
+    """ The optional HiStanza wrappers of a function.
+    """
+    out = []
+    if self._stringWrappers:
+      out.extend(self.string_wrapper_lines(name, data))
+    if self._arrayPairs is not None:
+      out.extend(self.array_wrapper_lines(name, data))
+    if self._outParams is not None:
+      out.extend(self.out_wrapper_lines(name, data))
+    return out
+
+  def struct_accessor_lines(self, name, struct):
+    """ Generate the lostanza accessors for the members of a struct.
+    The accessors read and write the members in place through a
+    `ptr<?>` to the struct using the offsets of the x86-64 System V
+    layout - See `StructLayout`. Array members take an element index
+    and struct members return the address of the nested struct.
+    @return List of lines
+    """
+    # public lostanza defn point_x (p:ptr<?>) -> int :
+    #   return [(p + 8) as ptr<int>]
+    # public lostanza defn point_x_set (p:ptr<?>, v:int) -> ref<False> :
+    #   [(p + 8) as ptr<int>] = v
+    #   return false
+    indent = self.INDENT_STR
+    out = [
+      "public lostanza defn {}_sizeof () -> long :".format(name),
+      "{}return {}L".format(indent, struct.size),
+      "public lostanza defn {}_alignof () -> long :".format(name),
+      "{}return {}L".format(indent, struct.align),
+    ]
+    for mName, member in struct.members.items():
+      fName = "{}_{}".format(name, mName)
+      layout = member.layout
+      addr = "p + {}".format(member.offset) if member.offset > 0 else "p"
+      args = "p:ptr<?>"
+      if len(member.dims) > 0:
+        addr += " + i * {}".format(layout.size) if layout.size > 1 else " + i"
+        args += ", i:long"
+      # Operand of the cast to the member's pointer type
+      cast = "p" if addr == "p" else "({})".format(addr)
+      out.append("public lostanza defn {}_offsetof () -> long :".format(fName))
+      out.append("{}return {}L".format(indent, member.offset))
+
+      if layout.kind == "struct":
+        out.extend([
+          "public lostanza defn {} ({}) -> ptr<?> :".format(fName, args),
+          "{}return {}".format(indent, addr),
+        ])
+        continue
+
+      try:
+        access = member.argType.to_stanza() if layout.kind == "pointer" else layout.to_stanza()
+      except NotImplementedError:
+        # `long double` - only the offset is available
+        continue
+      readOnly = member.argType.numPtrs == 0 and member.argType.isConst
+      if layout.size == 2:
+        out.extend(self.short_accessor_lines(fName, args, cast, layout.kind == "signed", readOnly))
+        continue
+      out.extend([
+        "public lostanza defn {} ({}) -> {} :".format(fName, args, access),
+        "{}return [{} as ptr<{}>]".format(indent, cast, access),
+      ])
+      if not readOnly:
+        out.extend([
+          "public lostanza defn {}_set ({}, v:{}) -> ref<False> :".format(fName, args, access),
+          "{}[{} as ptr<{}>] = v".format(indent, cast, access),
+          "{}return false".format(indent),
+        ])
+    return out
+
+  def short_accessor_lines(self, fName, args, cast, signed, readOnly):
+    """ Accessors for a 2 byte member. Stanza doesn't have a `short`
+    type so the value is read and written as little endian bytes.
+    """
+    indent = self.INDENT_STR
+    out = [
+      "public lostanza defn {} ({}) -> int :".format(fName, args),
+      "{}val b = {} as ptr<byte>".format(indent, cast),
+      "{}val v = ([b] as int) | (([b + 1] as int) << 8)".format(indent),
+      # Sign extend from 16 bits
+      "{}return (v << 16) >> 16".format(indent) if signed else "{}return v".format(indent),
+    ]
+    if not readOnly:
+      out.extend([
+        "public lostanza defn {}_set ({}, v:int) -> ref<False> :".format(fName, args),
+        "{}val b = {} as ptr<byte>".format(indent, cast),
+        "{}[b] = v as byte".format(indent),
+        "{}[b + 1] = (v >> 8) as byte".format(indent),
+        "{}return false".format(indent),
+      ])
+    return out
+
+  def structs_lines(self, structs):
+    """
+    @param structs Dictionary of struct name => StructArg or None
+    """
+    out = []
+    if structs is None:
+      return out
+    for name, struct in structs.items():
+      out.extend(self.struct_accessor_lines(name, struct))
+    return out
 
-    def to_argdecl(k,v):
-      return "{}:{}".format(k, v.to_stanza())
+  def dump_static_decl(self, funcs):
+    """ Dump static function declarations.
+    """
+    self.lines([self.static_decl(name, data) for name, data in funcs.items()])
 
+  def dump_wrapper(self, funcs):
+    """ Dump the `w_` wrapper functions.
+    """
+    out = []
     for name, data in funcs.items():
-      argDecls = ", ".join([to_argdecl(k,v) for k,v in data.args.items()])
-      fArgs = ", ".join(data.args.keys())
+      out.extend(self.wrapper_lines(name, data))
+      out.extend(self.extra_wrapper_lines(name, data))
+    self.lines(out)
 
-      isVoid = data.ret.isVoid
-      if isVoid:
-        retDecl = "ref<False>"
-      else:
-        retDecl = data.ret.retType.to_stanza()
-
-      self.lprint("public lostanza defn w_{} ({}) -> {} :".format(name, argDecls, retDecl))
-      with self.indented():
-        retPrefix = "val ret = "
-        if isVoid:
-          retPrefix = ""
-        self.lprint("{}call-c {}({})".format(retPrefix, name, fArgs))
-        if isVoid:
-          self.lprint("return false")
-        else:
-          self.lprint("return ret")
-
-  def dump_func_decls(self, funcs, opts):
+  def dump_func_decls(self, funcs, opts, structs=None):
     """
     @param funcs Dictionary with:
        Key = [String] Function Symbol Name
        Value = [Tuple] (argsList, retType, ... others ignored)
+      or an iterable of (name, FunctionData) tuples - ie, a generator.
     @param opts argparse Namespace with command line options.
+    @param structs Dictionary of struct name => StructArg to
+      generate member accessors for or None.
+    """
+    self.dump_funcs_package(funcs, opts.pkg_prefix, opts.pkg_name, structs)
+
+  def dump_funcs_package(self, funcs, prefix, pkgName, structs=None):
+    """ Dump a package with the static declarations followed by the
+    wrappers and the struct accessors. The functions are only
+    iterated once.
+    """
+    with self.buffered():
+      self.dump_autogen_header()
+      imports = ["core"]
+      self.dump_package_decl(prefix, pkgName, imports)
+
+      items = funcs.items() if hasattr(funcs, "items") else funcs
+      decls = []
+      wrappers = []
+      for name, data in items:
+        decls.append(self.static_decl(name, data))
+        wrappers.extend(self.wrapper_lines(name, data))
+        wrappers.extend(self.extra_wrapper_lines(name, data))
+      self.lines(decls)
+      self.lines(wrappers)
+      self.lines(self.structs_lines(structs))
+
+  def dump_umbrella(self, prefix, pkgName, shardNames, structs=None):
+    """ Dump a package that re-exports the shard packages
+    `{prefix}/{pkgName}/{shardName}` so that users can import
+    all of the functions at once. The struct accessors are
+    in the umbrella package.
     """
-    self.dump_autogen_header()
-    imports = ["core"]
-    self.dump_package_decl(opts.pkg_prefix, opts.pkg_name, imports)
-    self.dump_static_decl(funcs)
-    self.dump_wrapper(funcs)
+    with self.buffered():
+      self.dump_autogen_header()
+      shardPrefix = "{}/{}".format(prefix, pkgName)
+      forwards = ["{}/{}".format(shardPrefix, x) for x in shardNames]
+      self.dump_package_decl(prefix, pkgName, ["core"], forwards)
+      self.lines(self.structs_lines(structs))
 
 
 class NativeEnumExporter(LBStanzaExporter):
@@ -112,23 +442,24 @@ class NativeEnumExporter(LBStanzaExporter):
     self._enumerators = enumerators
 
   def dump_enums(self, opts):
-    self.dump_autogen_header()
+    with self.buffered():
+      self.dump_autogen_header()
 
-    imports = ["core",]
-    self.dump_package_decl(opts.pkg_prefix, self._name, imports)
+      imports = ["core",]
+      self.dump_package_decl(opts.pkg_prefix, self._name, imports)
 
-    self.lprint("public defenum {}:".format(self._name))
-    with self.indented():
-      for eName, v in self._enumerators :
-        self.lprint("{}".format(eName))
-    self.lprint("")
+      self.lprint("public defenum {}:".format(self._name))
+      with self.indented():
+        for eName, v in self._enumerators :
+          self.lprint("{}".format(eName))
+      self.lprint("")
 
-    # I add a lostanza constructor for ease of use with
-    #  wrappers
-    self.lprint("public lostanza defn {} (v:int) -> ref<{}> :".format(self._name, self._name))
-    with self.indented():
-      self.lprint("return {}(new Int{{v}})".format(self._name))
-    self.lprint("")
+      # I add a lostanza constructor for ease of use with
+      #  wrappers
+      self.lprint("public lostanza defn {} (v:int) -> ref<{}> :".format(self._name, self._name))
+      with self.indented():
+        self.lprint("return {}(new Int{{v}})".format(self._name))
+      self.lprint("")
 
 
 class EnumExporter(LBStanzaExporter):
@@ -148,32 +479,152 @@ class EnumExporter(LBStanzaExporter):
     return "{}".format(eName)
 
   def dump_enum_deftypes(self):
+    """ Each enumerator is a singleton of its own subtype so that
+    it can be used in a `match`. The singleton stores its value and
+    name - the `enum-value` and `enum-name` getters are implemented
+    by each instance, like the fields of a `defstruct`.
+    """
     self.lprint("public deftype {} <: Equalable".format(self._name))
     for eName, v in self._enumerators :
       self.lprint("public deftype {} <: {}".format(self.to_type(eName), self._name))
     self.lprint("")
 
+    self.lprint("defmulti enum-value (v:{}) -> Int".format(self._name))
+    self.lprint("defmulti enum-name (v:{}) -> String".format(self._name))
+    self.lprint("")
+
     for eName, v in self._enumerators :
-      self.lprint("public val {} = new {}".format(eName, self.to_type(eName)))
+      self.lprint("public val {} = new {} :".format(eName, self.to_type(eName)))
+      with self.indented():
+        self.lprint("defmethod enum-value (this) : {}".format(v))
+        self.lprint("defmethod enum-name (this) : \"{}\"".format(eName))
     self.lprint("")
 
   def dump_to_int(self):
     self.lprint("public defn to-int (v:{}) -> Int:".format(self._name))
     with self.indented():
-      self.lprint("match(v) :")
+      self.lprint("enum-value(v)")
+    self.lprint("")
+
+  # Enums with at most this many values are converted with a
+  #  chain of comparisons - a table isn't any faster.
+  SWITCH_MAX = 4
+  # Minimum fraction of the value range that must be used by the
+  #  enumerators for the values to be looked up in a dense table.
+  DENSE_FILL = 0.5
+
+  def unique_values(self):
+    """ Values of the enumerators without duplicates. When multiple
+    enumerators have the same value, the first one is constructed.
+    @return List of (value, name) in the order of the enumerators.
+    """
+    byValue = {}
+    for eName, v in self._enumerators:
+      byValue.setdefault(v, eName)
+    return list(byValue.items())
+
+  def lookup_kind(self, values):
+    """ Select how the constructor finds the enumerator for a value.
+    @param values Result of `unique_values`
+    @return One of:
+      "switch" - Compare against each value in turn.
+      "dense" - Index a table covering the whole range of values.
+      "sparse" - Binary search a sorted table of the values.
+    """
+    if len(values) <= self.SWITCH_MAX:
+      return "switch"
+    span = max(v for v, _ in values) - min(v for v, _ in values) + 1
+    if len(values) >= span * self.DENSE_FILL:
+      return "dense"
+    return "sparse"
+
+  def invalid_value(self):
+    return "throw(Exception(\"{}: Invalid Enum Value: %_\" % [v]))".format(self._name)
+
+  def dump_table(self, name, elemType, elems):
+    self.lprint("val {}:Tuple<{}> = [".format(name, elemType))
+    with self.indented():
+      self.lines(elems)
+    self.lprint("]")
+
+  def dump_switch_lookup(self, values):
+    self.lprint("switch {v == _}:")
+    with self.indented():
+      for v, eName in values:
+        self.lprint("{} : {}".format(v, eName))
+      self.lprint("else: {}".format(self.invalid_value()))
+
+  def dump_dense_lookup(self, values):
+    """ The values cover most of a range `[min, max]` - the enumerator
+    for value `v` is at index `v - min` of a table. Unused values in
+    the range are `false`.
+    """
+    byValue = dict(values)
+    lo = min(byValue.keys())
+    hi = max(byValue.keys())
+    elems = [byValue.get(v, "false") for v in range(lo, hi + 1)]
+
+    if lo == 0:
+      index = "v"
+    elif lo < 0:
+      index = "v + {}".format(-lo)
+    else:
+      index = "v - {}".format(lo)
+
+    table = "{}-by-value".format(self._name)
+    self.dump_table(table, "{}|False".format(self._name), elems)
+    self.lprint("")
+
+    self.lprint("public defn {} (v:Int) -> {} :".format(self._name, self._name))
+    with self.indented():
+      self.lprint("val e = {}[{}] when v >= {} and v <= {} else false".format(table, index, lo, hi))
+      self.lprint("match(e) :")
       with self.indented():
-        for eName, v in self._enumerators:
-          self.lprint("(x:{}) : {}".format(self.to_type(eName),v))
+        self.lprint("(e:{}) : e".format(self._name))
+        self.lprint("(e:False) : {}".format(self.invalid_value()))
+
+  def dump_sparse_lookup(self, values):
+    """ Binary search a sorted table of the values - the enumerator
+    is at the same index of a second table.
+    """
+    values = sorted(values)
+    valueTable = "{}-values".format(self._name)
+    enumTable = "{}-by-index".format(self._name)
+    self.dump_table(valueTable, "Int", [str(v) for v, _ in values])
+    self.dump_table(enumTable, self._name, [eName for _, eName in values])
     self.lprint("")
 
-  def dump_constructor(self):
     self.lprint("public defn {} (v:Int) -> {} :".format(self._name, self._name))
     with self.indented():
-      self.lprint("switch {v == _}:")
+      self.lprint("defn search (lo:Int, hi:Int) -> {} :".format(self._name))
       with self.indented():
-        for eName, v in self._enumerators :
-          self.lprint("{} : {}".format(v, eName))
-        self.lprint("else: throw(Exception(\"{}: Invalid Enum Value: %_\" % [v]))".format(self._name))
+        self.lprint("if lo >= hi :")
+        with self.indented():
+          self.lprint(self.invalid_value())
+        self.lprint("else :")
+        with self.indented():
+          self.lprint("val mid = (lo + hi) >> 1")
+          self.lprint("val x = {}[mid]".format(valueTable))
+          self.lprint("if v < x : search(lo, mid)")
+          self.lprint("else if v > x : search(mid + 1, hi)")
+          self.lprint("else : {}[mid]".format(enumTable))
+      self.lprint("search(0, length({}))".format(valueTable))
+
+  def dump_constructor(self):
+    """ Constructor from the integer value to the enumerator.
+    The lookup is selected from the distribution of the values -
+    See `lookup_kind`.
+    """
+    values = self.unique_values()
+    kind = self.lookup_kind(values)
+    if kind == "dense":
+      self.dump_dense_lookup(values)
+    elif kind == "sparse":
+      self.dump_sparse_lookup(values)
+    else:
+      self.lprint("public defn {} (v:Int) -> {} :".format(self._name, self._name))
+      with self.indented():
+        self.dump_switch_lookup(values)
     self.lprint("")
 
     self.lprint("public lostanza defn {} (v:int) -> ref<{}> :".format(self._name, self._name))
@@ -184,25 +635,166 @@ class EnumExporter(LBStanzaExporter):
   def dump_print(self):
     self.lprint("public defmethod print (o:OutputStream, v:{}) :".format(self._name))
     with self.indented():
-      self.lprint("match(v) :")
-      with self.indented():
-        for eName, v in self._enumerators :
-          self.lprint("(x:{}) : print(o, \"{}\")".format(self.to_type(eName), eName))
+      self.lprint("print(o, enum-name(v))")
     self.lprint("")
 
   def dump_equals(self):
     self.lprint("public defmethod equal? (a:{}, b:{}) -> True|False :".format(self._name, self._name))
+    with self.indented():
+      self.lprint("enum-value(a) == enum-value(b)")
+    self.lprint("")
+
+  def dump_enums(self, opts):
+    with self.buffered():
+      self.dump_autogen_header()
+
+      imports = ["core",]
+      self.dump_package_decl(opts.pkg_prefix, self._name, imports)
+      self.dump_enum_deftypes()
+      self.dump_to_int()
+      self.dump_constructor()
+      self.dump_print()
+      self.dump_equals()
+
+
+class FlagEnumExporter(LBStanzaExporter):
+  """ Exporter for C enums that are sets of bit flags - See
+  `EnumVisitor.is_flag_enum`. Instead of a type per enumerator, a
+  flag word is a single object holding the `int` value. The
+  enumerators are constants of that type that are combined with
+  `|` and `&` and tested with `contains?`. The lostanza constructor
+  and `bits` accessor let the wrappers pass the word to and from C
+  without boxing the value.
+  """
+
+  def __init__(self, fout, name, enumerators):
+    """
+    @param fout Output File Object to export to
+    @param name Name of the flag set type
+    @param enumerators List of tuples of the form (name, value)
+    """
+    super().__init__(fout)
+    self._name = name
+    self._enumerators = enumerators
+
+  @staticmethod
+  def to_int32(v):
+    """ Flags in bit 31 are negative as a stanza `Int`
+    """
+    v &= 0xFFFFFFFF
+    return v - (1 << 32) if v & 0x80000000 else v
+
+  def single_bits(self):
+    """
+    @return List of (name, value) for the first enumerator of
+      each single bit flag in order of the bits.
+    """
+    byValue = {}
+    for eName, v in self._enumerators:
+      if v > 0 and (v & (v - 1)) == 0:
+        byValue.setdefault(v, eName)
+    return [(eName, v) for v, eName in sorted(byValue.items())]
+
+  def dump_deftype(self):
+    name = self._name
+    self.lprint("public lostanza deftype {} <: Equalable & Hashable :".format(name))
+    with self.indented():
+      self.lprint("value:int")
+    self.lprint("")
+
+    self.lprint("public lostanza defn {} (v:int) -> ref<{}> :".format(name, name))
+    with self.indented():
+      self.lprint("return new {}{{v}}".format(name))
+    self.lprint("")
+
+    self.lprint("public lostanza defn {} (v:ref<Int>) -> ref<{}> :".format(name, name))
+    with self.indented():
+      self.lprint("return new {}{{v.value}}".format(name))
+    self.lprint("")
+
+    self.lprint("public lostanza defn bits (f:ref<{}>) -> int :".format(name))
+    with self.indented():
+      self.lprint("return f.value")
+    self.lprint("")
+
+    self.lprint("public lostanza defn to-int (f:ref<{}>) -> ref<Int> :".format(name))
+    with self.indented():
+      self.lprint("return new Int{f.value}")
+    self.lprint("")
+
+  def dump_constants(self):
+    for eName, v in self._enumerators:
+      self.lprint("public val {} = {}({})".format(eName, self._name, self.to_int32(v)))
+    self.lprint("")
+
+  def dump_operations(self):
+    name = self._name
+    for fName, op in [("bit-or", "|"), ("bit-and", "&")]:
+      self.lprint("public lostanza defn {} (a:ref<{}>, b:ref<{}>) -> ref<{}> :".format(fName, name, name, name))
+      with self.indented():
+        self.lprint("return new {}{{a.value {} b.value}}".format(name, op))
+      self.lprint("")
+
+    self.lprint("public lostanza defn contains? (a:ref<{}>, b:ref<{}>) -> ref<True|False> :".format(name, name))
+    with self.indented():
+      self.lprint("if (a.value & b.value) == b.value : return true")
+      self.lprint("else : return false")
+    self.lprint("")
+
+    self.lprint("public defmethod equal? (a:{}, b:{}) -> True|False :".format(name, name))
     with self.indented():
       self.lprint("to-int(a) == to-int(b)")
     self.lprint("")
 
+    self.lprint("public defmethod hash (a:{}) -> Int :".format(name))
+    with self.indented():
+      self.lprint("to-int(a)")
+    self.lprint("")
+
+  def dump_print(self):
+    """ Print the names of the set flags separated by `|` - any bits
+    without a name are printed as a number.
+    """
+    name = self._name
+    bits = self.single_bits()
+    zeros = [eName for eName, v in self._enumerators if v == 0]
+
+    self.lprint("val {}-names = [{}]".format(name, ", ".join('"{}"'.format(x) for x, _ in bits)))
+    self.lprint("val {}-bits = [{}]".format(name, ", ".join(str(self.to_int32(v)) for _, v in bits)))
+    self.lprint("")
+
+    self.lprint("public defmethod print (o:OutputStream, f:{}) :".format(name))
+    with self.indented():
+      self.lprint("val v = to-int(f)")
+      if len(zeros) > 0:
+        self.lprint("if v == 0 :")
+        with self.indented():
+          self.lprint('print(o, "{}")'.format(zeros[0]))
+        self.lprint("else :")
+        self.indent()
+      self.lprint("var rest = v")
+      self.lprint("var sep = \"\"")
+      self.lprint("for (n in {}-names, b in {}-bits) do :".format(name, name))
+      with self.indented():
+        self.lprint("if (v & b) != 0 :")
+        with self.indented():
+          self.lprint("print-all(o, [sep, n])")
+          self.lprint("sep = \"|\"")
+          self.lprint("rest = rest - b")
+      self.lprint("if rest != 0 or sep == \"\" :")
+      with self.indented():
+        self.lprint("print-all(o, [sep, rest])")
+      if len(zeros) > 0:
+        self.dedent()
+    self.lprint("")
+
   def dump_enums(self, opts):
-    self.dump_autogen_header()
-
-    imports = ["core",]
-    self.dump_package_decl(opts.pkg_prefix, self._name, imports)
-    self.dump_enum_deftypes()
-    self.dump_to_int()
-    self.dump_constructor()
-    self.dump_print()
-    self.dump_equals()
+    with self.buffered():
+      self.dump_autogen_header()
+
+      imports = ["core",]
+      self.dump_package_decl(opts.pkg_prefix, self._name, imports)
+      self.dump_deftype()
+      self.dump_constants()
+      self.dump_operations()
+      self.dump_print()
@@ -0,0 +1,117 @@
+import re
+import json
+from collections import OrderedDict
+
+from lbstanza_wrappers.CDefIR import CharIdentifier
+from lbstanza_wrappers.StructLayout import stanza_primitive
+
+# Names of out parameters - `out`, `result`, `out_len`, `width_out`, `outCount`, etc
+DEFAULT_OUT_PATTERN = r"^(out|result|ret)$|^(out|ret)_|_(out|ret|result)$|^(out|pOut)[A-Z0-9]"
+
+# Stanza primitives that an out parameter can point to
+CELL_TYPES = ["byte", "int", "long", "float", "double"]
+
+
+class OutParams(object):
+  """ Find the out parameters of a function - the pointers that the
+  function writes its results through, eg `int get_size(ctx_t * ctx,
+  int * out_w, int * out_h)`. A wrapper can then pass the address of a
+  local variable for each out parameter and return the values.
+  An out parameter is a non-const pointer to a numeric type whose
+  name matches the out pattern. The C type must have the size of the
+  stanza variable that the wrapper passes - ie, a `short *` or
+  `size_t *` that is an `int` in stanza is not an out parameter. An annotation file lists the out
+  parameters of specific functions instead:
+
+    {
+      "get_size": ["w", "h"],
+      "parse_int": ["value"]
+    }
+
+  For the annotated functions, only the listed parameters are used
+  and `char *` parameters can be out parameters.
+  """
+
+  def __init__(self, outPattern=DEFAULT_OUT_PATTERN, annotations={}):
+    """
+    @param outPattern Regular expression matched against the
+      names of the pointer arguments.
+    @param annotations Dict of function name => list of out
+      parameter names.
+    """
+    try:
+      self._outPattern = re.compile(outPattern)
+    except re.error as exc:
+      raise ValueError("Invalid Out Parameter Pattern '{}': {}".format(outPattern, exc))
+    self._annotations = annotations
+
+  @classmethod
+  def from_opts(cls, opts):
+    """ Construct the out parameter finder from the command line options
+    @return OutParams or None if out wrappers are not enabled.
+    """
+    fpath = getattr(opts, "out_annotations", None)
+    if not getattr(opts, "out_wrappers", False) and fpath is None:
+      return None
+    annotations = {}
+    if fpath is not None:
+      annotations = cls.load_annotations(fpath)
+    pattern = getattr(opts, "out_param_pattern", None) or DEFAULT_OUT_PATTERN
+    return cls(pattern, annotations)
+
+  @staticmethod
+  def load_annotations(fpath):
+    with open(fpath, "r") as f:
+      content = json.load(f)
+    if not isinstance(content, dict):
+      raise ValueError("{}: Out Annotations must be a JSON object of function name => parameters".format(fpath))
+    for name, params in content.items():
+      if not isinstance(params, list) or not all(isinstance(x, str) for x in params):
+        raise ValueError("{}: Out Parameters of '{}' must be a list of argument names".format(fpath, name))
+    return content
+
+  @staticmethod
+  def cell_type(argType, layout, allowChar):
+    """
+    @param layout CLayout of the pointed to type or None
+    @return Stanza primitive of the value written through an
+      out parameter or None
+    """
+    lbType, numPtrs, isConst = argType.resolve()
+    if numPtrs != 1 or isConst:
+      return None
+    if not allowChar and isinstance(lbType, CharIdentifier):
+      return None
+    base = lbType.to_stanza()
+    if stanza_primitive(layout) != base:
+      return None
+    return base if base in CELL_TYPES else None
+
+  def find(self, name, data):
+    """ Find the out parameters of a function
+    @param name Name of the function
+    @param data FunctionData
+    @return OrderedDict of argument name => stanza primitive
+      of the value.
+    """
+    ret = OrderedDict()
+    args = data.args
+    layouts = data.layouts
+    annotated = self._annotations.get(name)
+    if annotated is not None:
+      for argName in annotated:
+        if argName not in args:
+          raise ValueError("Out Annotation of '{}': No argument named '{}'".format(name, argName))
+        cellType = self.cell_type(args[argName], layouts.get(argName), True)
+        if cellType is None:
+          raise ValueError("Out Annotation of '{}': '{}' is not a non-const pointer to a numeric type of the same size in C and stanza".format(name, argName))
+        ret[argName] = cellType
+      return ret
+
+    for argName, argType in args.items():
+      if self._outPattern.search(argName) is None:
+        continue
+      cellType = self.cell_type(argType, layouts.get(argName), False)
+      if cellType is not None:
+        ret[argName] = cellType
+    return ret
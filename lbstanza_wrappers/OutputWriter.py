@@ -0,0 +1,231 @@
+import os
+import stat
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+try:
+  import fcntl
+except ImportError:
+  # Not available on Windows - the manifest update is
+  #  then not protected against concurrent writers.
+  fcntl = None
+
+
+ADDED = "added"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+
+def content_hash(content):
+  return hashlib.sha256(content).hexdigest()
+
+def current_umask():
+  ret = os.umask(0)
+  os.umask(ret)
+  return ret
+
+# The umask can only be read by setting it - this is done once at
+#  import instead of while the writer threads are creating files.
+UMASK = current_umask()
+
+def file_mode(fpath):
+  """ Permissions for a new version of `fpath` - the mode of the
+  existing file, or the default mode for a new file.
+  """
+  try:
+    return stat.S_IMODE(os.stat(fpath).st_mode)
+  except FileNotFoundError:
+    return 0o666 & ~UMASK
+
+def atomic_write(fpath, content):
+  """ Write bytes to a file by writing a temp file in the same
+  directory and then renaming it over the destination. Readers
+  never see a partially written file. The file keeps its existing
+  permissions - or gets the umask permissions if it is new.
+  """
+  outDir = os.path.dirname(fpath) or "."
+  fd, tmpPath = tempfile.mkstemp(prefix=".tmp-", dir=outDir)
+  try:
+    with os.fdopen(fd, "wb") as f:
+      f.write(content)
+    # `mkstemp` creates the file with mode 0600
+    os.chmod(tmpPath, file_mode(fpath))
+    os.replace(tmpPath, fpath)
+  except BaseException:
+    try:
+      os.remove(tmpPath)
+    except FileNotFoundError:
+      pass
+    raise
+
+def write_if_changed(fpath, content):
+  """ Write the content to a file only if it differs from the
+  file's current content. Leaving unchanged files alone keeps their
+  mtime so that `stanza build` doesn't recompile them.
+  @param fpath Destination File Path
+  @param content String content of the file.
+  @return One of ADDED, CHANGED, or UNCHANGED
+  """
+  data = content.encode("utf-8")
+  try:
+    with open(fpath, "rb") as f:
+      existing = f.read()
+  except FileNotFoundError:
+    existing = None
+
+  if existing == data:
+    return UNCHANGED
+
+  atomic_write(fpath, data)
+  return ADDED if existing is None else CHANGED
+
+
+@dataclass
+class OutputStats:
+  added:int = 0
+  changed:int = 0
+  unchanged:int = 0
+  removed:int = 0
+
+  def count(self, status):
+    setattr(self, status, getattr(self, status) + 1)
+
+  def __str__(self):
+    return "{} added, {} changed, {} unchanged, {} removed".format(
+      self.added, self.changed, self.unchanged, self.removed
+    )
+
+
+class OutputTree(object):
+  """ Write-if-changed output directory with a manifest.
+  The manifest (`.manifest` in the output directory) records the
+  content hash of each file generated from each source header.
+  This is used to:
+    1.  Skip re-reading files whose size and mtime match the manifest
+         when the new content has the same hash.
+    2.  Remove files that a previous run generated from the same
+         source but that this run did not.
+  """
+  MANIFEST = ".manifest"
+  VERSION = 1
+
+  def __init__(self, outDir, source):
+    """
+    @param outDir Output directory - created if it doesn't exist
+    @param source Name of the header that generated the files in this run.
+    """
+    if os.path.exists(outDir):
+      if not os.path.isdir(outDir):
+        raise ValueError("Output Directory Exists but isn't a Directory")
+    else:
+      os.makedirs(outDir)
+
+    self._dir = outDir
+    self._source = os.path.abspath(source)
+    self._prev = self.read_manifest().get(self._source, {})
+    self._files = {}
+    self.stats = OutputStats()
+    # Protects the bookkeeping when files are written from
+    #  multiple threads.
+    self._lock = threading.Lock()
+
+  @property
+  def manifest_path(self):
+    return os.path.join(self._dir, self.MANIFEST)
+
+  def read_manifest(self):
+    try:
+      with open(self.manifest_path, "r") as f:
+        content = json.load(f)
+    except FileNotFoundError:
+      return {}
+    except ValueError as exc:
+      logging.warning("Ignoring Invalid Manifest '{}': {}".format(self.manifest_path, exc))
+      return {}
+
+    if content.get("version") != self.VERSION:
+      return {}
+    return content.get("sources", {})
+
+  @contextmanager
+  def _locked(self):
+    if fcntl is None:
+      yield
+      return
+    with open(self.manifest_path + ".lock", "w") as lock:
+      fcntl.flock(lock, fcntl.LOCK_EX)
+      try:
+        yield
+      finally:
+        fcntl.flock(lock, fcntl.LOCK_UN)
+
+  def write(self, fname, content):
+    """ Write a generated file into the output directory.
+    @param fname File name relative to the output directory
+    @param content String content of the file.
+    """
+    fpath = os.path.join(self._dir, fname)
+    data = content.encode("utf-8")
+    digest = content_hash(data)
+
+    prev = self._prev.get(fname)
+    status = None
+    if prev is not None and prev["hash"] == digest:
+      try:
+        st = os.stat(fpath)
+        if st.st_size == prev["size"] and st.st_mtime_ns == prev["mtime_ns"]:
+          status = UNCHANGED
+      except FileNotFoundError:
+        pass
+
+    if status is None:
+      status = write_if_changed(fpath, content)
+
+    st = os.stat(fpath)
+    with self._lock:
+      self._files[fname] = {"hash": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+      self.stats.count(status)
+    return status
+
+  def write_all(self, files, jobs=1):
+    """ Write many generated files - concurrently if `jobs` is
+    greater than 1. Each file is still written atomically.
+    @param files List of (fname, content) tuples
+    @param jobs Number of writer threads
+    @return List of the status of each file in the same order.
+    """
+    if jobs <= 1 or len(files) <= 1:
+      return [self.write(fname, content) for fname, content in files]
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+      return list(pool.map(lambda x: self.write(*x), files))
+
+  def finish(self):
+    """ Remove stale files from the previous run of the same source and
+    update the manifest.
+    @return OutputStats for this run.
+    """
+    with self._locked():
+      sources = self.read_manifest()
+      prev = sources.get(self._source, {})
+      for fname in prev.keys():
+        if fname in self._files:
+          continue
+        # Another source may have since generated the same file
+        if any(fname in files for src, files in sources.items() if src != self._source):
+          continue
+        try:
+          os.remove(os.path.join(self._dir, fname))
+          self.stats.count("removed")
+        except FileNotFoundError:
+          pass
+
+      sources[self._source] = self._files
+      content = json.dumps({"version": self.VERSION, "sources": sources}, indent=1, sort_keys=True)
+      atomic_write(self.manifest_path, content.encode("utf-8"))
+
+    return self.stats
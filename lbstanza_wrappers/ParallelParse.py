@@ -0,0 +1,148 @@
+import gc
+import logging
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+import pycparser
+from pycparser import c_parser, c_ast
+
+from lbstanza_wrappers.TopLevel import split_toplevel
+
+
+class SeededCParser(c_parser.CParser):
+  """ CParser that can start a parse with a set of names already
+  declared at file scope. This allows a fragment of a translation
+  unit to be parsed on its own as long as the typedef names declared
+  before the fragment are known.
+  @NOTE - This uses the parser's private scope stack. The
+    pycparser version is pinned in `requirements.txt` and bounded
+    in `setup.py`. See `seeding_supported`.
+  """
+
+  def seeding_supported(self):
+    """ Check that this pycparser version has the private
+    attributes that `parse_seeded` replaces.
+    """
+    return all(hasattr(self, x) for x in ["_scope_stack", "_last_yielded_token", "cparser", "clex"])
+
+  def parse_seeded(self, text, filename="", scope=None):
+    """
+    @param text C source fragment
+    @param filename Name for error messages
+    @param scope Dict of name => True if the name is a typedef name.
+    @return Tuple of (FileAST, file scope dict after the parse)
+    """
+    self.clex.filename = filename
+    self.clex.reset_lineno()
+    self._scope_stack = [dict(scope or {})]
+    self._last_yielded_token = None
+    node = self.cparser.parse(input=text, lexer=self.clex)
+    return node, self._scope_stack[0]
+
+
+@contextmanager
+def gc_paused():
+  """ Pause the cyclic garbage collector.
+  Parsing and unpickling create millions of small objects and none
+  of them are garbage, so the collector runs repeatedly for nothing.
+  """
+  wasEnabled = gc.isenabled()
+  gc.disable()
+  try:
+    yield
+  finally:
+    if wasEnabled:
+      gc.enable()
+
+
+# Each worker process constructs its parser once.
+_worker_parser = None
+
+def parse_fragment(args):
+  """ Process Pool worker - parse a run of consecutive chunks.
+  @param args Tuple of (text, filename, typedef names)
+  @return List of top-level AST nodes.
+  """
+  global _worker_parser
+  if _worker_parser is None:
+    _worker_parser = SeededCParser()
+  text, filename, typedefs = args
+  scope = dict.fromkeys(typedefs, True)
+  with gc_paused():
+    node, _ = _worker_parser.parse_seeded(text, filename, scope)
+  return node.ext
+
+def group_chunks(chunks, numGroups):
+  """ Group consecutive non-typedef chunks into runs of about equal size.
+  Typedef chunks are returned on their own.
+  @return List of (isTypedef, [Chunk])
+  """
+  total = sum(len(x.text) for x in chunks)
+  target = max(1, total // max(1, numGroups))
+
+  groups = []
+  run = []
+  runSize = 0
+  for chunk in chunks:
+    if chunk.is_typedef:
+      if len(run) > 0:
+        groups.append((False, run))
+        run, runSize = [], 0
+      groups.append((True, [chunk]))
+      continue
+    run.append(chunk)
+    runSize += len(chunk.text)
+    if runSize >= target:
+      groups.append((False, run))
+      run, runSize = [], 0
+  if len(run) > 0:
+    groups.append((False, run))
+  return groups
+
+def parse_parallel(text, filename, jobs, groupsPerJob=4):
+  """ Parse a large preprocessed translation unit using a pool of
+  worker processes.
+
+  The text is split at top-level declaration boundaries. The typedef
+  declarations are parsed in order in this process - this is the only
+  way new typedef names are introduced, which the C grammar requires to
+  parse the declarations that follow. Runs of other declarations are
+  sent to the workers along with the typedef names declared before
+  them. The results are merged into one `FileAST` in source order.
+
+  @param text Preprocessed C source
+  @param filename Name of the source file
+  @param jobs Number of worker processes
+  @param groupsPerJob Number of work items per worker - more items
+    balance the load better but add overhead.
+  @return FileAST
+  """
+  parser = SeededCParser()
+  if not parser.seeding_supported():
+    logging.warning("Parallel Parse: Not supported by pycparser {} - Parsing sequentially".format(pycparser.__version__))
+    with gc_paused():
+      return parser.parse(text, filename)
+
+  chunks = split_toplevel(text, filename)
+  groups = group_chunks(chunks, jobs * groupsPerJob)
+  logging.debug("Parallel Parse: {} chunks in {} groups".format(len(chunks), len(groups)))
+
+  scope = {}
+  results = []
+  with gc_paused(), ProcessPoolExecutor(max_workers=jobs) as pool:
+    for isTypedef, run in groups:
+      fragment = run[0].marker() + "".join(x.text for x in run)
+      if isTypedef:
+        node, scope = parser.parse_seeded(fragment, filename, scope)
+        results.append(node.ext)
+      else:
+        typedefs = [k for k, v in scope.items() if v]
+        results.append(pool.submit(parse_fragment, (fragment, filename, typedefs)))
+
+    ext = []
+    for res in results:
+      if isinstance(res, list):
+        ext.extend(res)
+      else:
+        ext.extend(res.result())
+  return c_ast.FileAST(ext)
@@ -0,0 +1,136 @@
+import os
+import time
+import pickle
+import hashlib
+import logging
+import tempfile
+
+import pycparser
+
+
+class ParseCache(object):
+  """ On-disk cache of parsed `FileAST` objects.
+  Entries are keyed by a hash of the preprocessed header text,
+  the `cpp` arguments and the pycparser version - so any change
+  to the header or to anything it includes results in a new entry.
+
+  The cache directory can be shared by multiple processes:
+    - Entries are written to a temp file and then atomically renamed
+       into place, so readers never see a partial entry.
+    - An entry that disappears (evicted by another process) or fails
+       to load is treated as a miss.
+  The size of the cache is bounded by evicting the least recently
+  used entries. A cache hit touches the entry's mtime.
+  """
+  # Bump this when the content of the cache entries changes.
+  FORMAT_VERSION = 1
+  SUFFIX = ".ast"
+  TEMP_PREFIX = ".tmp-"
+  # Temp files older than this (seconds) are left over from a
+  #  writer that crashed and can be removed.
+  STALE_TEMP_AGE = 3600
+
+  def __init__(self, cacheDir, maxSize):
+    """
+    @param cacheDir Directory where cache entries are stored
+    @param maxSize Maximum total size of the cache entries in bytes.
+    """
+    self._dir = cacheDir
+    self._maxSize = maxSize
+    os.makedirs(self._dir, exist_ok=True)
+
+  @classmethod
+  def from_opts(cls, opts):
+    """ Construct the cache from the command line options
+    @return ParseCache or None if caching is not enabled.
+    """
+    if opts.cache_dir is None:
+      return None
+    return cls(opts.cache_dir, opts.cache_max_size * 1024 * 1024)
+
+  def key(self, text, cppArgs):
+    h = hashlib.sha256()
+    for comp in [str(self.FORMAT_VERSION), pycparser.__version__, cppArgs, text]:
+      h.update(comp.encode("utf-8"))
+      h.update(b"\0")
+    return h.hexdigest()
+
+  def entry_path(self, key):
+    return os.path.join(self._dir, key + self.SUFFIX)
+
+  def load(self, key):
+    """ Retrieve the AST for a key.
+    @return FileAST or None if this key is not in the cache.
+    """
+    fpath = self.entry_path(key)
+    try:
+      with open(fpath, "rb") as f:
+        node = pickle.load(f)
+    except FileNotFoundError:
+      return None
+    except Exception as exc:
+      logging.warning("Discarding Unreadable Parse Cache Entry '{}': {}".format(fpath, exc))
+      self._remove(fpath)
+      return None
+
+    try:
+      os.utime(fpath)
+    except FileNotFoundError:
+      pass
+    logging.debug("Parse Cache Hit: {}".format(key))
+    return node
+
+  def store(self, key, node):
+    """ Add an AST to the cache and then evict old entries if
+    the cache is over its size limit.
+    """
+    try:
+      content = pickle.dumps(node, protocol=pickle.HIGHEST_PROTOCOL)
+    except RecursionError:
+      logging.warning("AST is too deep to serialize - Skipping Parse Cache Store")
+      return
+
+    fd, tmpPath = tempfile.mkstemp(prefix=self.TEMP_PREFIX, dir=self._dir)
+    try:
+      with os.fdopen(fd, "wb") as f:
+        f.write(content)
+      os.replace(tmpPath, self.entry_path(key))
+    except BaseException:
+      self._remove(tmpPath)
+      raise
+
+    logging.debug("Parse Cache Store: {} ({} bytes)".format(key, len(content)))
+    self.evict()
+
+  def evict(self):
+    """ Remove least recently used entries until the cache fits
+    within its size limit.
+    """
+    now = time.time()
+    entries = []
+    total = 0
+    with os.scandir(self._dir) as it:
+      for ent in it:
+        try:
+          st = ent.stat()
+        except FileNotFoundError:
+          continue
+        if ent.name.startswith(self.TEMP_PREFIX):
+          if now - st.st_mtime > self.STALE_TEMP_AGE:
+            self._remove(ent.path)
+        elif ent.name.endswith(self.SUFFIX):
+          entries.append((st.st_mtime, st.st_size, ent.path))
+          total += st.st_size
+
+    entries.sort()
+    for _, size, fpath in entries:
+      if total <= self._maxSize:
+        break
+      self._remove(fpath)
+      total -= size
+
+  def _remove(self, fpath):
+    try:
+      os.remove(fpath)
+    except FileNotFoundError:
+      pass
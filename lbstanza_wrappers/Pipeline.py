@@ -0,0 +1,180 @@
+import gc
+import logging
+from pycparser import preprocess_file, c_parser
+import pycparser_fake_libc
+
+from lbstanza_wrappers.EnumVisitor import EnumVisitor
+from lbstanza_wrappers.FuncDeclVisitor import FuncDeclVisitor
+from lbstanza_wrappers.CombinedVisitor import CombinedVisitor
+from lbstanza_wrappers.ParseCache import ParseCache
+from lbstanza_wrappers.ParallelParse import parse_parallel, gc_paused
+from lbstanza_wrappers.StreamParse import iter_parsed
+from lbstanza_wrappers.Timings import get_timer
+from lbstanza_wrappers.Selection import OriginFilter
+from lbstanza_wrappers.Slicer import slice_text
+from lbstanza_wrappers.IRSnapshot import IRSnapshot
+
+
+def prep_args(opts):
+  def to_header(fpath):
+    return "-I" + fpath
+  fake_libc_arg = to_header(pycparser_fake_libc.directory)
+  others = [to_header(x) for x in opts.include]
+  cpp_arg_list = others + [fake_libc_arg]
+  cpp_args = " ".join(cpp_arg_list)
+  return cpp_args
+
+def preprocess_header(opts):
+  """ Run the C preprocessor on the input header.
+  With `--slice`, the declarations from headers not selected by
+  `--only-from` are dropped unless they are needed by the
+  selected declarations.
+  @return Tuple of (preprocessed text, cpp arguments)
+  """
+  timer = get_timer(opts)
+  cpp_args = prep_args(opts)
+  with timer.phase("preprocess"):
+    text = preprocess_file(opts.input, cpp_args=cpp_args)
+
+  if opts.slice:
+    origin = OriginFilter.from_opts(opts)
+    if origin is None:
+      raise ValueError("The `--slice` option requires at least one `--only-from` filter")
+    with timer.phase("slice"):
+      text = slice_text(text, opts.input, origin)
+  return text, cpp_args
+
+def parse_header(opts):
+  """ Run the C preprocessor on the input header and then parse
+  the result - See `parse_text`.
+  @return FileAST
+  """
+  text, cpp_args = preprocess_header(opts)
+  return parse_text(opts, text, cpp_args)
+
+def parse_text(opts, text, cpp_args, parser=None):
+  """ Parse the preprocessed header. If a `--cache-dir` is configured,
+  the parsed AST is looked up in the cache by the content of the
+  preprocessed text and the parse is skipped on a hit.
+  With `--parse-jobs` greater than 1, the parse is split across
+  a pool of worker processes.
+  @param parser CParser to reuse. Constructing the parser builds the
+    parse tables so long running callers keep one between parses.
+  @return FileAST
+  """
+  with get_timer(opts).phase("parse"):
+    cache = ParseCache.from_opts(opts)
+    if cache is not None:
+      key = cache.key(text, cpp_args)
+      node = cache.load(key)
+      if node is not None:
+        return node
+
+    if opts.parse_jobs > 1:
+      node = parse_parallel(text, opts.input, opts.parse_jobs)
+    else:
+      if parser is None:
+        parser = c_parser.CParser()
+      with gc_paused():
+        node = parser.parse(text, opts.input)
+
+    if cache is not None:
+      cache.store(key, node)
+  return node
+
+def stream_visit(opts, v):
+  """ Parse and visit the header a fragment at a time so that
+  the AST of each fragment is released once it is captured.
+  """
+  if opts.cache_dir is not None or opts.parse_jobs > 1:
+    logging.warning("The `--cache-dir` and `--parse-jobs` options are ignored with `--stream`")
+
+  timer = get_timer(opts)
+  text, _ = preprocess_header(opts)
+  visit = v.visit_pruned if opts.fast_visit else v.visit
+  fragments = iter_parsed(text, opts.input)
+  # The AST has no reference cycles - each fragment is freed by
+  #  reference counting once it is visited. The collector would
+  #  only repeatedly traverse the newest fragment.
+  with gc_paused():
+    while True:
+      with timer.phase("parse"):
+        node = next(fragments, None)
+      if node is None:
+        break
+      with timer.phase("visit"):
+        visit(node)
+      del node
+
+def visit_node(opts, v, node):
+  # The AST was built with the collector paused so all of it is in
+  #  the youngest generation. Without this, the first collections
+  #  during the visit traverse every node of the AST. The objects are
+  #  unfrozen afterwards so that the AST can be collected and later
+  #  headers of a `batch` or `watch` run are not affected.
+  gc.freeze()
+  try:
+    with get_timer(opts).phase("visit"):
+      if opts.fast_visit:
+        v.visit_pruned(node)
+      else:
+        v.visit(node)
+  finally:
+    gc.unfreeze()
+
+def export_visitor(opts, v):
+  if getattr(opts, "save_ir", None) is not None:
+    with get_timer(opts).phase("write"):
+      v.snapshot().save(opts.save_ir)
+  v.export()
+
+def visit_and_export(opts, v):
+  if opts.stream:
+    stream_visit(opts, v)
+  else:
+    visit_node(opts, v, parse_header(opts))
+  export_visitor(opts, v)
+
+def process_func_decl(opts):
+  visit_and_export(opts, FuncDeclVisitor(opts))
+
+def process_enums(opts):
+  visit_and_export(opts, EnumVisitor(opts))
+
+def process_all(opts):
+  visit_and_export(opts, CombinedVisitor(opts))
+
+def process_from_ir(opts):
+  """ Render the stanza packages from a snapshot written by
+  `--save-ir` - the header is not preprocessed or parsed.
+  The snapshot selects the extraction - functions, enums or both.
+  """
+  with get_timer(opts).phase("load"):
+    snap = IRSnapshot.load(opts.snapshot)
+  opts.input = snap.input
+
+  if snap.has_funcs and snap.has_enums:
+    v = CombinedVisitor(opts)
+  elif snap.has_funcs:
+    v = FuncDeclVisitor(opts)
+  else:
+    v = EnumVisitor(opts)
+  v.restore(snap)
+  v.export()
+
+# Maps the extraction sub-command name to the visitor
+#  that captures its declarations.
+VISITORS = {
+  "enums" : EnumVisitor,
+  "func-decl" : FuncDeclVisitor,
+  "all" : CombinedVisitor,
+}
+
+# Maps the extraction sub-command name to the function
+#  that implements it. The batch runner uses this to
+#  select the work done for each header.
+EXTRACTORS = {
+  "enums" : process_enums,
+  "func-decl" : process_func_decl,
+  "all" : process_all,
+}
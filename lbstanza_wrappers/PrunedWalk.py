@@ -0,0 +1,54 @@
+from pycparser import c_ast
+
+# Child attributes of each node type that can contain a declaration,
+#  in the same order as `NodeVisitor.generic_visit` visits them.
+#  Nodes not listed here (function bodies, expressions, initializers,
+#  array dimensions, enumerator values) are never descended into.
+DECL_CHILDREN = {
+  c_ast.FileAST : ("ext",),
+  c_ast.FuncDef : ("decl", "param_decls"),
+  c_ast.Decl : ("type",),
+  c_ast.Typedef : ("type",),
+  c_ast.Typename : ("type",),
+  c_ast.TypeDecl : ("type",),
+  c_ast.PtrDecl : ("type",),
+  c_ast.ArrayDecl : ("type",),
+  c_ast.FuncDecl : ("args", "type"),
+  c_ast.ParamList : ("params",),
+  c_ast.Struct : ("decls",),
+  c_ast.Union : ("decls",),
+}
+
+# Parents of the outermost declarations - a `Decl` or `Typedef`
+#  whose parent is one of these is not nested in another declaration.
+TOP_LEVEL = (c_ast.FileAST, c_ast.FuncDef)
+
+
+def iter_decl_nodes(root, stop=()):
+  """ Walk the declaration structure of an AST in the same pre-order
+  as `NodeVisitor` without recursing into function bodies or
+  expressions. The walk uses an explicit stack so that deeply nested
+  declarations can't hit the recursion limit.
+  @param root AST node to start from - normally the FileAST.
+  @param stop Tuple of node types to yield but not descend into.
+  @return Iterator of (node, parent) tuples. The parent of `root` is None.
+  """
+  stack = [(root, None)]
+  while len(stack) > 0:
+    node, parent = stack.pop()
+    yield node, parent
+    if isinstance(node, stop):
+      continue
+    attrs = DECL_CHILDREN.get(type(node))
+    if attrs is None:
+      continue
+    children = []
+    for attr in attrs:
+      child = getattr(node, attr)
+      if child is None:
+        continue
+      elif isinstance(child, list):
+        children.extend(child)
+      else:
+        children.append(child)
+    stack.extend((x, node) for x in reversed(children))
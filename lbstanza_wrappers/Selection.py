@@ -0,0 +1,171 @@
+import os
+import re
+import logging
+from collections import Counter
+from fnmatch import fnmatchcase, translate
+
+GLOB_CHARS = re.compile(r"[*?\[]")
+
+
+class OriginFilter(object):
+  """ Select declarations by the file they were declared in - as
+  reported by the `coord` of the AST node. Declarations from other
+  files (ie, the system headers) still feed the type table but
+  don't generate any output.
+  """
+
+  def __init__(self, patterns):
+    """
+    @param patterns List of directories, file paths or glob patterns.
+      A directory selects every file below it.
+    """
+    self._patterns = [os.path.abspath(x) for x in patterns]
+    # Every declaration from a file has the same result so
+    #  the matching is done once per file.
+    self._files = {}
+    # Kind of declaration => Number filtered out
+    self.filtered = Counter()
+
+  @classmethod
+  def from_opts(cls, opts):
+    """ Construct the filter from the command line options
+    @return OriginFilter or None if there is no `--only-from` filter.
+    """
+    patterns = getattr(opts, "only_from", None)
+    if not patterns:
+      return None
+    return cls(patterns)
+
+  def _match(self, fname):
+    fpath = os.path.abspath(fname)
+    for pattern in self._patterns:
+      if fpath == pattern or fpath.startswith(pattern + os.sep):
+        return True
+      if fnmatchcase(fpath, pattern):
+        return True
+    return False
+
+  def accepts_file(self, fname):
+    """ Check whether a file is one of the selected files.
+    """
+    ret = self._files.get(fname)
+    if ret is None:
+      ret = self._match(fname)
+      self._files[fname] = ret
+    return ret
+
+  def accepts(self, node, kind):
+    """ Check whether the declaration at `node` should generate output.
+    @param node AST node of the declaration
+    @param kind Name of the declaration kind for the summary - eg "function"
+    @return True if the node is from one of the selected files.
+    """
+    if node.coord is None or node.coord.file is None:
+      return True
+    ret = self.accepts_file(node.coord.file)
+    if not ret:
+      self.filtered[kind] += 1
+    return ret
+
+  def log_summary(self):
+    if len(self.filtered) == 0:
+      return
+    counts = ", ".join("{} {}s".format(v, k) for k, v in sorted(self.filtered.items()))
+    ignored = sorted(k for k, v in self._files.items() if not v)
+    logging.info("Origin Filter: Skipped {} from {} other files".format(counts, len(ignored)))
+    for fname in ignored:
+      logging.debug("Origin Filter: Skipped File '{}'".format(fname))
+
+
+class SymbolMatcher(object):
+  """ Select declarations by name with `--include-symbols` and
+  `--exclude-symbols`. Each pattern is one of:
+    - `re:<regex>` - Regular expression searched for in the name.
+    - `@<path>` - File with one name or pattern per line. Blank lines
+       and lines starting with `#` are ignored.
+    - A glob like `gl*` - or an exact name if there are no
+       glob characters.
+  The exact names on each side are collected in a set and each
+  other pattern is compiled on its own.
+  """
+
+  def __init__(self, include=[], exclude=[]):
+    self._include = self._compile(include)
+    self._exclude = self._compile(exclude)
+    self._hasInclude = len(include) > 0
+    # Kind of declaration => Number filtered out
+    self.filtered = Counter()
+
+  @classmethod
+  def from_opts(cls, opts):
+    """ Construct the matcher from the command line options. The
+    enum `--skip` names are checked by the `EnumVisitor` instead.
+    @return SymbolMatcher or None if there is no selection.
+    @throws ValueError if a pattern is not valid.
+    """
+    include = getattr(opts, "include_symbols", None) or []
+    exclude = getattr(opts, "exclude_symbols", None) or []
+    if len(include) == 0 and len(exclude) == 0:
+      return None
+    return cls(include, exclude)
+
+  @staticmethod
+  def _expand(patterns):
+    for pattern in patterns:
+      if pattern.startswith("@"):
+        with open(pattern[1:], "r") as f:
+          for line in f:
+            line = line.strip()
+            if line != "" and not line.startswith("#"):
+              yield line
+      else:
+        yield pattern
+
+  @classmethod
+  def _compile(cls, patterns):
+    """
+    @return Tuple of (set of exact names, list of the match functions
+      of the compiled patterns)
+    """
+    names = set()
+    regexes = []
+    for pattern in cls._expand(patterns):
+      if pattern.startswith("re:"):
+        expr = pattern[3:]
+        try:
+          regex = re.compile(expr)
+        except re.error as exc:
+          raise ValueError("Invalid Symbol Pattern '{}': {}".format(pattern, exc))
+        # `re:` patterns are searched for in the name and
+        #  globs must match the whole name.
+        regexes.append(regex.search)
+      elif GLOB_CHARS.search(pattern) is not None:
+        regexes.append(re.compile(translate(pattern)).fullmatch)
+      else:
+        names.add(pattern)
+    return (names, regexes)
+
+  @staticmethod
+  def _matches(compiled, name):
+    names, regexes = compiled
+    if name in names:
+      return True
+    return any(match(name) is not None for match in regexes)
+
+  def accepts(self, name, kind):
+    """ Check whether the declaration named `name` should generate output.
+    @param name Name of the function or enum
+    @param kind Name of the declaration kind for the summary - eg "function"
+    """
+    ret = not self._matches(self._exclude, name)
+    if ret and self._hasInclude:
+      ret = self._matches(self._include, name)
+    if not ret:
+      self.filtered[kind] += 1
+    return ret
+
+  def log_summary(self):
+    if len(self.filtered) == 0:
+      return
+    counts = ", ".join("{} {}s".format(v, k) for k, v in sorted(self.filtered.items()))
+    logging.info("Symbol Selection: Skipped {}".format(counts))
@@ -0,0 +1,96 @@
+import os
+import re
+from collections import OrderedDict
+
+SHARD_MODES = ["prefix", "header", "count"]
+
+INVALID_NAME_RE = re.compile(r"[^A-Za-z0-9_\-]+")
+
+
+def prefix_key(name, numParts):
+  """ Symbol prefix of a function name - the first `numParts`
+  underscore separated components, always leaving off the last one:
+    Z3_mk_int => Z3_mk
+    lib_size => lib
+  Names without an underscore are grouped together.
+  """
+  parts = name.split("_")
+  if len(parts) == 1:
+    return "misc"
+  return "_".join(parts[:min(numParts, len(parts) - 1)]) or "misc"
+
+def header_keys(origins):
+  """ Name of each header without the extension. Headers with the
+  same file name in different directories are named by the path
+  components that differ - ie, `a/types.h` and `b/types.h` are
+  `a/types` and `b/types`.
+  @param origins Iterable of header paths
+  @return Dict of header path => name
+  """
+  paths = {}
+  for origin in origins:
+    paths[origin] = os.path.normpath(os.path.abspath(os.path.splitext(origin)[0]))
+  parts = {x: x.split(os.sep) for x in set(paths.values())}
+
+  depth = dict.fromkeys(parts.keys(), 1)
+  while True:
+    names = {k: "/".join(v[-depth[k]:]) for k, v in parts.items()}
+    byName = {}
+    for k, name in names.items():
+      byName.setdefault(name, []).append(k)
+    clashes = [x for x in byName.values() if len(x) > 1]
+    if len(clashes) == 0:
+      return {k: names[v] for k, v in paths.items()}
+    for clash in clashes:
+      for k in clash:
+        depth[k] += 1
+
+def header_key(data, keys):
+  """ Name of the header that declared the function - See `header_keys`.
+  """
+  origin = data.origin
+  if origin is None:
+    return "misc"
+  return keys[origin]
+
+def shard_funcs(funcs, mode, size=500, prefixParts=2):
+  """ Split the captured functions into shards.
+  @param funcs OrderedDict of function name => FunctionData
+  @param mode One of `SHARD_MODES`
+  @param size Number of functions per shard for the `count` mode
+  @param prefixParts Number of name components in the `prefix` mode
+  @return OrderedDict of shard name => OrderedDict of the functions
+    in that shard. Shards are in the order of their first function
+    and the functions keep their order. Shard names are valid in a
+    package name and unique.
+  """
+  if mode not in SHARD_MODES:
+    raise ValueError("Invalid Shard Mode '{}' - Expected one of {}".format(mode, SHARD_MODES))
+  if size < 1:
+    raise ValueError("Invalid Shard Size: {}".format(size))
+
+  if mode == "header":
+    keys = header_keys(set(x.origin for x in funcs.values() if x.origin is not None))
+
+  keyed = OrderedDict()
+  for i, (name, data) in enumerate(funcs.items()):
+    if mode == "prefix":
+      key = prefix_key(name, prefixParts)
+    elif mode == "header":
+      key = header_key(data, keys)
+    else:
+      key = "part-{:03d}".format(i // size)
+    keyed.setdefault(key, OrderedDict())[name] = data
+
+  # Keys that only differ in characters that can't be
+  #  used in a package name get a numeric suffix.
+  ret = OrderedDict()
+  for key, shard in keyed.items():
+    shardName = INVALID_NAME_RE.sub("-", key)
+    uniq = shardName
+    i = 1
+    while uniq in ret:
+      uniq = "{}-{}".format(shardName, i)
+      i += 1
+    ret[uniq] = shard
+  return ret
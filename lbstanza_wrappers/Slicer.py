@@ -0,0 +1,143 @@
+import re
+import logging
+
+from lbstanza_wrappers.TopLevel import split_toplevel
+
+IDENT_RE = re.compile(r"\b[A-Za-z_]\w*\b")
+MARKER_LINE_RE = re.compile(r"^[ \t]*#[^\n]*", re.M)
+STRING_RE = re.compile(r'"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'')
+BRACES_RE = re.compile(r"[{}]")
+# Definition of a struct/union/enum tag - `struct foo {`
+TAG_DEF_RE = re.compile(r"\b(?:struct|union|enum)\s+([A-Za-z_]\w*)\s*\{")
+# Start of an enum body - tagged or anonymous
+ENUM_START_RE = re.compile(r"\benum\b(?:\s+[A-Za-z_]\w*)?\s*\{")
+ENUMERATOR_RE = re.compile(r"\s*([A-Za-z_]\w*)")
+
+C_KEYWORDS = frozenset([
+  "auto", "break", "case", "char", "const", "continue", "default", "do",
+  "double", "else", "enum", "extern", "float", "for", "goto", "if", "inline",
+  "int", "long", "register", "restrict", "return", "short", "signed", "sizeof",
+  "static", "struct", "switch", "typedef", "union", "unsigned", "void",
+  "volatile", "while", "_Bool", "_Complex", "_Alignas", "_Alignof", "_Atomic",
+  "_Noreturn", "_Static_assert", "_Thread_local", "__attribute__",
+  "__extension__", "__inline", "__inline__", "__restrict", "__asm__",
+])
+
+
+def code_text(text):
+  """ Text of a chunk without the line markers and string literals.
+  """
+  return STRING_RE.sub('""', MARKER_LINE_RE.sub("", text))
+
+def strip_braces(text):
+  """ Remove everything inside braces - ie, the members of a struct.
+  """
+  parts = []
+  depth = 0
+  pos = 0
+  for m in BRACES_RE.finditer(text):
+    if m.group() == "{":
+      if depth == 0:
+        parts.append(text[pos:m.start()])
+      depth += 1
+    else:
+      depth -= 1
+      if depth == 0:
+        pos = m.end()
+  if depth == 0:
+    parts.append(text[pos:])
+  return " ".join(parts)
+
+def enumerator_names(code):
+  """ Names of the enumerators in every enum body of the chunk -
+  including anonymous enums and enums nested in a typedef or struct.
+  Enumerators are integer constants that other declarations can use
+  in their values or array dimensions.
+  """
+  ret = set()
+  for m in ENUM_START_RE.finditer(code):
+    depth = 0
+    start = m.end()
+    item = start
+    for i in range(start, len(code)):
+      c = code[i]
+      if c in "([":
+        depth += 1
+      elif c in ")]":
+        depth -= 1
+      elif depth == 0 and c in ",}":
+        name = ENUMERATOR_RE.match(code, item)
+        if name is not None:
+          ret.add(name.group(1))
+        item = i + 1
+        if c == "}":
+          break
+  return ret
+
+def identifiers(text):
+  return set(IDENT_RE.findall(text)) - C_KEYWORDS
+
+def provided_names(code, isTypedef):
+  """ Names that a declaration may introduce that other declarations
+  depend on to parse and resolve types.
+  This is a lexical over-approximation - for a typedef, every identifier
+  outside of braces is considered a possible typedef name.
+  @param code Text of the chunk from `code_text`
+  @return Set of names. Empty if the chunk provides no types
+    or enumerators.
+  """
+  ret = set(TAG_DEF_RE.findall(code)) | enumerator_names(code)
+  if isTypedef:
+    ret |= identifiers(strip_braces(code))
+  return ret
+
+
+def slice_text(text, filename, origin):
+  """ Drop the top-level declarations of the preprocessed text that are
+  not from the selected files - except for the typedefs, struct/union/enum
+  definitions and enumerators that the kept declarations depend on.
+  The dependencies are found lexically by matching the identifiers used
+  in each kept declaration against the names provided by the other
+  declarations, until no new declarations are added.
+  @param text Preprocessed C source
+  @param filename Name of the source file
+  @param origin OriginFilter that selects the files to keep
+  @return Sliced C source. Each declaration is preceded by a line
+    marker so that the AST coordinates are unchanged.
+  """
+  chunks = split_toplevel(text, filename)
+  keep = [origin.accepts_file(x.decl_file) for x in chunks]
+
+  codes = {}
+  def get_code(i):
+    if i not in codes:
+      codes[i] = code_text(chunks[i].text)
+    return codes[i]
+
+  # Name => Indices of the dropped chunks that provide the name
+  providers = {}
+  for i, chunk in enumerate(chunks):
+    if keep[i]:
+      continue
+    isTypedef = chunk.is_typedef
+    if not isTypedef and "{" not in chunk.text:
+      continue
+    for name in provided_names(get_code(i), isTypedef):
+      providers.setdefault(name, []).append(i)
+
+  pending = [i for i, k in enumerate(keep) if k]
+  seen = set()
+  while len(pending) > 0:
+    i = pending.pop()
+    for name in identifiers(get_code(i)):
+      if name in seen:
+        continue
+      seen.add(name)
+      for j in providers.get(name, []):
+        if not keep[j]:
+          keep[j] = True
+          pending.append(j)
+
+  kept = [x for i, x in enumerate(chunks) if keep[i]]
+  logging.debug("Slice: Kept {} of {} declarations".format(len(kept), len(chunks)))
+  return "".join(x.marker() + x.text for x in kept)
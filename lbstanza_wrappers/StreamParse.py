@@ -0,0 +1,39 @@
+from lbstanza_wrappers.ParallelParse import SeededCParser, gc_paused
+from lbstanza_wrappers.TopLevel import split_toplevel
+
+
+def iter_parsed(text, filename, fragmentSize=1 << 16):
+  """ Parse a preprocessed translation unit a few declarations at a time.
+  The text is split at top-level declaration boundaries and runs of
+  about `fragmentSize` characters are parsed in order, carrying the
+  typedef names declared so far from one run to the next. Each run is
+  returned as its own `FileAST` - once the caller drops it, that part of
+  the AST can be freed. Peak memory is then proportional to the
+  largest fragment instead of to the whole AST.
+  @param text Preprocessed C source
+  @param filename Name of the source file
+  @param fragmentSize Approximate number of characters in each fragment
+  @return Iterator of FileAST
+  """
+  parser = SeededCParser()
+  scope = {}
+  run = []
+  runSize = 0
+
+  def parse_run(run):
+    nonlocal scope
+    fragment = run[0].marker() + "".join(x.text for x in run)
+    with gc_paused():
+      node, scope = parser.parse_seeded(fragment, filename, scope)
+    return node
+
+  for chunk in split_toplevel(text, filename):
+    run.append(chunk)
+    runSize += len(chunk.text)
+    if runSize >= fragmentSize:
+      # The generator must not hold a reference to the
+      #  fragment while it is suspended.
+      full, run, runSize = run, [], 0
+      yield parse_run(full)
+  if len(run) > 0:
+    yield parse_run(run)
@@ -0,0 +1,103 @@
+from collections import OrderedDict
+
+from lbstanza_wrappers.CDefIR import CLayout, StructMember
+
+# Layout of C types in the x86-64 System V ABI (LP64)
+POINTER_LAYOUT = CLayout(8, 8, "pointer")
+ENUM_LAYOUT = CLayout(4, 4, "signed")
+
+# Standard type names whose size isn't given by their
+#  specifiers. The pycparser fake headers declare most of
+#  these as `int` so they can't be taken from the typedefs.
+FIXED_LAYOUTS = {
+  "int8_t" : CLayout(1, 1, "signed"),
+  "uint8_t" : CLayout(1, 1, "unsigned"),
+  "int16_t" : CLayout(2, 2, "signed"),
+  "uint16_t" : CLayout(2, 2, "unsigned"),
+  "int32_t" : CLayout(4, 4, "signed"),
+  "uint32_t" : CLayout(4, 4, "unsigned"),
+  "int64_t" : CLayout(8, 8, "signed"),
+  "uint64_t" : CLayout(8, 8, "unsigned"),
+  "intptr_t" : CLayout(8, 8, "signed"),
+  "uintptr_t" : CLayout(8, 8, "unsigned"),
+  "size_t" : CLayout(8, 8, "unsigned"),
+  "ssize_t" : CLayout(8, 8, "signed"),
+  "ptrdiff_t" : CLayout(8, 8, "signed"),
+  "wchar_t" : CLayout(4, 4, "signed"),
+  "bool" : CLayout(1, 1, "unsigned"),
+  "_Bool" : CLayout(1, 1, "unsigned"),
+  "Bool" : CLayout(1, 1, "unsigned"),
+  "uint" : CLayout(4, 4, "unsigned"),
+  "ulong" : CLayout(8, 8, "unsigned"),
+  "ushort" : CLayout(2, 2, "unsigned"),
+}
+
+INT_SPECIFIERS = {"int", "signed", "unsigned"}
+
+# (is float, size) => Stanza primitive with the same representation
+EXACT_PRIMITIVES = {
+  (False, 1) : "byte",
+  (False, 4) : "int",
+  (False, 8) : "long",
+  (True, 4) : "float",
+  (True, 8) : "double",
+}
+
+
+def round_up(value, align):
+  return -(-value // align) * align
+
+def primitive_layout(names):
+  """ Layout of a C arithmetic type from its type specifiers.
+  @param names List of specifiers - ie, `["unsigned", "long", "int"]`
+  @return CLayout
+  @throws ValueError if the specifiers are not an arithmetic type.
+  """
+  if len(names) == 1 and names[0] in FIXED_LAYOUTS:
+    return FIXED_LAYOUTS[names[0]]
+  specs = set(names)
+  kind = "unsigned" if "unsigned" in specs else "signed"
+  if "double" in specs:
+    # `long double` is the 80-bit x87 type padded to 16 bytes
+    size = 16 if "long" in specs else 8
+    return CLayout(size, size, "float")
+  elif "float" in specs:
+    return CLayout(4, 4, "float")
+  elif "char" in specs:
+    # `char` is signed on x86-64
+    return CLayout(1, 1, kind)
+  elif "short" in specs:
+    return CLayout(2, 2, kind)
+  elif "long" in specs:
+    # `long` and `long long` are both 8 bytes
+    return CLayout(8, 8, kind)
+  elif specs <= INT_SPECIFIERS:
+    return CLayout(4, 4, kind)
+  raise ValueError("Unknown Layout for Type '{}'".format(" ".join(names)))
+
+def stanza_primitive(layout):
+  """ The stanza primitive that stores a value of a C arithmetic
+  type as is - with the same size and representation.
+  @param layout CLayout or None
+  @return "byte", "int", "long", "float", "double" or None if there
+    is no such primitive - ie, for `short` or `long double`.
+  """
+  if layout is None or layout.kind not in ["signed", "unsigned", "float"]:
+    return None
+  return EXACT_PRIMITIVES.get((layout.kind == "float", layout.size))
+
+def layout_members(members):
+  """ Compute the offsets of the members of a struct. Each member
+  is placed at the next offset that is a multiple of its alignment.
+  Packed structs and bit fields are not supported.
+  @param members List of Tuples of (name, ArgType, CLayout, dims)
+  @return OrderedDict of name => StructMember
+  """
+  ret = OrderedDict()
+  offset = 0
+  for name, argType, layout, dims in members:
+    offset = round_up(offset, layout.align)
+    member = StructMember(argType, layout, tuple(dims), offset)
+    ret[name] = member
+    offset += member.size
+  return ret
@@ -0,0 +1,115 @@
+import sys
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+# Phases of the generator in the order they are reported.
+PHASES = ["preprocess", "slice", "parse", "load", "visit", "render", "write"]
+
+
+class PhaseTimer(object):
+  """ Accumulate the wall time, CPU time and (optionally) the peak
+  memory allocated in each phase of the generator.
+  Each phase is timed separately - the enum and function packages
+  are rendered and written after the visit, by `export`.
+  Phases can be nested - time spent in an inner phase is not counted
+  in the outer phase.
+  The benchmark suite uses this timer for its phases too.
+  """
+
+  def __init__(self, traceMemory=False):
+    """
+    @param traceMemory If True, `tracemalloc` is used to measure the
+      peak memory allocated in each phase. This slows everything down.
+    """
+    self.traceMemory = traceMemory
+    self._stack = []
+    self._mark = None
+    self.results = {}
+
+  def _entry(self, name):
+    return self.results.setdefault(name, {"wall": 0.0, "cpu": 0.0, "calls": 0})
+
+  def _charge(self, name, now):
+    wall, cpu = now
+    entry = self._entry(name)
+    entry["wall"] += wall - self._mark[0]
+    entry["cpu"] += cpu - self._mark[1]
+
+  def _update_peak(self, name, start):
+    _, peak = tracemalloc.get_traced_memory()
+    entry = self._entry(name)
+    entry["peak_bytes"] = max(entry.get("peak_bytes", 0), peak - start)
+
+  @contextmanager
+  def phase(self, name):
+    now = (time.perf_counter(), time.process_time())
+    if len(self._stack) > 0:
+      self._charge(self._stack[-1][0], now)
+      if self.traceMemory:
+        self._update_peak(*self._stack[-1])
+
+    start = 0
+    if self.traceMemory:
+      if not tracemalloc.is_tracing():
+        tracemalloc.start()
+      start, _ = tracemalloc.get_traced_memory()
+      tracemalloc.reset_peak()
+
+    self._stack.append((name, start))
+    self._mark = now
+    try:
+      yield
+    finally:
+      now = (time.perf_counter(), time.process_time())
+      self._charge(name, now)
+      self._entry(name)["calls"] += 1
+      if self.traceMemory:
+        self._update_peak(name, start)
+        tracemalloc.reset_peak()
+      self._stack.pop()
+      self._mark = now
+
+  def merge(self, results):
+    """ Add the results of another timer - ie, from a batch worker.
+    """
+    for name, m in results.items():
+      entry = self._entry(name)
+      for k, v in m.items():
+        if k == "peak_bytes":
+          entry[k] = max(entry.get(k, 0), v)
+        else:
+          entry[k] = entry.get(k, 0) + v
+
+  def report(self, fout=sys.stderr):
+    names = [x for x in PHASES if x in self.results]
+    names += [x for x in self.results.keys() if x not in PHASES]
+    print("Phase         Wall (s)    CPU (s)   Calls   Peak (MB)", file=fout)
+    for name in names:
+      m = self.results[name]
+      peak = "{:11.2f}".format(m["peak_bytes"] / (1024 * 1024)) if "peak_bytes" in m else ""
+      line = "{:12} {:9.4f} {:10.4f} {:7d} {}".format(name, m["wall"], m["cpu"], m["calls"], peak)
+      print(line.rstrip(), file=fout)
+
+  def dump_json(self, fpath):
+    with open(fpath, "w") as f:
+      json.dump(self.results, f, indent=2)
+
+
+class NullTimer(object):
+  """ Timer used when timing is disabled - each phase is a no-op.
+  """
+  _NULL = nullcontext()
+
+  def phase(self, name):
+    return self._NULL
+
+NULL_TIMER = NullTimer()
+
+def get_timer(opts):
+  """ Retrieve the timer for this run from the options.
+  @return PhaseTimer or a NullTimer if timing is disabled.
+  """
+  return getattr(opts, "timer", None) or NULL_TIMER
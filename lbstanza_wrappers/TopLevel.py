@@ -0,0 +1,138 @@
+import re
+from dataclasses import dataclass
+
+# Tokens that matter for finding top-level declaration boundaries in
+#  preprocessed C. Everything else is skipped over.
+TOKEN_RE = re.compile(r"""
+   (?P<marker>^[ \t]*\#[^\n]*)
+  |(?P<str>"(?:[^"\\\n]|\\.)*")
+  |(?P<chr>'(?:[^'\\\n]|\\.)*')
+  |(?P<punct>[{}()\[\];])
+""", re.M | re.X)
+
+# Line markers emitted by cpp: `# 12 "some/file.h" 1 3`
+LINE_MARKER_RE = re.compile(r'[ \t]*\#[ \t]*(?:line[ \t]+)?(\d+)[ \t]+"((?:[^"\\]|\\.)*)"')
+
+TYPEDEF_RE = re.compile(r"\btypedef\b")
+
+# Blank lines, line markers and pragmas before the declaration
+LEADING_RE = re.compile(r"(?:[ \t]*(?:\#[^\n]*)?\n)*")
+
+OPENERS = {"{" : "}", "(" : ")", "[" : "]"}
+
+
+@dataclass
+class Chunk:
+  """ A top-level external declaration (or function definition)
+  from a preprocessed C file.
+  """
+  # Source text of this declaration, including any line
+  #  markers or pragmas preceding it.
+  text:str
+  # File and line where the text starts - as reported by
+  #  the cpp line markers.
+  file:str
+  line:int
+  # Column offset of the first character in the text
+  column:int
+
+  @property
+  def is_typedef(self):
+    return TYPEDEF_RE.search(self.text) is not None
+
+  @property
+  def decl_file(self):
+    """ File of the declaration itself - the text may start
+    in a different file than the declaration when a line marker
+    precedes the declaration.
+    """
+    ret = self.file
+    leading = LEADING_RE.match(self.text).group()
+    for line in leading.splitlines():
+      m = LINE_MARKER_RE.match(line)
+      if m is not None:
+        ret = m.group(2)
+    return ret
+
+  def marker(self):
+    """ Line marker and padding that places the start of this chunk at its
+    original location when parsed on its own.
+    """
+    return '# {} "{}"\n{}'.format(self.line, self.file, " " * self.column)
+
+
+def split_toplevel(text, filename=""):
+  """ Split preprocessed C text at the boundaries of top-level
+  declarations. A boundary is a `;` outside of any braces/parens/brackets or
+  the closing `}` of a function body.
+  @param text Preprocessed C Source
+  @param filename Name reported for text before the first line marker.
+  @return List of Chunk objects. Concatenating their text
+    reproduces the input.
+  """
+  chunks = []
+  stack = []
+  # Set when the `{` of a function body is opened at depth 0
+  inBody = False
+  lastPunct = None
+  lastPunctEnd = 0
+
+  markerFile = filename
+  # Line number at position `linePos` - positions only move
+  #  forward so the newlines are counted incrementally.
+  line = 1
+  linePos = 0
+
+  def location(pos):
+    nonlocal line, linePos
+    line += text.count("\n", linePos, pos)
+    linePos = pos
+    column = pos - (text.rfind("\n", 0, pos) + 1)
+    return (markerFile, line, column)
+
+  # Start and location of the current chunk
+  start = 0
+  startLoc = location(0)
+
+  for m in TOKEN_RE.finditer(text):
+    kind = m.lastgroup
+    if kind == "marker":
+      mm = LINE_MARKER_RE.match(m.group())
+      if mm is not None:
+        markerFile = mm.group(2)
+        line = int(mm.group(1))
+        linePos = m.end() + 1
+      continue
+    elif kind != "punct":
+      continue
+
+    c = m.group()
+    end = None
+    if c in OPENERS:
+      if c == "{" and len(stack) == 0:
+        prefix = text[lastPunctEnd:m.start()]
+        inBody = lastPunct == ")" and prefix.strip() == ""
+      stack.append(OPENERS[c])
+    elif c in ")]}":
+      if len(stack) == 0 or stack.pop() != c:
+        raise ValueError("{}:{}: Unbalanced '{}' in preprocessed text".format(markerFile, location(m.start())[1], c))
+      if c == "}" and len(stack) == 0 and inBody:
+        inBody = False
+        end = m.end()
+    elif c == ";" and len(stack) == 0:
+      end = m.end()
+
+    lastPunct = c
+    lastPunctEnd = m.end()
+
+    if end is not None:
+      chunks.append(Chunk(text[start:end], *startLoc))
+      start = end
+      startLoc = location(start)
+
+  if text[start:].strip() != "" or len(chunks) == 0:
+    chunks.append(Chunk(text[start:], *startLoc))
+  else:
+    # Trailing whitespace and markers
+    chunks[-1].text += text[start:]
+  return chunks
@@ -0,0 +1,195 @@
+import os
+import re
+import time
+import hashlib
+import logging
+import traceback
+from pycparser import c_parser
+
+from lbstanza_wrappers.Batch import entry_opts, check_outputs
+from lbstanza_wrappers.Pipeline import preprocess_header, parse_text, visit_node, export_visitor, VISITORS
+from lbstanza_wrappers.Timings import PhaseTimer
+
+# Line markers emitted by the preprocessor - `# 12 "foo.h" 1`
+LINE_MARKER_RE = re.compile(r'^[ \t]*#[ \t]*(?:line[ \t]+)?\d+[ \t]+"([^"]+)"', re.M)
+
+
+def scan_deps(text):
+  """ Find the files that contributed to a preprocessed header.
+  @param text Preprocessed C source
+  @return Set of normalized file paths - the input header and
+    every header it includes, directly or not.
+  """
+  ret = set()
+  for fname in set(LINE_MARKER_RE.findall(text)):
+    # Pseudo-files like `<built-in>` and `<command-line>`
+    if fname.startswith("<"):
+      continue
+    ret.add(os.path.normpath(fname))
+  return ret
+
+def file_stamp(fpath):
+  """ Modification stamp of a file.
+  @return Tuple of (mtime_ns, size) or None if the file doesn't exist.
+  """
+  try:
+    st = os.stat(fpath)
+  except OSError:
+    return None
+  return (st.st_mtime_ns, st.st_size)
+
+
+class WatchedHeader(object):
+  """ State kept between regenerations of one header.
+  """
+
+  def __init__(self, entry):
+    """
+    @param entry Dict from the manifest or a header path from the
+      command line - See `load_manifest`.
+    """
+    self.entry = entry
+    self.input = entry["input"]
+    # Path => stamp of every file the header depends on
+    self.deps = {os.path.normpath(self.input): None}
+    # Hash of the preprocessed text of the last successful run
+    self.digest = None
+
+
+class Watcher(object):
+  """ Keep the generator resident and regenerate the output of
+  a header whenever the header, or any file it includes, changes.
+  The dependencies of each header are found from the line markers
+  in its preprocessed text and their stamps are polled. A change
+  triggers a regeneration once the files have stopped changing for
+  the debounce period - an editor saving many files at once causes
+  a single regeneration.
+
+  Between regenerations, the watcher keeps:
+    - The parser - the parse tables are only built once.
+    - A hash of the preprocessed text of each header. A header whose
+       preprocessed text didn't change (ie, only comments were edited)
+       is not parsed or written again.
+  """
+
+  def __init__(self, opts, entries):
+    """
+    @param opts Watch command line options
+    @param entries List of dicts (see `load_manifest`)
+    @throws ValueError if two headers write the same output.
+    """
+    self._opts = opts
+    check_outputs([entry_opts(opts, x) for x in entries])
+    self._headers = [WatchedHeader(x) for x in entries]
+    self._parser = c_parser.CParser()
+
+  @property
+  def headers(self):
+    return self._headers
+
+  def build(self, header):
+    """ Regenerate the output of a header and update its dependencies.
+    Errors are logged and the previous output is kept.
+    @return True if the output was regenerated.
+    """
+    opts = entry_opts(self._opts, header.entry)
+    timer = getattr(self._opts, "timer", None)
+    if timer is not None:
+      opts.timer = PhaseTimer(timer.traceMemory)
+
+    # Stamp before the preprocessor reads the files so that a change
+    #  made while the header is processed triggers another run.
+    deps = {k: file_stamp(k) for k in header.deps}
+    try:
+      text, cppArgs = preprocess_header(opts)
+      found = scan_deps(text)
+      found.add(os.path.normpath(header.input))
+      for k in found - deps.keys():
+        deps[k] = file_stamp(k)
+      header.deps = {k: deps[k] for k in found}
+
+      digest = hashlib.sha256((cppArgs + "\0" + text).encode("utf-8")).hexdigest()
+      if digest == header.digest:
+        logging.info("{}: Preprocessed Header Unchanged - Skipping".format(header.input))
+        return False
+
+      v = VISITORS[opts.extract](opts)
+      visit_node(opts, v, parse_text(opts, text, cppArgs, self._parser))
+      if not opts.dry_run and opts.extract != "enums":
+        os.makedirs(os.path.dirname(opts.output) or ".", exist_ok=True)
+      export_visitor(opts, v)
+      header.digest = digest
+    except Exception as exc:
+      header.deps = deps
+      logging.error("{}: Extraction Failed - {}: {}".format(header.input, type(exc).__name__, exc))
+      logging.debug(traceback.format_exc())
+      return False
+
+    if timer is not None:
+      opts.timer.report()
+    logging.info("{}: Regenerated ({} dependencies)".format(header.input, len(header.deps)))
+    return True
+
+  def changed(self):
+    """ Poll the dependencies of every header.
+    @return Set of the paths whose stamp changed.
+    """
+    ret = set()
+    for header in self._headers:
+      for fpath, stamp in header.deps.items():
+        if fpath not in ret and file_stamp(fpath) != stamp:
+          ret.add(fpath)
+    return ret
+
+  def affected(self, paths):
+    """
+    @return List of the headers that depend on any of the paths.
+    """
+    return [x for x in self._headers if not paths.isdisjoint(x.deps.keys())]
+
+  def check(self):
+    """ Regenerate the headers whose dependencies changed since
+    the last check - without waiting for the debounce period.
+    @return List of the headers that were regenerated.
+    """
+    paths = self.changed()
+    if len(paths) == 0:
+      return []
+    for fpath in sorted(paths):
+      logging.info("Changed: {}".format(fpath))
+    return [x for x in self.affected(paths) if self.build(x)]
+
+  def wait_quiet(self, paths):
+    """ Wait until no more files change for the debounce period.
+    @param paths Set of changed paths - updated with any further changes.
+    """
+    quiet = 0.0
+    last = {x: file_stamp(x) for x in paths}
+    while quiet < self._opts.debounce:
+      time.sleep(self._opts.interval)
+      quiet += self._opts.interval
+      more = self.changed()
+      current = {x: file_stamp(x) for x in paths | more}
+      if current != last:
+        paths |= more
+        last = current
+        quiet = 0.0
+
+  def run(self):
+    """ Generate every header and then regenerate them as their
+    dependencies change. Runs until interrupted.
+    """
+    for header in self._headers:
+      self.build(header)
+    logging.info("Watching {} headers for changes".format(len(self._headers)))
+
+    while True:
+      time.sleep(self._opts.interval)
+      paths = self.changed()
+      if len(paths) == 0:
+        continue
+      self.wait_quiet(paths)
+      for fpath in sorted(paths):
+        logging.info("Changed: {}".format(fpath))
+      for header in self.affected(paths):
+        self.build(header)
@@ -20,7 +20,8 @@ setup(
 	url="https://github.com/callendorph/lbstanza-wrappers",
 	packages=["lbstanza_wrappers"],
 	install_requires=[
-		"pycparser>=2.0",
+		# ParallelParse uses the private parser state of these versions
+		"pycparser>=2.21,<3.0",
 		"pycparser-fake-libc>=2.0",
 	],
 	scripts=[
@@ -1,4 +1,24 @@
 
 int basic_some_func(int a, const char *b) {
   return 42 * a;
-}
\ No newline at end of file
+}
+int basic_length(const char *s, int extra) {
+  int n = 0;
+  while (s[n] != 0) n++;
+  return n + extra;
+}
+
+const char * basic_greeting(int which) {
+  return which == 0 ? "hello" : (const char *)0;
+}
+
+int basic_divmod(int a, int b, int *out_q, int *out_r) {
+  if (b == 0) return -1;
+  *out_q = a / b;
+  *out_r = a % b;
+  return 0;
+}
+
+void basic_scale(double v, double *out) {
+  *out = 2.5 * v;
+}
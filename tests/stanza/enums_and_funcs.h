@@ -0,0 +1,30 @@
+#ifndef __ENUMS_AND_FUNCS_H__
+#define __ENUMS_AND_FUNCS_H__
+
+typedef enum {
+  ShapeCircle,
+  ShapeSquare,
+  ShapeTriangle
+} Shape;
+
+typedef enum {
+  LevelLow = 10,
+  LevelHigh = 20
+} Level;
+
+typedef struct Box {
+  long w;
+  long h;
+} Box;
+
+extern int shape_sides(Shape s);
+extern Level box_level(Box *b, int scale);
+extern void box_reset(Box *b);
+
+static inline int box_area(Box *b) {
+  enum { AreaScale = 1 } scale = AreaScale;
+  long area = b->w * b->h;
+  return (int)(area * scale);
+}
+
+#endif
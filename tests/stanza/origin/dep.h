@@ -0,0 +1,14 @@
+#ifndef __ORIGIN_DEP_H__
+#define __ORIGIN_DEP_H__
+
+typedef long dep_size_t;
+
+typedef enum {
+  DepOk,
+  DepFailed
+} DepStatus;
+
+extern DepStatus dep_init(void);
+extern void dep_free(void *p);
+
+#endif
@@ -0,0 +1,14 @@
+#ifndef __ORIGIN_LIB_H__
+#define __ORIGIN_LIB_H__
+
+#include "dep.h"
+
+typedef enum {
+  LibRed,
+  LibGreen
+} LibColor;
+
+extern dep_size_t lib_size(LibColor c);
+extern DepStatus lib_status(void);
+
+#endif
@@ -192,6 +192,16 @@ int test2_compare(test2 *obj1, test2 *obj2) {
   }
 }
 
+static ext_point ext_point_value = {'a', 1.5, {10, 20, 30}, -2, {42, 65535}};
+
+ext_point *ext_point_get(void) {
+  return &ext_point_value;
+}
+
+int ext_point_sum(ext_point *p) {
+  return p->vals[0] + p->vals[1] + p->vals[2] + p->s;
+}
+
 
 
 /* Function Pointer - Basics*/
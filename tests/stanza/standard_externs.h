@@ -70,6 +70,26 @@ extern test2 *test2_copy(test2 *obj);
 extern int test2_compare(test2 *obj1, test2 *obj2);
 
 
+/* Struct Accessors
+*/
+
+struct ext_inner {
+  long id;
+  unsigned short flags;
+};
+
+typedef struct {
+  char tag;
+  double x;
+  int vals[3];
+  short s;
+  struct ext_inner inner;
+} ext_point;
+
+extern ext_point *ext_point_get(void);
+extern int ext_point_sum(ext_point *p);
+
+
 /* Function Pointer Tests
 */
 
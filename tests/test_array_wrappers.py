@@ -0,0 +1,159 @@
+import unittest
+import io
+import os
+import json
+import tempfile
+from argparse import Namespace
+
+from pycparser import c_parser
+
+from lbstanza_wrappers.FuncDeclVisitor import FuncDeclVisitor
+from lbstanza_wrappers.ArrayPairs import ArrayPairs
+
+HEADER = """
+typedef unsigned long size_t;
+typedef unsigned char uchar;
+typedef struct ctx_s ctx_t;
+
+int buf_send(int fd, const char *buf, size_t n);
+void ints_fill(int *out, int count);
+double doubles_sum(const double *vals, long nvals, const float *weights, int weights_len);
+long bytes_hash(const uchar *data, int len, const char *salt);
+int no_len(const int *vals, int flags);
+int two_ptrs(const int **rows, int n);
+int ctx_write(ctx_t *ctx, const char *buf, int size);
+int raw_send(const void *data, int bytes);
+typedef int uint16_t;
+int sum16(const uint16_t *data, int n);
+int sum_s(const short *vals, int count);
+int short_len(const int *vals, short n);
+"""
+
+def render(arrayWrappers, annotations=None, pattern=None):
+  out = io.StringIO()
+  opts = Namespace(
+    output = out,
+    dump_types = False,
+    dry_run = False,
+    pkg_prefix = "wrapper/arrays",
+    pkg_name = "arrays",
+    string_wrappers = False,
+    array_wrappers = arrayWrappers,
+    array_len_pattern = pattern,
+    array_annotations = annotations,
+  )
+  v = FuncDeclVisitor(opts)
+  v.visit(c_parser.CParser().parse(HEADER, "arrays.h"))
+  v.export()
+  return v, out.getvalue()
+
+def body(lines, decl, n):
+  start = lines.index(decl)
+  return lines[start + 1:start + 1 + n]
+
+
+class ArrayPairTests(unittest.TestCase):
+  def setUp(self):
+    self.v, _ = render(False)
+    self.pairs = ArrayPairs()
+
+  def find(self, name):
+    return dict(self.pairs.find(name, self.v._funcs[name]))
+
+  def test_heuristic(self):
+    self.assertEqual(self.find("buf_send"), {"buf": ("n", "ByteArray")})
+    self.assertEqual(self.find("ints_fill"), {"out": ("count", "IntArray")})
+    self.assertEqual(self.find("doubles_sum"), {
+      "vals": ("nvals", "DoubleArray"),
+      "weights": ("weights_len", "FloatArray"),
+    })
+    self.assertEqual(self.find("bytes_hash"), {"data": ("len", "ByteArray")})
+    # Length name doesn't match, pointer to pointer, and void pointer
+    self.assertEqual(self.find("no_len"), {})
+    self.assertEqual(self.find("two_ptrs"), {})
+    self.assertEqual(self.find("raw_send"), {})
+
+  def test_sizes(self):
+    # The C element and length types must have the size of the
+    #  stanza types - `uint16_t` is an `int` in the fake libc headers.
+    self.assertEqual(self.v._funcs["sum16"].args["data"].to_stanza(), "ptr<int>")
+    for name in ["sum16", "sum_s", "short_len"]:
+      self.assertEqual(self.find(name), {})
+    self.pairs = ArrayPairs(annotations={"sum_s": [("vals", "count")]})
+    with self.assertRaises(ValueError):
+      self.find("sum_s")
+
+  def test_pattern(self):
+    self.pairs = ArrayPairs(r"^flags$")
+    self.assertEqual(self.find("no_len"), {"vals": ("flags", "IntArray")})
+    self.assertEqual(self.find("buf_send"), {})
+    with self.assertRaises(ValueError):
+      ArrayPairs("(")
+
+  def test_annotations(self):
+    self.pairs = ArrayPairs(annotations={"raw_send": [("data", "bytes")], "buf_send": []})
+    self.assertEqual(self.find("raw_send"), {"data": ("bytes", "ByteArray")})
+    # Annotated functions only use the listed pairs
+    self.assertEqual(self.find("buf_send"), {})
+    self.assertEqual(self.find("ints_fill"), {"out": ("count", "IntArray")})
+
+    self.pairs = ArrayPairs(annotations={"no_len": [("vals", "missing")]})
+    with self.assertRaises(ValueError):
+      self.find("no_len")
+    self.pairs = ArrayPairs(annotations={"no_len": [("flags", "vals")]})
+    with self.assertRaises(ValueError):
+      self.find("no_len")
+
+  def test_from_opts(self):
+    self.assertIsNone(ArrayPairs.from_opts(Namespace()))
+    self.assertIsNotNone(ArrayPairs.from_opts(Namespace(array_wrappers=True)))
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+      fpath = os.path.join(tmpDir, "arrays.json")
+      with open(fpath, "w") as f:
+        json.dump({"raw_send": [["data", "bytes"]]}, f)
+      # The annotation file enables the wrappers
+      pairs = ArrayPairs.from_opts(Namespace(array_annotations=fpath))
+      self.assertEqual(dict(pairs.find("raw_send", self.v._funcs["raw_send"])), {"data": ("bytes", "ByteArray")})
+
+      with open(fpath, "w") as f:
+        json.dump({"raw_send": ["data", "bytes"]}, f)
+      with self.assertRaises(ValueError):
+        ArrayPairs.from_opts(Namespace(array_annotations=fpath))
+
+
+class ArrayWrapperTests(unittest.TestCase):
+  def test_wrappers(self):
+    _, out = render(True)
+    lines = out.splitlines()
+
+    self.assertEqual(body(lines, "public lostanza defn w_buf_send_arr (fd:ref<Int>, buf:ref<ByteArray>) -> ref<Int> :", 2), [
+      "  val ret = w_buf_send(fd.value, addr!(buf.data), buf.length)",
+      "  return new Int{ret}",
+    ])
+    self.assertEqual(body(lines, "public lostanza defn w_ints_fill_arr (out:ref<IntArray>) -> ref<False> :", 2), [
+      "  w_ints_fill(addr!(out.data), out.length as int)",
+      "  return false",
+    ])
+    # `long` lengths are passed as is
+    self.assertEqual(body(lines, "public lostanza defn w_doubles_sum_arr (vals:ref<DoubleArray>, weights:ref<FloatArray>) -> ref<Double> :", 2), [
+      "  val ret = w_doubles_sum(addr!(vals.data), vals.length, addr!(weights.data), weights.length as int)",
+      "  return new Double{ret}",
+    ])
+    # Const strings are passed as Strings
+    self.assertEqual(body(lines, "public lostanza defn w_bytes_hash_arr (data:ref<ByteArray>, salt:ref<String>) -> ref<Long> :", 2), [
+      "  val ret = w_bytes_hash(addr!(data.data), data.length as int, addr!(salt.chars))",
+      "  return new Long{ret}",
+    ])
+
+    # No pairs or an argument that can't be passed from HiStanza
+    for name in ["no_len", "two_ptrs", "ctx_write", "raw_send", "sum16", "sum_s", "short_len"]:
+      self.assertNotIn("w_{}_arr".format(name), out)
+
+  def test_opt_in(self):
+    _, exp = render(False)
+    self.assertNotIn("_arr (", exp)
+    _, obs = render(True)
+    # The regular declarations and wrappers are unchanged
+    self.assertEqual([x for x in obs.splitlines() if "_arr (" not in x and not x.startswith("  ")],
+                     [x for x in exp.splitlines() if not x.startswith("  ")])
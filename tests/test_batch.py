@@ -0,0 +1,137 @@
+import unittest
+import os
+import os.path
+import tempfile
+
+from lbstanza_wrappers.Batch import run_batch, load_manifest, entry_opts
+
+from .utils import make_opts
+
+
+def batch_opts(**kwargs):
+  """ Options of the `batch` sub-command - See `make_opts`
+  """
+  opts = make_opts(
+    include = [],
+    extract = "func-decl",
+    jobs = 2,
+    pkg_prefix = "wrapper/batch",
+    out_dir = "tests/uut/batch",
+    func_form = "both",
+    dry_run = False,
+    cache_dir = None,
+    cache_max_size = 512,
+    parse_jobs = 1,
+    fast_visit = False,
+    stream = False,
+    only_from = [],
+    slice = False,
+    render_jobs = 1,
+    write_jobs = 2,
+  )
+  for k, v in kwargs.items():
+    setattr(opts, k, v)
+  return opts
+
+
+class BatchTests(unittest.TestCase):
+  def test_per_header_output(self):
+    """ Each header in the batch gets its own package and a
+    failure in one header doesn't stop the others.
+    """
+    with tempfile.TemporaryDirectory() as tmpDir:
+      bad = os.path.join(tmpDir, "broken.h")
+      with open(bad, "w") as f:
+        f.write("int broken(;\n")
+
+      opts = batch_opts(out_dir = tmpDir)
+      entries = [
+        {"input": "tests/stanza/standard_externs.h"},
+        {"input": bad},
+      ]
+      results = run_batch(opts, entries)
+
+      self.assertEqual([x.input for x in results], [e["input"] for e in entries])
+      self.assertTrue(results[0].ok)
+      self.assertFalse(results[1].ok)
+      self.assertIn("ParseError", results[1].error)
+
+      with open(os.path.join(tmpDir, "standard_externs.stanza")) as f:
+        content = f.read()
+      self.assertIn("defpackage wrapper/batch/standard_externs :", content)
+      self.assertIn("extern func_no_args : (() -> int)", content)
+
+  def test_output_collision(self):
+    """ Headers with the same file name write the same package
+    unless the manifest gives them different names.
+    """
+    with tempfile.TemporaryDirectory() as tmpDir:
+      entries = []
+      for sub in ["a", "b"]:
+        os.makedirs(os.path.join(tmpDir, sub))
+        fpath = os.path.join(tmpDir, sub, "foo.h")
+        with open(fpath, "w") as f:
+          f.write("int foo_{}(int x);\n".format(sub))
+        entries.append({"input": fpath})
+
+      for extract in ["func-decl", "enums", "all"]:
+        opts = batch_opts(out_dir = tmpDir, extract = extract)
+        with self.assertRaisesRegex(ValueError, "both write"):
+          run_batch(opts, entries)
+      self.assertFalse(os.path.exists(os.path.join(tmpDir, "foo.stanza")))
+
+      entries[1]["pkg_name"] = "foo_b"
+      results = run_batch(batch_opts(out_dir = tmpDir), entries)
+      self.assertTrue(all(x.ok for x in results))
+
+  def test_no_pkg_prefix(self):
+    entry = {"input": "include/foo.h"}
+    opts = entry_opts(batch_opts(pkg_prefix = None, extract = "enums"), entry)
+    self.assertEqual(opts.pkg_prefix, "foo")
+    opts = entry_opts(batch_opts(pkg_prefix = None, extract = "all"), entry)
+    self.assertEqual(opts.enum_pkg_prefix, "foo")
+
+  def test_entry_out_dir(self):
+    """ The manifest entry's `out-dir` is used for the wrapper package.
+    """
+    entry = {"input": "a/foo.h", "out_dir": "custom"}
+    opts = entry_opts(batch_opts(out_dir = "top"), entry)
+    self.assertEqual(opts.output, os.path.join("custom", "foo.stanza"))
+    opts = entry_opts(batch_opts(out_dir = "top"), {"input": "a/foo.h"})
+    self.assertEqual(opts.output, os.path.join("top", "foo.stanza"))
+
+    opts = entry_opts(batch_opts(out_dir = "top", extract = "all"), entry)
+    self.assertEqual(opts.output, os.path.join("custom", "foo.stanza"))
+    self.assertEqual(opts.out_dir, "custom")
+    opts = entry_opts(batch_opts(out_dir = "top", extract = "all"), {"input": "a/foo.h"})
+    self.assertEqual(opts.output, os.path.join("top", "foo.stanza"))
+    self.assertEqual(opts.out_dir, os.path.join("top", "foo"))
+
+  def test_deterministic_order(self):
+    """ Dry run output is the same no matter how many workers are used.
+    """
+    entries = [
+      {"input": "tests/stanza/standard_externs.h", "pkg_name": "A"},
+      {"input": "tests/stanza/standard_externs.h", "pkg_name": "B"},
+      {"input": "tests/stanza/standard_externs.h", "pkg_name": "C"},
+    ]
+    obs = []
+    for jobs in [1, 3]:
+      results = run_batch(batch_opts(jobs = jobs, dry_run = True), entries)
+      obs.append("".join(x.stdout for x in results))
+
+    self.assertEqual(obs[0], obs[1])
+    self.assertLess(obs[0].index("/A :"), obs[0].index("/B :"))
+    self.assertLess(obs[0].index("/B :"), obs[0].index("/C :"))
+
+  def test_manifest(self):
+    with tempfile.TemporaryDirectory() as tmpDir:
+      fpath = os.path.join(tmpDir, "manifest.json")
+      with open(fpath, "w") as f:
+        f.write('["a.h", {"input": "inc/b.h", "pkg-name": "Bee", "include": ["inc"]}]')
+
+      entries = load_manifest(fpath)
+      self.assertEqual(entries[0]["input"], os.path.join(tmpDir, "a.h"))
+      self.assertEqual(entries[1]["input"], os.path.join(tmpDir, "inc/b.h"))
+      self.assertEqual(entries[1]["pkg_name"], "Bee")
+      self.assertEqual(entries[1]["include"], [os.path.join(tmpDir, "inc")])
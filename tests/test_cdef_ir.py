@@ -0,0 +1,78 @@
+import unittest
+import pickle
+from collections import OrderedDict
+
+from lbstanza_wrappers.CDefIR import *
+
+
+class CDefIRTests(unittest.TestCase):
+  def test_interned(self):
+    a = ArgType(Identifier("int"), 1)
+    self.assertIs(a, ArgType(Identifier("int"), 1))
+    self.assertIs(a, ArgType(lbType=Identifier("int"), numPtrs=1))
+    self.assertIsNot(a, ArgType(Identifier("int"), 2))
+    self.assertIs(ReturnType(a, False), ReturnType(a, False))
+    self.assertEqual(len({a, ArgType(Identifier("int"), 1)}), 1)
+
+  def test_identity_types_not_merged(self):
+    # Enums are filled in after construction so two
+    #  enums with no values yet are different types.
+    e1 = EnumArg([])
+    e2 = EnumArg([])
+    self.assertIsNot(ArgType(e1, 0), ArgType(e2, 0))
+    self.assertIs(ArgType(e1, 0), ArgType(e1, 0))
+
+  def test_immutable(self):
+    a = ArgType(Identifier("byte"), 1)
+    with self.assertRaises(AttributeError):
+      a.numPtrs = 2
+    self.assertFalse(hasattr(a, "__dict__"))
+
+  def test_to_stanza(self):
+    self.assertEqual(ArgType(Identifier("char"), 2).to_stanza(), "ptr<ptr<byte>>")
+    self.assertEqual(ArgType(StructArg(OrderedDict(), None, None), 1).to_stanza(), "ptr<?>")
+    self.assertEqual(ArgType(ArgType(Identifier("int"), 1), 1).to_stanza(), "ptr<ptr<int>>")
+    a = ArgType(Identifier("double"), 0)
+    self.assertIs(a.to_stanza(), a.to_stanza())
+
+    func = FunctionData(
+      OrderedDict({"a": ArgType(Identifier("int"), 0), "b": ArgType(Identifier("char"), 1)}),
+      ReturnType(ArgType(Identifier("int"), 0), False),
+      None,
+      {}
+    )
+    self.assertEqual(func.to_stanza(), "((int,ptr<byte>) -> int)")
+
+  def test_pickle(self):
+    a = ArgType(Identifier("long"), 3)
+    self.assertIs(pickle.loads(pickle.dumps(a)), a)
+    r = pickle.loads(pickle.dumps(ReturnType(a, True)))
+    self.assertIs(r, ReturnType(a, True))
+
+  def test_repr(self):
+    self.assertEqual(repr(ArgType(Identifier("int"), 0)), "ArgType(lbType=Identifier(name='int'), numPtrs=0, isConst=False)")
+
+  def test_defaults(self):
+    t = ArgType(Identifier("int"), 1)
+    self.assertIs(t, ArgType(Identifier("int"), 1, False))
+    self.assertIs(t, ArgType(Identifier("int"), numPtrs=1))
+    self.assertIsNot(t, ArgType(Identifier("int"), 1, True))
+
+  def test_const_string(self):
+    char = CharIdentifier("byte")
+    self.assertIsNot(char, Identifier("byte"))
+    self.assertEqual(char.to_stanza(), "byte")
+    self.assertTrue(ArgType(char, 1, True).is_const_string())
+    self.assertFalse(ArgType(char, 1).is_const_string())
+    self.assertFalse(ArgType(char, 2, True).is_const_string())
+    self.assertFalse(ArgType(Identifier("byte"), 1, True).is_const_string())
+    # Through a typedef - `typedef const char * cstr;`
+    cstr = ArgType(ArgType(char, 0, True), 1)
+    self.assertTrue(cstr.is_const_string())
+    self.assertEqual(cstr.to_stanza(), "ptr<byte>")
+
+  def test_bad_args(self):
+    with self.assertRaises(TypeError):
+      ArgType(Identifier("int"))
+    with self.assertRaises(TypeError):
+      ArgType(Identifier("int"), numPtrs=0, other=1)
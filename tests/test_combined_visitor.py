@@ -0,0 +1,39 @@
+import unittest
+import os
+import os.path
+
+from pycparser import parse_file
+
+from lbstanza_wrappers.EnumVisitor import EnumVisitor
+from lbstanza_wrappers.FuncDeclVisitor import FuncDeclVisitor
+from lbstanza_wrappers.CombinedVisitor import CombinedVisitor
+from lbstanza_wrappers.CDefIR import EnumArg
+
+from .utils import make_opts, run_visitor
+
+
+def combined_opts():
+  return make_opts(pkg_prefix = "wrapper/combined", pkg_name = "enums-and-funcs")
+
+
+class CombinedVisitorTests(unittest.TestCase):
+  def test_matches_separate_visitors(self):
+    """ The single walk must generate the same output as running
+    the Enum and Function Declaration visitors one after the other.
+    """
+    node = parse_file("tests/stanza/enums_and_funcs.h", use_cpp=True)
+
+    enums = EnumVisitor(combined_opts())
+    funcs = FuncDeclVisitor(combined_opts())
+    exp = run_visitor(enums, node) + run_visitor(funcs, node)
+
+    v = CombinedVisitor(combined_opts())
+    obs = run_visitor(v, node)
+
+    self.assertEqual(obs, exp)
+    self.assertEqual(list(v.enums._enums.keys()), ["Shape", "Level", "scale"])
+    self.assertEqual(list(v.funcs._funcs.keys()), ["shape_sides", "box_level", "box_reset", "box_area"])
+
+    shape = v.funcs.types["Shape"]
+    self.assertIsInstance(shape, EnumArg)
+    self.assertEqual(shape.enumVals, ["ShapeCircle", "ShapeSquare", "ShapeTriangle"])
@@ -1,12 +1,14 @@
 
 import unittest
+import io
 import os
 import os.path
 
 from argparse import Namespace
 import subprocess as sp
 
-from lbstanza_wrappers.Lbstanza import EnumExporter, NativeEnumExporter
+from lbstanza_wrappers.Lbstanza import EnumExporter, NativeEnumExporter, FlagEnumExporter
+from lbstanza_wrappers.Exporter import Exporter
 
 from .utils import open_test
 
@@ -38,9 +40,123 @@ class EnumExporterTests(unittest.TestCase):
       opts = Namespace(pkg_prefix="wrapper/enum_exporter")
       exp.dump_enums(opts)
 
+    # Dense values with an offset, a gap and an alias
+    fout = os.path.join(stanza_dir, "Levels.stanza")
+    with open_test(fout) as cap:
+      levels = [("Level{}".format(i), 100 + i) for i in range(10) if i != 4]
+      exp = EnumExporter(cap, "Levels", levels + [("LevelAlias", 101)])
+
+      opts = Namespace(pkg_prefix="wrapper/enum_exporter")
+      exp.dump_enums(opts)
+
+    # Sparse values
+    fout = os.path.join(stanza_dir, "Primes.stanza")
+    with open_test(fout) as cap:
+      primes = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71, 73, 79, 83, 89, 97]
+      exp = EnumExporter(cap, "Primes", [("Prime{}".format(p), p) for p in reversed(primes)])
+
+      opts = Namespace(pkg_prefix="wrapper/enum_exporter")
+      exp.dump_enums(opts)
+
+    # Bit flags
+    fout = os.path.join(stanza_dir, "Perms.stanza")
+    with open_test(fout) as cap:
+      exp = FlagEnumExporter(cap, "Perms", [("PermNone", 0), ("PermRead", 1), ("PermWrite", 2), ("PermExec", 4), ("PermRW", 3)])
+
+      opts = Namespace(pkg_prefix="wrapper/enum_exporter")
+      exp.dump_enums(opts)
+
     sp.check_call("stanza build test_enum_exporter", cwd="./tests", shell=True)
     sp.check_call(["tests/bin/test_enum_exporter"], shell=True)
 
+class EnumLookupTests(unittest.TestCase):
+  def render(self, name, enumerators):
+    buf = io.StringIO()
+    exp = EnumExporter(buf, name, enumerators)
+    exp.dump_constructor()
+    exp.flush()
+    return exp, buf.getvalue()
+
+  def test_lookup_kind(self):
+    cases = [
+      ([("A", 10), ("B", 20), ("C", 30)], "switch"),
+      ([("E{}".format(i), 1000 + i) for i in range(2000)], "dense"),
+      ([("E{}".format(i), -50 + 2 * i) for i in range(100)], "dense"),
+      ([("E{}".format(i), 1 << i) for i in range(16)], "sparse"),
+    ]
+    for enumerators, kind in cases:
+      exp = EnumExporter(io.StringIO(), "E", enumerators)
+      self.assertEqual(exp.lookup_kind(exp.unique_values()), kind)
+
+  def test_dense_table(self):
+    _, content = self.render("Levels", [("L0", -3), ("L1", -2), ("Alias", -3), ("L3", 0), ("L4", 1), ("L5", 2)])
+    lines = content.splitlines()
+    start = lines.index("val Levels-by-value:Tuple<Levels|False> = [")
+    # The first enumerator with a value is constructed and
+    #  missing values are `false`
+    self.assertEqual(lines[start + 1:start + 8], ["  L0", "  L1", "  false", "  L3", "  L4", "  L5", "]"])
+    self.assertIn("Levels-by-value[v + 3] when v >= -3 and v <= 2 else false", content)
+    self.assertNotIn("switch", content)
+
+  def test_sparse_table(self):
+    enumerators = [("Flag{}".format(i), 1 << i) for i in reversed(range(10))]
+    _, content = self.render("Flags", enumerators)
+    lines = content.splitlines()
+    start = lines.index("val Flags-values:Tuple<Int> = [")
+    values = [int(x) for x in lines[start + 1:start + 11]]
+    self.assertEqual(values, sorted(1 << i for i in range(10)))
+    start = lines.index("val Flags-by-index:Tuple<Flags> = [")
+    self.assertEqual(lines[start + 1], "  Flag0")
+    self.assertIn("search(0, length(Flags-values))", content)
+    self.assertNotIn("switch", content)
+
+
+class EnumValueTests(unittest.TestCase):
+  def test_singletons_store_value(self):
+    """ The conversions read the value and name stored by each
+    singleton instead of matching on every enumerator type.
+    """
+    buf = io.StringIO()
+    exp = EnumExporter(buf, "Codes", [("ErrorCode", 10), ("WarnCode", 20), ("InfoCode", 30)])
+    exp.dump_enums(Namespace(pkg_prefix="wrapper/enum_exporter"))
+    content = buf.getvalue()
+
+    self.assertNotIn("match(", content)
+    self.assertIn("public deftype WarnCode <: Codes", content)
+    lines = content.splitlines()
+    start = lines.index("public val WarnCode = new WarnCode :")
+    self.assertEqual(lines[start + 1:start + 3], [
+      "  defmethod enum-value (this) : 20",
+      '  defmethod enum-name (this) : "WarnCode"',
+    ])
+    for decl, body in [
+      ("public defn to-int (v:Codes) -> Int:", "  enum-value(v)"),
+      ("public defmethod print (o:OutputStream, v:Codes) :", "  print(o, enum-name(v))"),
+      ("public defmethod equal? (a:Codes, b:Codes) -> True|False :", "  enum-value(a) == enum-value(b)"),
+    ]:
+      self.assertEqual(lines[lines.index(decl) + 1], body)
+
+
+class ExporterTests(unittest.TestCase):
+  def test_write_through(self):
+    """ Output is written as it is printed outside of a buffered
+    block - subclasses don't have to call `flush`.
+    """
+    buf = io.StringIO()
+    exp = Exporter(buf)
+    exp.lprint("a")
+    with exp.indented():
+      exp.lines(["b", "c"])
+    self.assertEqual(buf.getvalue(), "a\n  b\n  c\n")
+
+    with exp.buffered():
+      exp.lprint("d")
+      with exp.buffered():
+        exp.lprint("e")
+      self.assertEqual(buf.getvalue(), "a\n  b\n  c\n")
+    self.assertEqual(buf.getvalue(), "a\n  b\n  c\nd\ne\n")
+
+
 class NativeEnumExporterTests(unittest.TestCase):
   def test_native_exporter(self):
     """ Unit tests for the Native `defenum` exporter
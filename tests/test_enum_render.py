@@ -0,0 +1,49 @@
+import unittest
+import os
+import tempfile
+
+from pycparser import parse_file
+
+from lbstanza_wrappers.EnumVisitor import EnumVisitor
+
+from .utils import make_opts, run_visitor
+
+
+def enum_opts(**kwargs):
+  return make_opts(input = "tests/stanza/enums_and_funcs.h", use_defenum = True, pkg_prefix = "wrapper/enums", **kwargs)
+
+def run_enums(opts):
+  v = EnumVisitor(opts)
+  node = parse_file(opts.input, use_cpp=True)
+  visitOut = run_visitor(v, node, export=False)
+  return v, visitOut, visitOut + run_visitor(v)
+
+
+class EnumRenderTests(unittest.TestCase):
+  def test_visit_only_collects(self):
+    v, visitOut, out = run_enums(enum_opts())
+    self.assertEqual(visitOut, "")
+    self.assertEqual(list(v._enums.keys()), ["Shape", "Level", "scale"])
+    # Packages are rendered in the order the enums were captured
+    pkgs = [x for x in out.splitlines() if x.startswith("defpackage")]
+    self.assertEqual(pkgs, [
+      "defpackage wrapper/enums/Shape :",
+      "defpackage wrapper/enums/Level :",
+      "defpackage wrapper/enums/scale :",
+    ])
+    self.assertIn("public defenum Shape:", out)
+    self.assertIn("public deftype Level <: Equalable", out)
+
+  def test_render_pool(self):
+    _, _, exp = run_enums(enum_opts())
+    _, _, obs = run_enums(enum_opts(render_jobs = 2))
+    self.assertEqual(obs, exp)
+
+  def test_concurrent_write(self):
+    with tempfile.TemporaryDirectory() as outDir:
+      v, _, _ = run_enums(enum_opts(dry_run = False, out_dir = outDir, render_jobs = 2, write_jobs = 4))
+      files = sorted(x for x in os.listdir(outDir) if x.endswith(".stanza"))
+      self.assertEqual(files, ["Level.stanza", "Shape.stanza", "scale.stanza"])
+      rendered = dict(v.render())
+      with open(os.path.join(outDir, "Shape.stanza")) as f:
+        self.assertEqual(f.read(), rendered["Shape"])
@@ -0,0 +1,120 @@
+import unittest
+
+from pycparser import c_parser
+
+from lbstanza_wrappers.ConstExpr import eval_const
+from lbstanza_wrappers.EnumVisitor import EnumVisitor, is_flag_enum
+
+from .utils import make_opts, run_visitor
+
+FLAGS = """
+typedef enum {
+  OPEN_NONE = 0,
+  OPEN_READ = 1 << 0,
+  OPEN_WRITE = 1u << 1,
+  OPEN_APPEND = (OPEN_WRITE << 1),
+  OPEN_RW = OPEN_READ | OPEN_WRITE,
+  OPEN_SYNC = 0x80000000u,
+} OpenFlags;
+
+typedef enum {
+  MODE_A = 3,
+  MODE_B = MODE_A * 2 + 1,
+  MODE_C,
+  MODE_D = 'a',
+  MODE_E = ~0,
+  MODE_F = (int)(MODE_C - 20) / 3,
+} Mode;
+"""
+
+def flag_opts(**kwargs):
+  return make_opts(input = "flags.h", pkg_prefix = "wrapper/flags", **kwargs)
+
+def run_enums(opts):
+  v = EnumVisitor(opts)
+  return v, run_visitor(v, c_parser.CParser().parse(FLAGS, "flags.h"))
+
+
+class FlagEnumTests(unittest.TestCase):
+  def test_eval_const(self):
+    parser = c_parser.CParser()
+    cases = [
+      ("010", 8),
+      ("0x1Fu", 31),
+      ("'\\n'", 10),
+      ("-7 / 2", -3),
+      ("-7 % 2", -1),
+      ("1 ? 2 : 3", 2),
+      ("(1 << 4) | (1 << 2) ^ 1", 21),
+      ("FOO + 1", 43),
+    ]
+    for expr, exp in cases:
+      node = parser.parse("int x = {};".format(expr)).ext[0].init
+      self.assertEqual(eval_const(node, {"FOO": 42}), exp, expr)
+
+    node = parser.parse("int x = BAR;").ext[0].init
+    with self.assertRaises(NotImplementedError):
+      eval_const(node, {})
+
+  def test_enumerator_values(self):
+    v, _ = run_enums(flag_opts())
+    self.assertEqual(v._enums["OpenFlags"], [
+      ("OPEN_NONE", 0), ("OPEN_READ", 1), ("OPEN_WRITE", 2),
+      ("OPEN_APPEND", 4), ("OPEN_RW", 3), ("OPEN_SYNC", 0x80000000),
+    ])
+    self.assertEqual(v._enums["Mode"], [
+      ("MODE_A", 3), ("MODE_B", 7), ("MODE_C", 8), ("MODE_D", 97),
+      ("MODE_E", -1), ("MODE_F", -4),
+    ])
+
+  def test_referenced_enumerators(self):
+    header = """
+    enum { X = 8 };
+    typedef enum { HIDDEN_A = 16 } Hidden;
+    typedef enum { G1 = X, G2, G3 = HIDDEN_A + 1 } Group;
+    typedef enum { BAD_A, BAD_B = UNKNOWN, BAD_C } Bad;
+    """
+    v = EnumVisitor(flag_opts(exclude_symbols=["Hidden"]))
+    v.visit(c_parser.CParser().parse(header, "group.h"))
+    # Anonymous and unselected enums are not generated but
+    #  their enumerators can be referenced.
+    self.assertEqual(list(v._enums.keys()), ["Group"])
+    self.assertEqual(v._enums["Group"], [("G1", 8), ("G2", 9), ("G3", 17)])
+
+    v = EnumVisitor(flag_opts())
+    v.visit_pruned(c_parser.CParser().parse(header, "group.h"))
+    self.assertEqual(v._enums["Group"], [("G1", 8), ("G2", 9), ("G3", 17)])
+    # An enum with a value that can't be evaluated is skipped
+    self.assertNotIn("Bad", v._enums)
+
+  def test_is_flag_enum(self):
+    def enum(*values):
+      return [("E{}".format(i), x) for i, x in enumerate(values)]
+    self.assertTrue(is_flag_enum(enum(1, 2, 4, 8)))
+    self.assertTrue(is_flag_enum(enum(0, 1, 2, 4, 7)))
+    self.assertTrue(is_flag_enum(enum(0x10, 0x20)))
+    # Contiguous values are a regular enum
+    self.assertFalse(is_flag_enum(enum(0, 1, 2, 3)))
+    self.assertFalse(is_flag_enum(enum(1, 2)))
+    # Values that aren't made of the single bits
+    self.assertFalse(is_flag_enum(enum(1, 2, 4, 9)))
+    self.assertFalse(is_flag_enum(enum(-1, 1, 2, 4)))
+    self.assertFalse(is_flag_enum(enum(10, 20, 30)))
+
+  def test_flag_package(self):
+    with self.assertLogs(level="INFO") as logs:
+      _, out = run_enums(flag_opts(flag_enums=True))
+    self.assertIn("Flag Enum: OpenFlags", "\n".join(logs.output))
+    self.assertIn("public lostanza deftype OpenFlags <: Equalable & Hashable :", out)
+    self.assertIn("public val OPEN_RW = OpenFlags(3)", out)
+    # Bit 31 is negative as a stanza Int
+    self.assertIn("public val OPEN_SYNC = OpenFlags(-2147483648)", out)
+    self.assertIn("public lostanza defn OpenFlags (v:int) -> ref<OpenFlags> :\n  return new OpenFlags{v}", out)
+    self.assertIn('val OpenFlags-names = ["OPEN_READ", "OPEN_WRITE", "OPEN_APPEND", "OPEN_SYNC"]', out)
+    self.assertIn("public deftype Mode <: Equalable", out)
+
+  def test_disabled(self):
+    # Flag enums are opt-in
+    _, out = run_enums(flag_opts())
+    self.assertNotIn("lostanza deftype", out)
+    self.assertIn("public deftype OpenFlags <: Equalable", out)
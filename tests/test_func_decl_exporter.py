@@ -11,9 +11,14 @@ import subprocess as sp
 
 from lbstanza_wrappers.Lbstanza import *
 from lbstanza_wrappers.CDefIR import *
+from lbstanza_wrappers.OutParams import OutParams
 
 from .utils import open_test
 
+INT = CLayout(4, 4, "signed")
+CHAR = CLayout(1, 1, "signed")
+DOUBLE = CLayout(8, 8, "float")
+
 basic_funcs = OrderedDict()
 basic_funcs["basic_some_func"] = FunctionData(
   OrderedDict({
@@ -21,7 +26,50 @@ basic_funcs["basic_some_func"] = FunctionData(
     "b" : ArgType(Identifier("char"), 1),
   }),
   ReturnType(ArgType(Identifier("int"), 0), False),
-  None
+  None,
+  {"a": INT, "b": CHAR}
+)
+
+char = CharIdentifier("byte")
+string_funcs = OrderedDict()
+string_funcs["basic_length"] = FunctionData(
+  OrderedDict({
+    "s": ArgType(char, 1, True),
+    "extra" : ArgType(Identifier("int"), 0),
+  }),
+  ReturnType(ArgType(Identifier("int"), 0), False),
+  None,
+  {"s": CHAR, "extra": INT}
+)
+string_funcs["basic_greeting"] = FunctionData(
+  OrderedDict({
+    "which": ArgType(Identifier("int"), 0),
+  }),
+  ReturnType(ArgType(char, 1, True), False),
+  None,
+  {"which": INT}
+)
+
+out_funcs = OrderedDict()
+out_funcs["basic_divmod"] = FunctionData(
+  OrderedDict({
+    "a": ArgType(Identifier("int"), 0),
+    "b": ArgType(Identifier("int"), 0),
+    "out_q": ArgType(Identifier("int"), 1),
+    "out_r": ArgType(Identifier("int"), 1),
+  }),
+  ReturnType(ArgType(Identifier("int"), 0), False),
+  None,
+  {"a": INT, "b": INT, "out_q": INT, "out_r": INT}
+)
+out_funcs["basic_scale"] = FunctionData(
+  OrderedDict({
+    "v": ArgType(Identifier("double"), 0),
+    "out": ArgType(Identifier("double"), 1),
+  }),
+  ReturnType(ArgType(Identifier("int"), 0), True),
+  None,
+  {"v": DOUBLE, "out": DOUBLE}
 )
 
 
@@ -37,6 +85,20 @@ class TestFuncDeclExporter(unittest.TestCase):
       opts = Namespace(pkg_prefix="wrapper/func_exporter", pkg_name = "basic")
       exp.dump_func_decls(basic_funcs, opts)
 
+    fout = os.path.join(stanza_dir, "strings.stanza")
+    with open_test(fout) as cap:
+
+      exp = FuncDeclExporter(cap, stringWrappers=True)
+      opts = Namespace(pkg_prefix="wrapper/func_exporter", pkg_name = "strings")
+      exp.dump_func_decls(string_funcs, opts)
+
+    fout = os.path.join(stanza_dir, "outs.stanza")
+    with open_test(fout) as cap:
+
+      exp = FuncDeclExporter(cap, outParams=OutParams())
+      opts = Namespace(pkg_prefix="wrapper/func_exporter", pkg_name = "outs")
+      exp.dump_func_decls(out_funcs, opts)
+
     sp.check_call("stanza build test_func_exporter", cwd="./tests", shell=True)
     sp.check_call(["tests/bin/test_func_exporter"], shell=True)
 
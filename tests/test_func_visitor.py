@@ -25,7 +25,8 @@ class FuncDeclVisitorTests(unittest.TestCase):
         dump_types = False,
         dry_run = False,
         pkg_prefix="wrapper/func_visitor",
-        pkg_name="standard-externs"
+        pkg_name="standard-externs",
+        struct_accessors=True,
         )
 
       cpp_args = ""
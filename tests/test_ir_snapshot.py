@@ -0,0 +1,94 @@
+import unittest
+import os
+import pickle
+import tempfile
+
+from pycparser import parse_file
+
+from lbstanza_wrappers.FuncDeclVisitor import FuncDeclVisitor
+from lbstanza_wrappers.CombinedVisitor import CombinedVisitor
+from lbstanza_wrappers.IRSnapshot import IRSnapshot
+from lbstanza_wrappers.CDefIR import ArgType, Identifier, EnumArg
+
+from .utils import make_opts, run_visitor
+
+
+HEADER = "tests/stanza/enums_and_funcs.h"
+
+
+class IRSnapshotTests(unittest.TestCase):
+  def setUp(self):
+    self.node = parse_file(HEADER, use_cpp=True)
+    self.tmpDir = tempfile.TemporaryDirectory()
+    self.fpath = os.path.join(self.tmpDir.name, "snap.ir")
+
+  def tearDown(self):
+    self.tmpDir.cleanup()
+
+  def visit(self, cls, opts):
+    v = cls(opts)
+    v.visit(self.node)
+    return v
+
+  def test_round_trip(self):
+    """ Rendering from the snapshot with different output options must
+    generate the same output as visiting the AST with those options.
+    """
+    v = self.visit(CombinedVisitor, make_opts(input = HEADER, pkg_prefix = "wrapper/first"))
+    v.snapshot().save(self.fpath)
+
+    newOpts = make_opts(input = HEADER, pkg_prefix = "wrapper/second", use_defenum = True)
+    exp = run_visitor(self.visit(CombinedVisitor, newOpts))
+
+    snap = IRSnapshot.load(self.fpath)
+    self.assertTrue(snap.has_funcs)
+    self.assertTrue(snap.has_enums)
+    self.assertEqual(snap.input, HEADER)
+
+    obs = CombinedVisitor(newOpts)
+    obs.restore(snap)
+    self.assertEqual(run_visitor(obs), exp)
+
+    # The enumerators were linked before the snapshot was taken
+    self.assertEqual(snap.types["Shape"].enumVals, ["ShapeCircle", "ShapeSquare", "ShapeTriangle"])
+
+  def test_func_only(self):
+    v = self.visit(FuncDeclVisitor, make_opts(input = HEADER, pkg_prefix = "wrapper/funcs"))
+    v.snapshot().save(self.fpath)
+    snap = IRSnapshot.load(self.fpath)
+    self.assertTrue(snap.has_funcs)
+    self.assertFalse(snap.has_enums)
+
+    # Loaded values are interned with the existing values
+    data = snap.funcs["box_area"]
+    for arg in data.args.values():
+      self.assertIs(arg, ArgType(arg.lbType, arg.numPtrs))
+    self.assertIs(snap.types["int"], Identifier("int"))
+    # Shared mutable types keep their identity within the snapshot
+    shape = snap.types["Shape"]
+    self.assertIsInstance(shape, EnumArg)
+    self.assertIs(snap.funcs["shape_sides"].args["s"].lbType, shape)
+
+  def test_symbol_selection(self):
+    v = self.visit(CombinedVisitor, make_opts(input = HEADER, pkg_prefix = "wrapper/sel"))
+    v.snapshot().save(self.fpath)
+    snap = IRSnapshot.load(self.fpath)
+
+    opts = make_opts(input = HEADER, pkg_prefix = "wrapper/sel", exclude_symbols = ["Level"], include_symbols = ["box_*", "Shape", "Level"])
+    obs = CombinedVisitor(opts)
+    obs.restore(snap)
+    self.assertEqual(list(obs.enums._enums.keys()), ["Shape"])
+    self.assertTrue(all(x.startswith("box_") for x in obs.funcs._funcs.keys()))
+    # The snapshot itself is unchanged
+    self.assertIn("Level", snap.enums)
+
+  def test_rejects_invalid(self):
+    with open(self.fpath, "wb") as f:
+      f.write(b"not a snapshot")
+    with self.assertRaises(ValueError):
+      IRSnapshot.load(self.fpath)
+
+    with open(self.fpath, "wb") as f:
+      pickle.dump({"magic": IRSnapshot.MAGIC, "version": IRSnapshot.FORMAT_VERSION + 1}, f)
+    with self.assertRaisesRegex(ValueError, "Unsupported IR Snapshot Version"):
+      IRSnapshot.load(self.fpath)
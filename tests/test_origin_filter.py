@@ -0,0 +1,51 @@
+import unittest
+import os
+from argparse import Namespace
+
+from pycparser import parse_file
+
+from lbstanza_wrappers.EnumVisitor import EnumVisitor
+from lbstanza_wrappers.FuncDeclVisitor import FuncDeclVisitor
+from lbstanza_wrappers.Selection import OriginFilter
+
+from .utils import make_opts, run_visitor
+
+
+def run_visitors(onlyFrom):
+  node = parse_file("tests/stanza/origin/lib.h", use_cpp=True)
+  opts = make_opts(pkg_prefix = "wrapper/origin", pkg_name = "lib", only_from = onlyFrom)
+  enums = EnumVisitor(opts)
+  funcs = FuncDeclVisitor(opts)
+  run_visitor(enums, node, export=False)
+  run_visitor(funcs, node, export=False)
+  return enums, funcs
+
+
+class OriginFilterTests(unittest.TestCase):
+  def test_no_filter(self):
+    enums, funcs = run_visitors([])
+    self.assertEqual(list(enums._enums.keys()), ["DepStatus", "LibColor"])
+    self.assertEqual(list(funcs._funcs.keys()), ["dep_init", "dep_free", "lib_size", "lib_status"])
+
+  def test_only_from_file(self):
+    enums, funcs = run_visitors(["tests/stanza/origin/lib.h"])
+    self.assertEqual(list(enums._enums.keys()), ["LibColor"])
+    self.assertEqual(list(funcs._funcs.keys()), ["lib_size", "lib_status"])
+    # Types from the other header are still resolved
+    self.assertIn("dep_size_t", funcs.types)
+    self.assertIn("DepStatus", funcs.types)
+    self.assertEqual(funcs._origin.filtered["function"], 2)
+    self.assertEqual(enums._origin.filtered["enum"], 1)
+
+  def test_only_from_dir_and_glob(self):
+    enums, funcs = run_visitors(["tests/stanza/origin"])
+    self.assertEqual(list(funcs._funcs.keys()), ["dep_init", "dep_free", "lib_size", "lib_status"])
+
+    enums, funcs = run_visitors(["tests/*/origin/d*.h"])
+    self.assertEqual(list(enums._enums.keys()), ["DepStatus"])
+    self.assertEqual(list(funcs._funcs.keys()), ["dep_init", "dep_free"])
+
+  def test_from_opts(self):
+    self.assertIsNone(OriginFilter.from_opts(Namespace()))
+    self.assertIsNone(OriginFilter.from_opts(Namespace(only_from=[])))
+    self.assertIsNotNone(OriginFilter.from_opts(Namespace(only_from=["foo.h"])))
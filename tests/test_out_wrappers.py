@@ -0,0 +1,176 @@
+import unittest
+import io
+import os
+import json
+import tempfile
+from argparse import Namespace
+
+from pycparser import c_parser
+
+from lbstanza_wrappers.FuncDeclVisitor import FuncDeclVisitor
+from lbstanza_wrappers.OutParams import OutParams
+
+HEADER = """
+typedef unsigned char uchar;
+typedef struct ctx_s ctx_t;
+
+int get_size(int id, int *out_w, double *out_scale);
+void get_width(int id, int *out);
+const char *get_name(int id, long *len_out);
+void read_byte(uchar *outValue, float *result);
+int no_outs(int *vals, const int *out_c, char *out_name);
+int ctx_get(ctx_t *ctx, int *out);
+int parse_int(const char *s, int *value);
+int fill_buf(char *buf, int n, int *out_written);
+typedef int size_t;
+int read_all(int fd, size_t *out_len);
+void get_short(short *out);
+void get_sizes(int *out_a, unsigned short *out_b);
+"""
+
+def render(outWrappers, annotations=None, pattern=None, arrayWrappers=False):
+  out = io.StringIO()
+  opts = Namespace(
+    output = out,
+    dump_types = False,
+    dry_run = False,
+    pkg_prefix = "wrapper/outs",
+    pkg_name = "outs",
+    string_wrappers = False,
+    array_wrappers = arrayWrappers,
+    out_wrappers = outWrappers,
+    out_param_pattern = pattern,
+    out_annotations = annotations,
+  )
+  v = FuncDeclVisitor(opts)
+  v.visit(c_parser.CParser().parse(HEADER, "outs.h"))
+  v.export()
+  return v, out.getvalue()
+
+def body(lines, decl, n):
+  start = lines.index(decl)
+  return lines[start + 1:start + 1 + n]
+
+
+class OutParamTests(unittest.TestCase):
+  def setUp(self):
+    self.v, _ = render(False)
+    self.outs = OutParams()
+
+  def find(self, name):
+    return dict(self.outs.find(name, self.v._funcs[name]))
+
+  def test_heuristic(self):
+    self.assertEqual(self.find("get_size"), {"out_w": "int", "out_scale": "double"})
+    self.assertEqual(self.find("get_width"), {"out": "int"})
+    self.assertEqual(self.find("get_name"), {"len_out": "long"})
+    self.assertEqual(self.find("read_byte"), {"outValue": "byte", "result": "float"})
+    # Name doesn't match, const pointer and `char *`
+    self.assertEqual(self.find("no_outs"), {})
+    self.assertEqual(self.find("parse_int"), {})
+
+  def test_sizes(self):
+    # The C type must have the size of the stanza variable -
+    #  `size_t` is an `int` in the fake libc headers.
+    self.assertEqual(self.v._funcs["read_all"].args["out_len"].to_stanza(), "ptr<int>")
+    self.assertEqual(self.find("read_all"), {})
+    self.assertEqual(self.find("get_short"), {})
+    self.assertEqual(self.find("get_sizes"), {"out_a": "int"})
+    self.outs = OutParams(annotations={"get_short": ["out"]})
+    with self.assertRaises(ValueError):
+      self.find("get_short")
+
+  def test_pattern(self):
+    self.outs = OutParams(r"^value$")
+    self.assertEqual(self.find("parse_int"), {"value": "int"})
+    self.assertEqual(self.find("get_width"), {})
+    with self.assertRaises(ValueError):
+      OutParams("(")
+
+  def test_annotations(self):
+    self.outs = OutParams(annotations={"parse_int": ["value"], "get_size": ["out_w"], "no_outs": ["out_name"]})
+    self.assertEqual(self.find("parse_int"), {"value": "int"})
+    # Annotated functions only use the listed parameters
+    self.assertEqual(self.find("get_size"), {"out_w": "int"})
+    self.assertEqual(self.find("no_outs"), {"out_name": "byte"})
+    self.assertEqual(self.find("get_width"), {"out": "int"})
+
+    self.outs = OutParams(annotations={"parse_int": ["missing"]})
+    with self.assertRaises(ValueError):
+      self.find("parse_int")
+    self.outs = OutParams(annotations={"parse_int": ["s"]})
+    with self.assertRaises(ValueError):
+      self.find("parse_int")
+
+  def test_from_opts(self):
+    self.assertIsNone(OutParams.from_opts(Namespace()))
+    self.assertIsNotNone(OutParams.from_opts(Namespace(out_wrappers=True)))
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+      fpath = os.path.join(tmpDir, "outs.json")
+      with open(fpath, "w") as f:
+        json.dump({"parse_int": ["value"]}, f)
+      # The annotation file enables the wrappers
+      outs = OutParams.from_opts(Namespace(out_annotations=fpath))
+      self.assertEqual(dict(outs.find("parse_int", self.v._funcs["parse_int"])), {"value": "int"})
+
+      with open(fpath, "w") as f:
+        json.dump({"parse_int": "value"}, f)
+      with self.assertRaises(ValueError):
+        OutParams.from_opts(Namespace(out_annotations=fpath))
+
+
+class OutWrapperTests(unittest.TestCase):
+  def test_wrappers(self):
+    _, out = render(True)
+    lines = out.splitlines()
+
+    self.assertEqual(body(lines, "defn w_get_size_out_values (v0:Int, v1:Int, v2:Double) -> [Int, Int, Double] :", 6), [
+      "  [v0, v1, v2]",
+      "public lostanza defn w_get_size_out (id:ref<Int>) -> ref<[Int, Int, Double]> :",
+      "  var out_w:int = 0",
+      "  var out_scale:double = 0.0",
+      "  val ret = w_get_size(id.value, addr(out_w), addr(out_scale))",
+      "  return w_get_size_out_values(new Int{ret}, new Int{out_w}, new Double{out_scale})",
+    ])
+    # A single value is returned without a tuple
+    self.assertEqual(body(lines, "public lostanza defn w_get_width_out (id:ref<Int>) -> ref<Int> :", 3), [
+      "  var out:int = 0",
+      "  w_get_width(id.value, addr(out))",
+      "  return new Int{out}",
+    ])
+    self.assertEqual(body(lines, "public lostanza defn w_get_name_out (id:ref<Int>) -> ref<[String|False, Long]> :", 5), [
+      "  var len_out:long = 0L",
+      "  val ret = w_get_name(id.value, addr(len_out))",
+      "  var ret_str:ref<String|False> = false",
+      "  if ret != null : ret_str = String(ret)",
+      "  return w_get_name_out_values(ret_str, new Long{len_out})",
+    ])
+    self.assertEqual(body(lines, "public lostanza defn w_read_byte_out () -> ref<[Byte, Float]> :", 4), [
+      "  var outValue:byte = 0Y",
+      "  var result:float = 0.0F",
+      "  w_read_byte(addr(outValue), addr(result))",
+      "  return w_read_byte_out_values(new Byte{outValue}, new Float{result})",
+    ])
+
+    # No out parameters or an argument that can't be passed from HiStanza
+    for name in ["no_outs", "ctx_get", "parse_int", "fill_buf", "read_all", "get_short", "get_sizes"]:
+      self.assertNotIn("w_{}_out".format(name), out)
+
+  def test_array_pairs(self):
+    _, out = render(True, arrayWrappers=True)
+    lines = out.splitlines()
+    self.assertEqual(body(lines, "public lostanza defn w_fill_buf_out (buf:ref<ByteArray>) -> ref<[Int, Int]> :", 3), [
+      "  var out_written:int = 0",
+      "  val ret = w_fill_buf(addr!(buf.data), buf.length as int, addr(out_written))",
+      "  return w_fill_buf_out_values(new Int{ret}, new Int{out_written})",
+    ])
+
+  def test_opt_in(self):
+    _, exp = render(False)
+    self.assertNotIn("_out (", exp)
+    _, obs = render(True)
+    # The regular declarations and wrappers are unchanged
+    added = lambda x: "_out (" in x or "_out_values (" in x
+    self.assertEqual([x for x in obs.splitlines() if not added(x) and not x.startswith("  ")],
+                     [x for x in exp.splitlines() if not x.startswith("  ")])
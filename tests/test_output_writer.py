@@ -0,0 +1,73 @@
+import unittest
+import os
+import os.path
+import tempfile
+
+from lbstanza_wrappers.OutputWriter import *
+
+
+class OutputWriterTests(unittest.TestCase):
+  def test_write_if_changed(self):
+    with tempfile.TemporaryDirectory() as outDir:
+      fpath = os.path.join(outDir, "Pkg.stanza")
+      self.assertEqual(write_if_changed(fpath, "defpackage a :\n"), ADDED)
+
+      os.utime(fpath, ns=(1000, 1000))
+      self.assertEqual(write_if_changed(fpath, "defpackage a :\n"), UNCHANGED)
+      self.assertEqual(os.stat(fpath).st_mtime_ns, 1000)
+
+      self.assertEqual(write_if_changed(fpath, "defpackage b :\n"), CHANGED)
+      with open(fpath) as f:
+        self.assertEqual(f.read(), "defpackage b :\n")
+      self.assertEqual(os.listdir(outDir), ["Pkg.stanza"])
+
+  def test_permissions(self):
+    with tempfile.TemporaryDirectory() as outDir:
+      fpath = os.path.join(outDir, "Pkg.stanza")
+      atomic_write(fpath, b"a")
+      self.assertEqual(os.stat(fpath).st_mode & 0o777, 0o666 & ~UMASK)
+      # The mode of an existing file is kept
+      os.chmod(fpath, 0o640)
+      atomic_write(fpath, b"b")
+      self.assertEqual(os.stat(fpath).st_mode & 0o777, 0o640)
+
+  def test_output_tree(self):
+    with tempfile.TemporaryDirectory() as outDir:
+      tree = OutputTree(outDir, "lib.h")
+      tree.write("A.stanza", "A")
+      tree.write("B.stanza", "B")
+      tree.write("C.stanza", "C")
+      stats = tree.finish()
+      self.assertEqual((stats.added, stats.changed, stats.unchanged, stats.removed), (3, 0, 0, 0))
+
+      # Files generated from a different header are never removed.
+      other = OutputTree(outDir, "other.h")
+      other.write("D.stanza", "D")
+      other.finish()
+
+      tree = OutputTree(outDir, "lib.h")
+      tree.write("A.stanza", "A")
+      tree.write("B.stanza", "B2")
+      stats = tree.finish()
+      self.assertEqual((stats.added, stats.changed, stats.unchanged, stats.removed), (0, 1, 1, 1))
+
+      files = sorted(x for x in os.listdir(outDir) if x.endswith(".stanza"))
+      self.assertEqual(files, ["A.stanza", "B.stanza", "D.stanza"])
+
+  def test_write_all(self):
+    with tempfile.TemporaryDirectory() as outDir:
+      files = [("E{}.stanza".format(i), "E{}".format(i)) for i in range(50)]
+      tree = OutputTree(outDir, "lib.h")
+      statuses = tree.write_all(files, jobs=8)
+      self.assertEqual(statuses, [ADDED] * 50)
+      self.assertEqual(tree.finish().added, 50)
+
+      tree = OutputTree(outDir, "lib.h")
+      files[3] = ("E3.stanza", "changed")
+      statuses = tree.write_all(files, jobs=8)
+      self.assertEqual(statuses[3], CHANGED)
+      stats = tree.finish()
+      self.assertEqual((stats.changed, stats.unchanged), (1, 49))
+      with open(os.path.join(outDir, "E3.stanza")) as f:
+        self.assertEqual(f.read(), "changed")
+      self.assertFalse(any(x.startswith(".tmp-") for x in os.listdir(outDir)))
@@ -0,0 +1,77 @@
+import unittest
+from unittest import mock
+import io
+import os
+import tempfile
+
+from pycparser import c_parser, preprocess_file
+import pycparser_fake_libc
+
+from lbstanza_wrappers.TopLevel import split_toplevel
+from lbstanza_wrappers.ParallelParse import parse_parallel, SeededCParser
+
+
+def show(node):
+  buf = io.StringIO()
+  node.show(buf=buf, showcoord=True)
+  return buf.getvalue()
+
+INTERLEAVED = """
+typedef int myint;
+extern myint f0(myint a);
+struct S { myint a; char *name; };
+static inline myint sum(struct S *s) {
+  myint total = 0;
+  if (s->name[0] == '}') { total = 1; }
+  return total + s->a;
+}
+typedef struct S S_t;
+typedef void (*cb_t)(S_t *s, const char *msg);
+extern int f1(S_t *s, cb_t cb); extern int f2(void);
+enum E { E_A = sizeof(S_t), E_B };
+extern enum E f3(myint *vals, int cnt);
+"""
+
+
+class ParallelParseTests(unittest.TestCase):
+  def check_same(self, text, filename):
+    exp = c_parser.CParser().parse(text, filename)
+    obs = parse_parallel(text, filename, 2, groupsPerJob=8)
+    self.assertEqual(show(obs), show(exp))
+
+  def test_split_round_trip(self):
+    chunks = split_toplevel(INTERLEAVED, "test.h")
+    self.assertEqual("".join(x.text for x in chunks), INTERLEAVED)
+    self.assertEqual(len(chunks), 10)
+    self.assertEqual([x.is_typedef for x in chunks].count(True), 3)
+
+  def test_interleaved_typedefs(self):
+    self.check_same(INTERLEAVED, "test.h")
+
+  def test_unsupported_version(self):
+    # Without the private parser state the header is parsed sequentially
+    self.assertTrue(SeededCParser().seeding_supported())
+    with mock.patch.object(SeededCParser, "seeding_supported", return_value=False):
+      with self.assertLogs(level="WARNING"):
+        obs = parse_parallel(INTERLEAVED, "test.h", 2)
+    exp = c_parser.CParser().parse(INTERLEAVED, "test.h")
+    self.assertEqual(show(obs), show(exp))
+
+  def test_standard_externs(self):
+    cpp_args = "-I" + pycparser_fake_libc.directory
+    text = preprocess_file("tests/stanza/standard_externs.h", cpp_args=cpp_args)
+    self.check_same(text, "tests/stanza/standard_externs.h")
+
+  def test_fake_libc(self):
+    """ The fake libc headers contain hundreds of typedefs that
+    the declarations after them depend on.
+    """
+    with tempfile.TemporaryDirectory() as tmpDir:
+      fpath = os.path.join(tmpDir, "libc.h")
+      with open(fpath, "w") as f:
+        for hdr in ["stdio.h", "stdlib.h", "string.h", "signal.h", "time.h"]:
+          f.write("#include <{}>\n".format(hdr))
+        f.write(INTERLEAVED)
+      cpp_args = "-I" + pycparser_fake_libc.directory
+      text = preprocess_file(fpath, cpp_args=cpp_args)
+    self.check_same(text, fpath)
@@ -0,0 +1,64 @@
+import unittest
+import os
+import os.path
+import io
+import tempfile
+
+from pycparser import c_parser
+
+from lbstanza_wrappers.ParseCache import ParseCache
+
+
+def show(node):
+  buf = io.StringIO()
+  node.show(buf=buf, showcoord=True)
+  return buf.getvalue()
+
+
+class ParseCacheTests(unittest.TestCase):
+  def test_round_trip(self):
+    text = "typedef int myint;\nextern myint some_func(int a, char *b);\n"
+    node = c_parser.CParser().parse(text, "test.h")
+
+    with tempfile.TemporaryDirectory() as cacheDir:
+      cache = ParseCache(cacheDir, 1024 * 1024)
+      key = cache.key(text, "-Iinclude")
+      self.assertIsNone(cache.load(key))
+
+      cache.store(key, node)
+      obs = cache.load(key)
+      self.assertEqual(show(obs), show(node))
+
+      # Changing the cpp args or the text must result in a miss
+      self.assertIsNone(cache.load(cache.key(text, "-Iother")))
+      self.assertIsNone(cache.load(cache.key(text + "\n", "-Iinclude")))
+
+  def test_corrupt_entry(self):
+    with tempfile.TemporaryDirectory() as cacheDir:
+      cache = ParseCache(cacheDir, 1024 * 1024)
+      key = cache.key("int a;", "")
+      with open(cache.entry_path(key), "wb") as f:
+        f.write(b"garbage")
+      self.assertIsNone(cache.load(key))
+      self.assertFalse(os.path.exists(cache.entry_path(key)))
+
+  def test_lru_eviction(self):
+    node = c_parser.CParser().parse("extern int some_func(int a);\n", "test.h")
+
+    with tempfile.TemporaryDirectory() as cacheDir:
+      cache = ParseCache(cacheDir, 1024 * 1024)
+      keys = [cache.key(str(i), "") for i in range(3)]
+      for i, key in enumerate(keys):
+        cache.store(key, node)
+        os.utime(cache.entry_path(key), (1000 + i, 1000 + i))
+
+      # Touching the oldest entry makes it the most recently used.
+      self.assertIsNotNone(cache.load(keys[0]))
+
+      entrySize = os.path.getsize(cache.entry_path(keys[0]))
+      small = ParseCache(cacheDir, 2 * entrySize)
+      small.evict()
+
+      self.assertTrue(os.path.exists(cache.entry_path(keys[0])))
+      self.assertFalse(os.path.exists(cache.entry_path(keys[1])))
+      self.assertTrue(os.path.exists(cache.entry_path(keys[2])))
@@ -0,0 +1,67 @@
+import unittest
+import gc
+
+from pycparser import parse_file, c_ast
+import pycparser_fake_libc
+
+from lbstanza_wrappers.EnumVisitor import EnumVisitor
+from lbstanza_wrappers.FuncDeclVisitor import FuncDeclVisitor
+from lbstanza_wrappers.CombinedVisitor import CombinedVisitor
+from lbstanza_wrappers.PrunedWalk import iter_decl_nodes
+from lbstanza_wrappers.Pipeline import visit_node
+
+from .utils import make_opts, run_visitor
+
+
+def pruned_opts(**kwargs):
+  return make_opts(pkg_prefix = "wrapper/pruned", pkg_name = "pruned", **kwargs)
+
+def visit_with(cls, node, pruned):
+  v = cls(pruned_opts())
+  return v, run_visitor(v, node, pruned=pruned)
+
+def parse(fpath):
+  return parse_file(fpath, use_cpp=True, cpp_args="-I" + pycparser_fake_libc.directory)
+
+
+class PrunedWalkTests(unittest.TestCase):
+  def test_matches_full_walk(self):
+    """ Without function bodies the pruned walk must
+    generate exactly the same output as the full walk.
+    """
+    node = parse("tests/stanza/standard_externs.h")
+    for cls in [FuncDeclVisitor, EnumVisitor, CombinedVisitor]:
+      _, exp = visit_with(cls, node, False)
+      _, obs = visit_with(cls, node, True)
+      self.assertEqual(obs, exp)
+
+  def test_visit_unfreezes(self):
+    node = parse("tests/stanza/enums_and_funcs.h")
+    opts = pruned_opts(fast_visit = True)
+    visit_node(opts, CombinedVisitor(opts), node)
+    self.assertEqual(gc.get_freeze_count(), 0)
+
+  def test_skips_function_bodies(self):
+    node = parse("tests/stanza/enums_and_funcs.h")
+    full, _ = visit_with(CombinedVisitor, node, False)
+    pruned, _ = visit_with(CombinedVisitor, node, True)
+
+    self.assertEqual(list(full.enums._enums.keys()), ["Shape", "Level", "scale"])
+    # The enum declared in the body of `box_area` is skipped
+    self.assertEqual(list(pruned.enums._enums.keys()), ["Shape", "Level"])
+    # The inline function itself is still captured
+    self.assertEqual(list(pruned.funcs._funcs.keys()), list(full.funcs._funcs.keys()))
+    self.assertEqual(pruned.funcs.types["Shape"].enumVals, ["ShapeCircle", "ShapeSquare", "ShapeTriangle"])
+
+  def test_deep_nesting(self):
+    """ The walk doesn't recurse so it can't hit the recursion limit.
+    """
+    depth = 10000
+    t = c_ast.TypeDecl("p", [], None, c_ast.IdentifierType(["int"]))
+    for _ in range(depth):
+      t = c_ast.PtrDecl([], t)
+    root = c_ast.FileAST([c_ast.Decl("p", [], [], [], [], t, None, None)])
+
+    nodes = [n for n, _ in iter_decl_nodes(root)]
+    self.assertEqual(len(nodes), depth + 4)
+    self.assertIsInstance(nodes[-1], c_ast.IdentifierType)
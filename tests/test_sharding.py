@@ -0,0 +1,105 @@
+import unittest
+import io
+import os
+import tempfile
+from argparse import Namespace
+from collections import OrderedDict
+
+from pycparser import parse_file
+
+from lbstanza_wrappers.FuncDeclVisitor import FuncDeclVisitor
+from lbstanza_wrappers.Lbstanza import FuncDeclExporter
+from lbstanza_wrappers.Sharding import shard_funcs, prefix_key, header_keys
+
+from .utils import make_opts, run_visitor
+
+
+def capture(output, shardBy, shardSize=500):
+  opts = make_opts(
+    input = "tests/stanza/origin/lib.h", output = output, dry_run = False,
+    pkg_prefix = "wrapper/shard", pkg_name = "Lib",
+    shard_by = shardBy, shard_size = shardSize, shard_prefix_parts = 2,
+  )
+  v = FuncDeclVisitor(opts)
+  run_visitor(v, parse_file(opts.input, use_cpp=True), export=False)
+  return v
+
+
+class ShardFuncsTests(unittest.TestCase):
+  def test_prefix_key(self):
+    self.assertEqual(prefix_key("Z3_mk_int", 2), "Z3_mk")
+    self.assertEqual(prefix_key("Z3_mk_int", 1), "Z3")
+    self.assertEqual(prefix_key("lib_size", 2), "lib")
+    self.assertEqual(prefix_key("printf", 2), "misc")
+
+  def test_count(self):
+    funcs = OrderedDict((str(i), None) for i in range(5))
+    shards = shard_funcs(funcs, "count", size=2)
+    self.assertEqual(list(shards.keys()), ["part-000", "part-001", "part-002"])
+    self.assertEqual(list(shards["part-002"].keys()), ["4"])
+
+  def test_unique_names(self):
+    funcs = OrderedDict((x, None) for x in ["a.b_x_1", "a+b_x_2", "c_d"])
+    shards = shard_funcs(funcs, "prefix", prefixParts=1)
+    self.assertEqual(list(shards.keys()), ["a-b", "a-b-1", "c"])
+
+  def test_header_keys(self):
+    keys = header_keys(["a/types.h", "b/types.h", "./a/types.h", "x/a/foo.h", "y/a/foo.h", "bar.h"])
+    self.assertEqual(keys, {
+      "a/types.h": "a/types", "b/types.h": "b/types", "./a/types.h": "a/types",
+      "x/a/foo.h": "x/a/foo", "y/a/foo.h": "y/a/foo", "bar.h": "bar",
+    })
+
+    # Headers with the same file name are not merged
+    funcs = OrderedDict()
+    for name, origin in [("a_f", "a/types.h"), ("b_f", "b/types.h"), ("a_g", "a/types.h")]:
+      funcs[name] = Namespace(origin = origin)
+    shards = shard_funcs(funcs, "header")
+    self.assertEqual(list(shards.keys()), ["a-types", "b-types"])
+    self.assertEqual(list(shards["a-types"].keys()), ["a_f", "a_g"])
+
+  def test_invalid(self):
+    with self.assertRaises(ValueError):
+      shard_funcs(OrderedDict(), "bogus")
+    with self.assertRaises(ValueError):
+      shard_funcs(OrderedDict(), "count", size=0)
+
+
+class ShardedExportTests(unittest.TestCase):
+  def test_header_shards(self):
+    with tempfile.TemporaryDirectory() as tmpDir:
+      output = os.path.join(tmpDir, "Lib.stanza")
+      v = capture(output, "header")
+      v.export()
+
+      files = [x for x in os.listdir(os.path.join(tmpDir, "Lib")) if x.endswith(".stanza")]
+      self.assertEqual(sorted(files), ["dep.stanza", "lib.stanza"])
+      with open(output, "r") as f:
+        umbrella = f.read()
+      self.assertIn("defpackage wrapper/shard/Lib :", umbrella)
+      self.assertIn("forward wrapper/shard/Lib/dep", umbrella)
+      self.assertIn("forward wrapper/shard/Lib/lib", umbrella)
+
+      with open(os.path.join(tmpDir, "Lib", "lib.stanza"), "r") as f:
+        shard = f.read()
+      self.assertIn("defpackage wrapper/shard/Lib/lib :", shard)
+      self.assertIn("extern lib_size :", shard)
+      self.assertNotIn("dep_init", shard)
+
+  def test_shards_match_single_package(self):
+    """ The shards contain the same declarations as the single package.
+    """
+    v = capture(None, "count", shardSize=1)
+    single = io.StringIO()
+    FuncDeclExporter(single).dump_func_decls(v._funcs, v._opts)
+    single = single.getvalue().splitlines()
+
+    shards = shard_funcs(v._funcs, "count", size=1)
+    self.assertEqual(len(shards), 4)
+    lines = []
+    for name, funcs in shards.items():
+      buf = io.StringIO()
+      FuncDeclExporter(buf).dump_funcs_package(funcs, "wrapper/shard/Lib", name)
+      lines.extend(x for x in buf.getvalue().splitlines() if x.startswith("extern") or x.startswith("public"))
+    exp = [x for x in single if x.startswith("extern") or x.startswith("public")]
+    self.assertEqual(sorted(lines), sorted(exp))
@@ -0,0 +1,88 @@
+import unittest
+import os
+import tempfile
+
+from pycparser import c_parser, preprocess_file
+
+from lbstanza_wrappers.FuncDeclVisitor import FuncDeclVisitor
+from lbstanza_wrappers.EnumVisitor import EnumVisitor
+from lbstanza_wrappers.Selection import OriginFilter
+from lbstanza_wrappers.Slicer import slice_text, provided_names, code_text, enumerator_names
+
+from .utils import make_opts, run_visitor
+
+
+def run_func_decl(text):
+  node = c_parser.CParser().parse(text, "tests/stanza/origin/lib.h")
+  opts = make_opts(pkg_prefix = "wrapper/slice", pkg_name = "lib", only_from = ["tests/stanza/origin/lib.h"])
+  v = FuncDeclVisitor(opts)
+  return v, run_visitor(v, node)
+
+
+class SlicerTests(unittest.TestCase):
+  def test_slice_keeps_dependencies(self):
+    fpath = "tests/stanza/origin/lib.h"
+    text = preprocess_file(fpath)
+    sliced = slice_text(text, fpath, OriginFilter(["tests/stanza/origin/lib.h"]))
+
+    self.assertIn("dep_size_t;", sliced)
+    self.assertIn("DepStatus;", sliced)
+    self.assertNotIn("dep_init", sliced)
+    self.assertNotIn("dep_free", sliced)
+
+    exp_v, exp = run_func_decl(text)
+    obs_v, obs = run_func_decl(sliced)
+    self.assertEqual(obs, exp)
+    self.assertEqual(list(obs_v._funcs.keys()), ["lib_size", "lib_status"])
+
+  def test_coords_preserved(self):
+    fpath = "tests/stanza/origin/lib.h"
+    text = preprocess_file(fpath)
+    sliced = slice_text(text, fpath, OriginFilter(["tests/stanza/origin/lib.h"]))
+    exp = c_parser.CParser().parse(text, fpath)
+    obs = c_parser.CParser().parse(sliced, fpath)
+
+    def coords(node):
+      return {x.name: (x.coord.file, x.coord.line) for x in node.ext if x.name is not None}
+    obsCoords = coords(obs)
+    for name, coord in obsCoords.items():
+      self.assertEqual(coord, coords(exp)[name])
+    self.assertEqual(obsCoords["lib_size"], ("tests/stanza/origin/lib.h", 11))
+
+  def test_provided_names(self):
+    code = code_text('# 1 "foo.h"\ntypedef struct foo { bar_t x; } foo_t, *foo_p;')
+    self.assertEqual(provided_names(code, True), {"foo", "foo_t", "foo_p"})
+    code = code_text("struct baz { int x; };")
+    self.assertEqual(provided_names(code, False), {"baz"})
+    code = code_text("typedef void (*cb_t)(const char *msg);")
+    self.assertIn("cb_t", provided_names(code, True))
+
+  def test_enumerators(self):
+    """ Enumerators from the other headers are kept when they are
+    used by a value or an array dimension.
+    """
+    with tempfile.TemporaryDirectory() as tmpDir:
+      with open(os.path.join(tmpDir, "dep.h"), "w") as f:
+        f.write("enum dep_consts { DEP_BASE = 16 };\n")
+        f.write("typedef struct { enum { DEP_N = 4 } kind; } dep_t;\n")
+        f.write("enum { DEP_UNUSED };\n")
+      fpath = os.path.join(tmpDir, "lib.h")
+      with open(fpath, "w") as f:
+        f.write('#include "dep.h"\n')
+        f.write("typedef enum { LIB_A = DEP_BASE, LIB_B } lib_e;\n")
+        f.write("typedef struct { int v[DEP_N]; } lib_s;\n")
+
+      text = preprocess_file(fpath)
+      sliced = slice_text(text, fpath, OriginFilter([fpath]))
+      self.assertIn("DEP_BASE = 16", sliced)
+      self.assertIn("dep_t;", sliced)
+      self.assertNotIn("DEP_UNUSED", sliced)
+
+      v = EnumVisitor(make_opts(input = fpath, pkg_prefix = "wrapper/slice"))
+      run_visitor(v, c_parser.CParser().parse(sliced, fpath), export=False)
+      self.assertEqual(v._enums["lib_e"], [("LIB_A", 16), ("LIB_B", 17)])
+
+  def test_enumerator_names(self):
+    code = code_text("typedef struct { enum { A = F(1, 2), B, } k; } t; enum tag { C = 1 }; enum { D };")
+    self.assertEqual(enumerator_names(code), {"A", "B", "C", "D"})
+    self.assertEqual(provided_names(code_text("enum { E, F };"), False), {"E", "F"})
@@ -0,0 +1,37 @@
+import unittest
+
+from pycparser import c_parser, c_ast, preprocess_file
+
+from lbstanza_wrappers.StreamParse import iter_parsed
+from lbstanza_wrappers.CombinedVisitor import CombinedVisitor
+from lbstanza_wrappers.CDefIR import FunctionData
+
+from .test_parallel_parse import INTERLEAVED, show
+from .utils import make_opts, run_visitor
+
+
+def run_combined(nodes):
+  v = CombinedVisitor(make_opts(pkg_prefix = "wrapper/stream", pkg_name = "stream"))
+  return v, run_visitor(v, *nodes)
+
+
+class StreamParseTests(unittest.TestCase):
+  def test_fragments_match_full_parse(self):
+    exp = c_parser.CParser().parse(INTERLEAVED, "interleaved.h")
+    fragments = list(iter_parsed(INTERLEAVED, "interleaved.h", fragmentSize=40))
+    self.assertGreater(len(fragments), 3)
+    ext = [x for node in fragments for x in node.ext]
+    self.assertEqual(show(c_ast.FileAST(ext)), show(exp))
+
+  def test_stream_visit(self):
+    fpath = "tests/stanza/enums_and_funcs.h"
+    text = preprocess_file(fpath)
+    _, exp = run_combined([c_parser.CParser().parse(text, fpath)])
+    v, obs = run_combined(iter_parsed(text, fpath, fragmentSize=16))
+    self.assertEqual(obs, exp)
+
+    # The captured IR doesn't reference the AST
+    for data in v.funcs._funcs.values():
+      self.assertIsInstance(data, FunctionData)
+      self.assertEqual(data.origin, fpath)
+      self.assertFalse(any(isinstance(getattr(data, x), c_ast.Node) for x in data.__slots__))
@@ -0,0 +1,88 @@
+import unittest
+import io
+from argparse import Namespace
+
+from pycparser import c_parser
+
+from lbstanza_wrappers.FuncDeclVisitor import FuncDeclVisitor
+
+HEADER = """
+typedef const char * cstr;
+typedef char * buf_t;
+typedef unsigned char uchar;
+typedef struct ctx_s ctx_t;
+
+int str_len(const char *s, int extra);
+cstr str_name(long id);
+void str_log(double level, cstr msg);
+int str_fill(char *buf, int n);
+int str_copy(buf_t dst, const char * const src);
+int bytes_sum(const uchar *data, int n);
+int ctx_name(ctx_t *ctx, const char *name);
+const char * const * str_list(void);
+"""
+
+def render(stringWrappers):
+  out = io.StringIO()
+  opts = Namespace(
+    output = out,
+    dump_types = False,
+    dry_run = False,
+    pkg_prefix = "wrapper/strings",
+    pkg_name = "strings",
+    string_wrappers = stringWrappers,
+  )
+  v = FuncDeclVisitor(opts)
+  v.visit(c_parser.CParser().parse(HEADER, "strings.h"))
+  v.export()
+  return v, out.getvalue()
+
+
+class StringWrapperTests(unittest.TestCase):
+  def test_const_qualifiers(self):
+    v, _ = render(False)
+    args = v._funcs["str_len"].args
+    self.assertTrue(args["s"].is_const_string())
+    self.assertFalse(args["extra"].is_const_string())
+    self.assertTrue(v._funcs["str_name"].ret.retType.is_const_string())
+    self.assertTrue(v._funcs["str_copy"].args["src"].is_const_string())
+    # Not const, not `char` or not a single pointer
+    self.assertFalse(v._funcs["str_fill"].args["buf"].is_const_string())
+    self.assertFalse(v._funcs["str_copy"].args["dst"].is_const_string())
+    self.assertFalse(v._funcs["bytes_sum"].args["data"].is_const_string())
+    self.assertFalse(v._funcs["str_list"].ret.retType.is_const_string())
+
+  def test_wrappers(self):
+    _, out = render(True)
+    lines = out.splitlines()
+
+    start = lines.index("public lostanza defn w_str_len_str (s:ref<String>, extra:ref<Int>) -> ref<Int> :")
+    self.assertEqual(lines[start + 1:start + 3], [
+      "  val ret = w_str_len(addr!(s.chars), extra.value)",
+      "  return new Int{ret}",
+    ])
+
+    start = lines.index("public lostanza defn w_str_name_str (id:ref<Long>) -> ref<String|False> :")
+    self.assertEqual(lines[start + 1:start + 4], [
+      "  val ret = w_str_name(id.value)",
+      "  if ret == null : return false",
+      "  return String(ret)",
+    ])
+
+    start = lines.index("public lostanza defn w_str_log_str (level:ref<Double>, msg:ref<String>) -> ref<False> :")
+    self.assertEqual(lines[start + 1:start + 3], [
+      "  w_str_log(level.value, addr!(msg.chars))",
+      "  return false",
+    ])
+
+    # No const strings or an argument that can't be passed from HiStanza
+    for name in ["str_fill", "str_copy", "bytes_sum", "ctx_name", "str_list"]:
+      self.assertNotIn("w_{}_str".format(name), out)
+
+  def test_opt_in(self):
+    _, exp = render(False)
+    self.assertNotIn("_str (", exp)
+    _, obs = render(True)
+    # The regular declarations and wrappers are unchanged
+    self.assertEqual([x for x in obs.splitlines() if "_str (" not in x and not x.startswith("  ")],
+                     [x for x in exp.splitlines() if not x.startswith("  ")])
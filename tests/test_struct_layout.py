@@ -0,0 +1,187 @@
+import unittest
+import io
+import os
+import re
+import shutil
+import tempfile
+import subprocess as sp
+from argparse import Namespace
+
+from pycparser import c_parser
+
+from lbstanza_wrappers.FuncDeclVisitor import FuncDeclVisitor
+from lbstanza_wrappers.IRSnapshot import IRSnapshot
+from lbstanza_wrappers.StructLayout import primitive_layout
+from lbstanza_wrappers.CDefIR import CLayout
+
+HEADER = """
+typedef unsigned char u8_t;
+typedef double real_t;
+typedef enum { RED, GREEN } color_t;
+typedef void (*callback_t)(int);
+
+struct vec3 { float x, y, z; };
+typedef struct vec3 vec3_t;
+
+typedef struct shape shape_t;
+struct shape {
+  char kind;
+  real_t area;
+  short id;
+  vec3_t corners[2][2];
+  struct shape *next;
+  color_t color;
+  callback_t on_change;
+  u8_t flags[3];
+  long long big;
+  unsigned short tail;
+  struct { int w; char h; } size;
+  const char *name;
+  int data[];
+};
+
+typedef struct { char a; } tiny_t;
+
+union u { int a; float b; };
+struct with_union { int x; union u v; };
+struct bits { int a : 3; int b : 5; };
+struct forward_only;
+
+int shape_area(shape_t *s);
+"""
+
+# Accessor name => C expression of the struct type
+C_TYPES = {
+  "vec3_t" : "vec3_t",
+  "shape_t" : "shape_t",
+  "tiny_t" : "tiny_t",
+}
+
+def render(structAccessors=True):
+  out = io.StringIO()
+  opts = Namespace(
+    output = out,
+    dump_types = False,
+    dry_run = False,
+    pkg_prefix = "wrapper/structs",
+    pkg_name = "structs",
+    struct_accessors = structAccessors,
+  )
+  v = FuncDeclVisitor(opts)
+  v.visit(c_parser.CParser().parse(HEADER, "structs.h"))
+  v.export()
+  return v, out.getvalue()
+
+def generated_layout(out):
+  """ The sizes, alignments and offsets returned by the generated accessors.
+  """
+  pattern = re.compile(r"^public lostanza defn (\w+_(?:sizeof|alignof|offsetof)) \(\) -> long :\n  return (\d+)L$", re.M)
+  return {k: int(v) for k, v in pattern.findall(out)}
+
+
+class StructLayoutTests(unittest.TestCase):
+  def test_primitive_layout(self):
+    self.assertEqual(primitive_layout(["unsigned", "long", "int"]), CLayout(8, 8, "unsigned"))
+    self.assertEqual(primitive_layout(["short"]), CLayout(2, 2, "signed"))
+    self.assertEqual(primitive_layout(["long", "double"]), CLayout(16, 16, "float"))
+    self.assertEqual(primitive_layout(["uint16_t"]), CLayout(2, 2, "unsigned"))
+    self.assertEqual(primitive_layout(["unsigned"]), CLayout(4, 4, "unsigned"))
+    with self.assertRaises(ValueError):
+      primitive_layout(["mystery_t"])
+
+  def test_members(self):
+    v, _ = render()
+    structs = v.accessor_structs()
+    # Opaque structs are skipped and a struct with a
+    #  typedef is named by the typedef.
+    self.assertEqual(list(structs.keys()), ["vec3_t", "shape_t", "tiny_t"])
+    shape = structs["shape_t"]
+    self.assertIs(shape, v.types["shape"].lbType)
+    self.assertEqual(shape.tag, "shape")
+    self.assertEqual(shape.origin, "structs.h")
+
+    corners = shape.members["corners"]
+    self.assertEqual(corners.dims, (2, 2))
+    self.assertIs(corners.argType.resolve()[0], structs["vec3_t"])
+    self.assertEqual((corners.offset, corners.layout.size), (20, 12))
+    self.assertEqual(shape.members["next"].argType.lbType, shape)
+    self.assertEqual(shape.members["data"].dims, (0,))
+    self.assertEqual(shape.members["flags"].layout, CLayout(1, 1, "unsigned"))
+
+    for name in ["with_union", "bits", "forward_only"]:
+      self.assertFalse(v.types[name].lbType.complete)
+    # Functions are unchanged
+    self.assertEqual(v._funcs["shape_area"].to_stanza(), "((ptr<?>) -> int)")
+
+  def test_accessors(self):
+    _, out = render()
+    lines = out.splitlines()
+
+    start = lines.index("public lostanza defn shape_t_area (p:ptr<?>) -> double :")
+    self.assertEqual(lines[start + 1:start + 5], [
+      "  return [(p + 8) as ptr<double>]",
+      "public lostanza defn shape_t_area_set (p:ptr<?>, v:double) -> ref<False> :",
+      "  [(p + 8) as ptr<double>] = v",
+      "  return false",
+    ])
+    start = lines.index("public lostanza defn shape_t_corners (p:ptr<?>, i:long) -> ptr<?> :")
+    self.assertEqual(lines[start + 1], "  return p + 20 + i * 12")
+    start = lines.index("public lostanza defn shape_t_flags (p:ptr<?>, i:long) -> byte :")
+    self.assertEqual(lines[start + 1], "  return [(p + 96 + i) as ptr<byte>]")
+    start = lines.index("public lostanza defn shape_t_id (p:ptr<?>) -> int :")
+    self.assertEqual(lines[start + 1:start + 4], [
+      "  val b = (p + 16) as ptr<byte>",
+      "  val v = ([b] as int) | (([b + 1] as int) << 8)",
+      "  return (v << 16) >> 16",
+    ])
+    start = lines.index("public lostanza defn shape_t_name (p:ptr<?>) -> ptr<byte> :")
+    self.assertEqual(lines[start + 1], "  return [(p + 128) as ptr<ptr<byte>>]")
+    start = lines.index("public lostanza defn tiny_t_a (p:ptr<?>) -> byte :")
+    self.assertEqual(lines[start + 1], "  return [p as ptr<byte>]")
+    self.assertNotIn("with_union", out)
+
+  def test_opt_in(self):
+    _, out = render(False)
+    self.assertNotIn("_sizeof", out)
+
+  def test_snapshot(self):
+    v, exp = render()
+    with tempfile.TemporaryDirectory() as tmpDir:
+      fpath = os.path.join(tmpDir, "structs.ir")
+      v.snapshot().save(fpath)
+      snap = IRSnapshot.load(fpath)
+
+    out = io.StringIO()
+    v2 = FuncDeclVisitor(Namespace(**dict(vars(v._opts), output=out)))
+    v2.restore(snap)
+    v2.export()
+    self.assertEqual(out.getvalue(), exp)
+
+  @unittest.skipIf(shutil.which("gcc") is None, "Requires gcc")
+  def test_layout_matches_gcc(self):
+    v, out = render()
+    exp = generated_layout(out)
+
+    prog = ["#include <stdio.h>", "#include <stddef.h>", '#include "structs.h"', "int main(void) {"]
+    for name, s in v.accessor_structs().items():
+      cType = C_TYPES[name]
+      prog.append('  printf("{}_sizeof %zu\\n", sizeof({}));'.format(name, cType))
+      prog.append('  printf("{}_alignof %zu\\n", _Alignof({}));'.format(name, cType))
+      for mName in s.members.keys():
+        prog.append('  printf("{}_{}_offsetof %zu\\n", offsetof({}, {}));'.format(name, mName, cType, mName))
+    prog.extend(["  return 0;", "}"])
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+      with open(os.path.join(tmpDir, "structs.h"), "w") as f:
+        f.write(HEADER)
+      with open(os.path.join(tmpDir, "layout.c"), "w") as f:
+        f.write("\n".join(prog) + "\n")
+      exe = os.path.join(tmpDir, "layout")
+      sp.check_call(["gcc", "-std=c11", "-o", exe, "layout.c"], cwd=tmpDir)
+      result = sp.check_output([exe], universal_newlines=True)
+
+    obs = {}
+    for line in result.splitlines():
+      k, val = line.split()
+      obs[k] = int(val)
+    self.assertEqual(obs, exp)
@@ -0,0 +1,81 @@
+import unittest
+import os
+import tempfile
+from argparse import Namespace
+
+from pycparser import parse_file
+
+from lbstanza_wrappers.CombinedVisitor import CombinedVisitor
+from lbstanza_wrappers.Selection import SymbolMatcher
+
+from .utils import make_opts, run_visitor
+
+
+def run_combined(**kwargs):
+  node = parse_file("tests/stanza/enums_and_funcs.h", use_cpp=True)
+  v = CombinedVisitor(make_opts(pkg_prefix = "wrapper/symbols", pkg_name = "enums-and-funcs", **kwargs))
+  run_visitor(v, node, export=False)
+  return list(v.enums._enums.keys()), list(v.funcs._funcs.keys())
+
+
+class SymbolMatcherTests(unittest.TestCase):
+  def test_patterns(self):
+    m = SymbolMatcher(["box_*", "re:^shape", "Level"], ["re:reset$"])
+    self.assertTrue(m.accepts("box_area", "function"))
+    self.assertTrue(m.accepts("shape_sides", "function"))
+    self.assertTrue(m.accepts("Level", "enum"))
+    self.assertFalse(m.accepts("Levels", "enum"))
+    self.assertFalse(m.accepts("box_reset", "function"))
+    self.assertFalse(m.accepts("Shape", "enum"))
+    self.assertEqual(m.filtered["function"], 1)
+    self.assertEqual(m.filtered["enum"], 2)
+
+  def test_exclude_only(self):
+    m = SymbolMatcher([], ["*_internal"])
+    self.assertTrue(m.accepts("foo", "function"))
+    self.assertFalse(m.accepts("foo_internal", "function"))
+
+  def test_symbol_file(self):
+    with tempfile.TemporaryDirectory() as tmpDir:
+      fpath = os.path.join(tmpDir, "used.txt")
+      with open(fpath, "w") as f:
+        f.write("# Functions we use\nfoo\n\n  bar_*\n")
+      m = SymbolMatcher(["@" + fpath])
+    self.assertTrue(m.accepts("foo", "function"))
+    self.assertTrue(m.accepts("bar_baz", "function"))
+    self.assertFalse(m.accepts("baz", "function"))
+
+  def test_invalid_regex(self):
+    with self.assertRaises(ValueError):
+      SymbolMatcher(["re:foo("])
+
+  def test_independent_regexes(self):
+    # Each pattern keeps its own flags and group numbers
+    m = SymbolMatcher(["re:(?i)^gl", "re:(a)\\1", "re:(b)\\1"])
+    self.assertTrue(m.accepts("GLbegin", "function"))
+    self.assertTrue(m.accepts("xaa", "function"))
+    self.assertTrue(m.accepts("xbb", "function"))
+    self.assertFalse(m.accepts("xab", "function"))
+
+  def test_from_opts(self):
+    # `--skip` is handled by the EnumVisitor
+    self.assertIsNone(SymbolMatcher.from_opts(Namespace(skip=["Shape"])))
+    m = SymbolMatcher.from_opts(Namespace(exclude_symbols=["Shape"]))
+    self.assertFalse(m.accepts("Shape", "enum"))
+
+
+class SymbolSelectionTests(unittest.TestCase):
+  def test_include(self):
+    enums, funcs = run_combined(include_symbols = ["box_*", "Level"])
+    self.assertEqual(enums, ["Level"])
+    self.assertEqual(funcs, ["box_level", "box_reset", "box_area"])
+
+  def test_exclude_and_skip(self):
+    enums, funcs = run_combined(exclude_symbols = ["re:area"], skip = ["Shape"])
+    self.assertEqual(enums, ["Level", "scale"])
+    self.assertEqual(funcs, ["shape_sides", "box_level", "box_reset"])
+
+  def test_skip_enums_only(self):
+    enums, funcs = run_combined(skip = ["Shape", "box_area"])
+    self.assertEqual(enums, ["Level", "scale"])
+    self.assertIn("box_area", funcs)
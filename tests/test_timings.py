@@ -0,0 +1,44 @@
+import time
+import unittest
+
+from lbstanza_wrappers.Timings import PhaseTimer, NULL_TIMER, get_timer
+from argparse import Namespace
+
+
+class TestPhaseTimer(unittest.TestCase):
+
+  def test_nested_exclusive(self):
+    timer = PhaseTimer()
+    with timer.phase("visit"):
+      time.sleep(0.02)
+      with timer.phase("render"):
+        time.sleep(0.05)
+    with timer.phase("render"):
+      pass
+
+    res = timer.results
+    self.assertEqual(res["visit"]["calls"], 1)
+    self.assertEqual(res["render"]["calls"], 2)
+    self.assertGreaterEqual(res["render"]["wall"], 0.05)
+    # The inner phase is not charged to the outer phase
+    self.assertLess(res["visit"]["wall"], 0.05)
+
+  def test_trace_memory(self):
+    timer = PhaseTimer(traceMemory=True)
+    with timer.phase("parse"):
+      data = [bytearray(1024) for _ in range(1024)]
+    del data
+    self.assertGreater(timer.results["parse"]["peak_bytes"], 1024 * 1024)
+
+  def test_merge(self):
+    a = PhaseTimer()
+    a.results = {"parse": {"wall": 1.0, "cpu": 0.5, "calls": 1, "peak_bytes": 10}}
+    a.merge({"parse": {"wall": 2.0, "cpu": 1.0, "calls": 1, "peak_bytes": 5}, "visit": {"wall": 1.0, "cpu": 1.0, "calls": 1}})
+    self.assertEqual(a.results["parse"], {"wall": 3.0, "cpu": 1.5, "calls": 2, "peak_bytes": 10})
+    self.assertEqual(a.results["visit"]["calls"], 1)
+
+  def test_get_timer(self):
+    self.assertIs(get_timer(Namespace()), NULL_TIMER)
+    self.assertIs(get_timer(Namespace(timer=None)), NULL_TIMER)
+    timer = PhaseTimer()
+    self.assertIs(get_timer(Namespace(timer=timer)), timer)
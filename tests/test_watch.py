@@ -0,0 +1,81 @@
+import unittest
+import os
+import os.path
+import tempfile
+
+from lbstanza_wrappers.Watch import Watcher, scan_deps
+
+from .test_batch import batch_opts
+
+
+def write(fpath, content):
+  """ Write a file and move its mtime forward so that the
+  change is seen even on filesystems with coarse timestamps.
+  """
+  st = os.stat(fpath) if os.path.exists(fpath) else None
+  with open(fpath, "w") as f:
+    f.write(content)
+  if st is not None:
+    os.utime(fpath, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+class WatchTests(unittest.TestCase):
+  def setUp(self):
+    self.tmpDir = tempfile.TemporaryDirectory()
+    self.dir = self.tmpDir.name
+    self.types = os.path.join(self.dir, "types.h")
+    self.lib = os.path.join(self.dir, "lib.h")
+    self.other = os.path.join(self.dir, "other.h")
+    write(self.types, "typedef int handle_t;\n")
+    write(self.lib, '#include "types.h"\n/* Lib */\nextern handle_t lib_open(int flags);\n')
+    write(self.other, "extern int other_size(void);\n")
+
+    opts = batch_opts(out_dir=self.dir, timer=None)
+    self.watcher = Watcher(opts, [{"input": self.lib}, {"input": self.other}])
+    for header in self.watcher.headers:
+      self.assertTrue(self.watcher.build(header))
+
+  def tearDown(self):
+    self.tmpDir.cleanup()
+
+  def read_output(self, name):
+    with open(os.path.join(self.dir, name)) as f:
+      return f.read()
+
+  def test_scan_deps(self):
+    text = '# 1 "a/./lib.h"\n# 1 "<built-in>"\n# 1 "a/types.h" 1\nint x;\n#line 4 "a/lib.h"\n'
+    self.assertEqual(scan_deps(text), {"a/lib.h", "a/types.h"})
+
+  def test_rebuilds_affected(self):
+    lib, other = self.watcher.headers
+    self.assertIn(os.path.normpath(self.types), lib.deps)
+    self.assertNotIn(os.path.normpath(self.types), other.deps)
+    self.assertEqual(self.watcher.check(), [])
+
+    write(self.types, "typedef long handle_t;\n")
+    self.assertEqual(self.watcher.check(), [lib])
+    self.assertIn("extern lib_open : ((int) -> long)", self.read_output("lib.stanza"))
+    self.assertEqual(self.watcher.check(), [])
+
+  def test_skips_unchanged_text(self):
+    """ A comment edit changes the file but not the preprocessed text.
+    """
+    write(self.lib, '#include "types.h"\n/* Edited */\nextern handle_t lib_open(int flags);\n')
+    self.assertEqual(self.watcher.changed(), {os.path.normpath(self.lib)})
+    self.assertEqual(self.watcher.check(), [])
+    self.assertEqual(self.watcher.changed(), set())
+
+  def test_recovers_from_errors(self):
+    lib, _ = self.watcher.headers
+    content = self.read_output("lib.stanza")
+
+    write(self.lib, '#include "types.h"\nextern handle_t lib_open(int flags;\n')
+    self.assertEqual(self.watcher.check(), [])
+    # The previous output is kept and the error isn't retried
+    #  until the header changes again.
+    self.assertEqual(self.read_output("lib.stanza"), content)
+    self.assertEqual(self.watcher.changed(), set())
+
+    write(self.lib, '#include "types.h"\nextern handle_t lib_close(int flags);\n')
+    self.assertEqual(self.watcher.check(), [lib])
+    self.assertIn("lib_close", self.read_output("lib.stanza"))
@@ -1,6 +1,8 @@
+import io
 import os
 import os.path
-from contextlib import contextmanager
+from argparse import Namespace
+from contextlib import contextmanager, redirect_stdout
 
 @contextmanager
 def open_test(fpath):
@@ -10,3 +12,41 @@ def open_test(fpath):
 
   with open(fpath, "w") as f:
     yield f
+
+def make_opts(**kwargs):
+  """ Options for running a visitor directly - the extraction options
+  with the output written to stdout. Each test passes the options of
+  the feature it is testing as keyword arguments.
+  """
+  opts = Namespace(
+    input = None,
+    output = None,
+    out_dir = None,
+    dry_run = True,
+    dump_types = False,
+    use_defenum = False,
+    skip = [],
+    pkg_prefix = "wrapper/test",
+    enum_pkg_prefix = None,
+    pkg_name = "test",
+  )
+  for k, v in kwargs.items():
+    setattr(opts, k, v)
+  return opts
+
+def run_visitor(v, *nodes, pruned=False, export=True):
+  """ Visit each AST and then export the captured declarations.
+  @param pruned If True, use `visit_pruned` instead of `visit`
+  @param export If False, only visit the ASTs
+  @return String written to stdout
+  """
+  out = io.StringIO()
+  with redirect_stdout(out):
+    for node in nodes:
+      if pruned:
+        v.visit_pruned(node)
+      else:
+        v.visit(node)
+    if export:
+      v.export()
+  return out.getvalue()